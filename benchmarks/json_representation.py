@@ -0,0 +1,76 @@
+"""JSON Representation Benchmark
+
+Compares the `orjson` and standard library encoders of
+`mci.api.core.representations` on `GET /users` pages shaped like the ones
+`UserHandler.get_all_users` returns, and on export rows.
+
+Usage:
+
+    python -m benchmarks.json_representation [--rows 1000] [--repeat 200]
+
+"""
+
+import argparse
+import timeit
+import uuid
+from collections import OrderedDict
+from datetime import date
+
+from mci.api.core.representations import dumps, orjson
+from mci.helpers import build_links
+
+
+def users_page(rows: int):
+    """Build a `get_all_users` response with `rows` users."""
+    response = OrderedDict()
+    response['users'] = []
+    for i in range(rows):
+        response['users'].append({
+            'mci_id': str(uuid.uuid4()),
+            'first_name': 'Nicola{}'.format(i),
+            'last_name': 'Haym',
+            'suffix': ''
+        })
+    response['links'] = build_links('users', 0, rows, rows * 100)
+    return response
+
+
+def export_rows(rows: int):
+    """Build export rows carrying dates, as `export_users` streams them."""
+    return [OrderedDict([
+        ('mci_id', str(uuid.uuid4())),
+        ('first_name', 'Nicola{}'.format(i)),
+        ('last_name', 'Haym'),
+        ('date_of_birth', date(1678, 7, 6)),
+        ('registration_date', date(2019, 1, 1)),
+        ('city', 'London')
+    ]) for i in range(rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000, help='users per page')
+    parser.add_argument('--repeat', type=int, default=200, help='serializations per measurement')
+    args = parser.parse_args()
+
+    libraries = ['json'] if orjson is None else ['json', 'orjson']
+    page = users_page(args.rows)
+    rows = export_rows(args.rows)
+
+    print('{} rows, {} repetitions'.format(args.rows, args.repeat))
+    results = {}
+    for library in libraries:
+        page_time = min(timeit.repeat(lambda: dumps(page, library=library), number=args.repeat, repeat=3))
+        rows_time = min(timeit.repeat(lambda: [dumps(row, library=library) for row in rows],
+                                      number=args.repeat, repeat=3))
+        results[library] = (page_time, rows_time)
+        print('{:>8}  users page {:8.2f} ms   export rows {:8.2f} ms'.format(
+            library, page_time / args.repeat * 1000, rows_time / args.repeat * 1000))
+
+    if 'orjson' in results:
+        print('speedup   users page {:8.1f}x     export rows {:8.1f}x'.format(
+            results['json'][0] / results['orjson'][0], results['json'][1] / results['orjson'][1]))
+
+
+if __name__ == '__main__':
+    main()
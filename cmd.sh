@@ -16,6 +16,10 @@ until flask db upgrade -d $MIGRATION_PATH; do
     sleep 2
 done
 
+# metrics written by the workers of a previous run would be merged into this run's
+export METRICS_DIR="${METRICS_DIR:-/tmp/mci-metrics}"
+rm -rf "$METRICS_DIR"
+
 if [ "$APP_ENV" == "DEVELOPMENT" ] || [ -z "$APP_ENV" ]; then
     gunicorn -b 0.0.0.0 wsgi --reload --log-level=DEBUG --timeout 240 --worker-class gevent
 else
@@ -2,9 +2,12 @@ from mci.api.core.versioned_resource import VersionedResource
 from mci.api.v1_0_0.healthcheck_handler import HealthCheckHandler as V1_0_0_HealthCheckHandler
 from mci.api.v1_0_0.user_handler import UserHandler as V1_0_0_UserHandler
 from mci.api.v1_0_0.helper_handler import HelperHandler as V1_0_0_HelperHandler
+from mci.api.v1_0_0.metrics_handler import MetricsHandler as V1_0_0_MetricsHandler
 from mci.api.healthcheck import HealthCheckResource
+from mci.api.metrics import MetricsResource
 from mci.api.errors import IndividualDoesNotExist
-from mci.api.user import UserResource, UserDetailResource, UserRemovePIIResource, SecureUserDetailResource
+from mci.api.user import UserResource, UserDetailResource, UserRemovePIIResource, SecureUserDetailResource,\
+    UserBatchResource, UserBulkResource, UserExportResource, PendingUserResource
 from mci.api.helpers import SourceResource, GenderResource, AddressResource,\
     DispositionResource, EthnicityRaceResource, EmploymentStatusResource,\
     EducationLevelResource
@@ -0,0 +1,155 @@
+"""Access Log
+
+Every response is described by an access log record. Writing the record to the
+log handlers (CloudWatch in deployed environments) from the request would make
+requests wait on the handlers' locks and I/O, so records are put on a bounded
+in-memory queue instead and a background thread writes them in batches.
+
+When the queue is full, records are dropped and counted rather than slowing
+requests down. Success (2xx) and error responses are sampled at separate rates
+(`ACCESS_LOG_SUCCESS_SAMPLE_RATE` and `ACCESS_LOG_ERROR_SAMPLE_RATE`). Queued
+records are flushed when the worker exits.
+
+"""
+
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+
+from mci.config import Config
+
+
+class AccessLog(object):
+    """Writes access log records from a background thread.
+
+    Args:
+        maxsize (int): Number of records the queue holds before records are dropped.
+        batch_size (int): Maximum number of records written at a time.
+        flush_interval (float): Seconds the background thread waits for a batch to fill.
+        success_sample_rate (float): Fraction of 2xx responses logged.
+        error_sample_rate (float): Fraction of other responses logged.
+
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float,
+                 success_sample_rate: float = 1.0, error_sample_rate: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.success_sample_rate = success_sample_rate
+        self.error_sample_rate = error_sample_rate
+        self.logger = logging.getLogger(__name__)
+        self.dropped = 0
+        self.sampled_out = 0
+        self._reported_drops = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._pid = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def init_app(self, logger: logging.Logger):
+        """Set the logger records are written to.
+
+        Args:
+            logger (logging.Logger): The logger whose handlers receive the records.
+
+        """
+        self.logger = logger
+
+    def log(self, info: dict):
+        """Queue the access log record of a response.
+
+        Args:
+            info (dict): The record; `status_code` selects its level and sampling rate.
+
+        """
+        success = 200 <= info['status_code'] < 300
+        sample_rate = self.success_sample_rate if success else self.error_sample_rate
+        if sample_rate < 1 and random.random() >= sample_rate:
+            self.sampled_out += 1
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((logging.INFO if success else logging.ERROR, info))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Write every queued record from the calling thread."""
+        while self._write_batch(block=False):
+            pass
+
+    def close(self):
+        """Stop the background thread and write the queued records."""
+        self._stopped.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        """Report the access log counters of this worker.
+
+        Returns:
+            dict: Number of queued, dropped and sampled out records.
+
+        """
+        return {
+            'queued': self._queue.qsize(),
+            'dropped': self.dropped,
+            'sampled_out': self.sampled_out
+        }
+
+    def _ensure_started(self):
+        # threads do not survive a fork, so each worker process starts its own
+        if self._pid == os.getpid() or self._stopped.is_set():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._write_batch(block=True)
+            except Exception:
+                # never let a failing handler stop the writer
+                pass
+
+    def _write_batch(self, block: bool):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait()]
+        except queue.Empty:
+            return False
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        for level, info in batch:
+            self.logger.log(level, info)
+
+        dropped = self.dropped
+        if dropped > self._reported_drops:
+            self.logger.warning('Dropped {} access log records, the queue was full.'.format(
+                dropped - self._reported_drops))
+            self._reported_drops = dropped
+
+        return True
+
+
+access_log = AccessLog(maxsize=Config.get_access_log_queue_size(),
+                       batch_size=Config.get_access_log_batch_size(),
+                       flush_interval=Config.get_access_log_flush_interval(),
+                       success_sample_rate=Config.get_access_log_success_sample_rate(),
+                       error_sample_rate=Config.get_access_log_error_sample_rate())
@@ -0,0 +1,233 @@
+"""Address Index
+
+Registrations share mailing addresses: each distinct address is stored once and
+individuals point at it. Addresses are identified by a canonical key, a hash of
+their normalized address, city, state, postal code, county and country.
+
+The address table (owned by mci-database) has no unique constraint to arbitrate
+concurrent inserts, so on PostgreSQL a transaction-scoped advisory lock on the
+canonical key serializes registrations of the same new address. The address is
+then resolved with a single select-or-insert statement. Registrations only
+resolve a new address once the matching service has answered, so the lock is
+never held while waiting for it. Each worker remembers the
+IDs of recently resolved addresses so repeated addresses cost no query at all.
+An ID is only remembered once the transaction that resolved it commits, so a
+rolled back registration never leaves a cached ID to an address that does not exist.
+
+"""
+
+import hashlib
+import json
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from mci.config import Config
+from mci.helpers import TTLCache
+from mci_database.db import db
+from mci_database.db.models import Address
+
+ADDRESS_FIELDS = ('address', 'city', 'state', 'postal_code', 'county', 'country')
+
+# addresses are never updated in place, so a resolved ID stays valid
+ADDRESS_CACHE_TTL = 3600
+
+ADVISORY_LOCK_SQL = text('SELECT pg_advisory_xact_lock(:lock_key)')
+
+SELECT_OR_INSERT_SQL = text('''
+WITH existing AS (
+    SELECT id FROM address
+    WHERE address IS NOT DISTINCT FROM :address
+      AND city IS NOT DISTINCT FROM :city
+      AND state IS NOT DISTINCT FROM :state
+      AND postal_code IS NOT DISTINCT FROM :postal_code
+      AND county IS NOT DISTINCT FROM :county
+      AND country IS NOT DISTINCT FROM :country
+    ORDER BY id
+    LIMIT 1
+), inserted AS (
+    INSERT INTO address (address, city, state, postal_code, county, country)
+    SELECT :address, :city, :state, :postal_code, :county, :country
+    WHERE NOT EXISTS (SELECT 1 FROM existing)
+    RETURNING id
+)
+SELECT id, false AS created FROM existing
+UNION ALL
+SELECT id, true AS created FROM inserted
+''')
+
+
+def _normalize_text(value, transform):
+    # missing and non-text values are stored as NULL, as they always have been
+    if value is None:
+        return None
+    try:
+        return ' '.join(transform(value).split())
+    except Exception:
+        return None
+
+
+def normalize_address(address: dict):
+    """Normalize a registration's mailing address.
+
+    Args:
+        address (dict): The `mailing_address` object of a registration payload.
+
+    Returns:
+        dict: The address, city, state, postal code, county and country to store.
+
+    """
+    def field(name, default=None):
+        try:
+            return address.get(name, default)
+        except Exception:
+            return None
+
+    return {
+        'address': _normalize_text(field('address', ''), str.title),
+        'city': _normalize_text(field('city', ''), str.title),
+        'state': _normalize_text(field('state', ''), str.upper),
+        'postal_code': _normalize_text(field('postal_code', ''), str),
+        'county': _normalize_text(field('county'), str),
+        'country': _normalize_text(field('country', ''), str.upper)
+    }
+
+
+def canonical_key(values: dict):
+    """Compute the canonical key of a normalized address.
+
+    Args:
+        values (dict): The normalized address returned by `normalize_address`.
+
+    Returns:
+        str: Hex digest identifying the address.
+
+    """
+    content = json.dumps([values[name] for name in ADDRESS_FIELDS], separators=(',', ':'))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class AddressIndex(object):
+    """Resolves mailing addresses to the ID of their (possibly new) address row.
+
+    Args:
+        maxsize (int): Number of recently resolved addresses each worker remembers.
+
+    """
+
+    def __init__(self, maxsize: int):
+        self._ids = TTLCache(ttl=ADDRESS_CACHE_TTL, maxsize=maxsize)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_transaction_end', self._after_transaction_end)
+
+    def lookup(self, key: str):
+        """Retrieve the ID of a recently resolved address.
+
+        Args:
+            key (str): The canonical key of the address.
+
+        Returns:
+            int: The address ID, or None if the address was not resolved recently.
+
+        """
+        return self._ids.get(key)
+
+    def remember(self, key: str, address_id: int):
+        """Remember the ID of an address whose row is committed.
+
+        Args:
+            key (str): The canonical key of the address.
+            address_id (int): The address ID.
+
+        """
+        self._ids.set(key, address_id)
+
+    def find(self, values: dict):
+        """Find the ID of an existing address, without creating it or taking a lock.
+
+        Args:
+            values (dict): The normalized address returned by `normalize_address`.
+
+        Returns:
+            int: The address ID, or None if the address does not exist yet.
+
+        """
+        key = canonical_key(values)
+        address_id = self.lookup(key)
+        if address_id is None:
+            address = db.session.query(Address.id).filter_by(**values).order_by(Address.id).first()
+            if address is not None:
+                address_id = address.id
+                # rows resolved by the current transaction are remembered once it commits
+                if key not in dict(db.session.info.get('resolved_addresses', [])):
+                    self.remember(key, address_id)
+        return address_id
+
+    def resolve(self, values: dict):
+        """Find or create the row of a normalized address in the current transaction.
+
+        The ID is remembered once the transaction commits. On PostgreSQL the
+        advisory lock is held until then as well.
+
+        Args:
+            values (dict): The normalized address returned by `normalize_address`.
+
+        Returns:
+            int, bool: The address ID and whether the row was created.
+
+        """
+        key = canonical_key(values)
+        if db.session.get_bind().dialect.name != 'postgresql':
+            address_id, created = self._resolve_with_orm(values)
+        else:
+            # advisory locks take a signed 64-bit key
+            lock_key = int.from_bytes(bytes.fromhex(key[:16]), 'big', signed=True)
+            db.session.execute(ADVISORY_LOCK_SQL, {'lock_key': lock_key})
+            address_id, created = db.session.execute(SELECT_OR_INSERT_SQL, values).first()
+
+        db.session.info.setdefault('resolved_addresses', []).append((key, address_id))
+        return address_id, created
+
+    def clear(self):
+        """Forget every remembered address."""
+        self._ids.clear()
+
+    def stats(self):
+        """Report the cache usage counters.
+
+        Returns:
+            dict: Hits, misses and size of the address ID cache.
+
+        """
+        return self._ids.stats()
+
+    def _after_commit(self, session):
+        # also fired when a savepoint is released, so the IDs are only
+        # remembered once the outermost transaction ends
+        session.info['addresses_committed'] = True
+
+    def _after_transaction_end(self, session, transaction):
+        committed = session.info.pop('addresses_committed', False)
+        if transaction.parent is not None:
+            if transaction.nested and not committed:
+                # a rolled back savepoint may have undone any of the resolved rows
+                session.info.pop('resolved_addresses', None)
+            return
+
+        for key, address_id in session.info.pop('resolved_addresses', []):
+            if committed:
+                self.remember(key, address_id)
+
+    def _resolve_with_orm(self, values: dict):
+        address = Address.query.filter_by(**values).order_by(Address.id).first()
+        if address is not None:
+            return address.id, False
+
+        address = Address(values['address'], values['city'], values['state'],
+                          values['postal_code'], values['county'], values['country'])
+        db.session.add(address)
+        db.session.flush()
+        return address.id, True
+
+
+address_index = AddressIndex(maxsize=Config.get_address_cache_size())
@@ -0,0 +1,169 @@
+"""Read Replica
+
+Reads that do not need to see the latest writes (user lookups, listings, the
+export and the helper listings) can be served by a PostgreSQL streaming replica
+configured with `READ_REPLICA_URI`. Without one, every query uses the primary.
+
+Reads fall back to the primary when:
+
+    - the current request has written, so it reads its own writes;
+    - the client wrote less than `REPLICA_MAX_LAG` seconds ago, so its
+      follow-up requests do not miss the write it just made. A response to a
+      request that wrote carries the time of the write in the `mci_last_write`
+      cookie and the `X-MCI-Last-Write` header; clients send either back;
+    - the replica is unreachable or more than `REPLICA_MAX_LAG` seconds behind.
+      Replica health is checked at most every `REPLICA_CHECK_INTERVAL` seconds.
+
+"""
+
+import logging
+import math
+import threading
+import time
+
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+
+from mci.config import Config
+from mci_database.db import db
+
+logger = logging.getLogger(__name__)
+
+LAST_WRITE_COOKIE = 'mci_last_write'
+LAST_WRITE_HEADER = 'X-MCI-Last-Write'
+
+# a replica that has replayed everything it received is caught up, however long
+# ago the last transaction was; otherwise the lag is the age of the last replay
+REPLICATION_LAG_SQL = text('''
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+''')
+
+
+class ReadReplica(object):
+    """Routes read-only queries to the replica when it is safe to do so.
+
+    Args:
+        max_lag (float): Seconds the replica may lag behind the primary.
+        check_interval (float): Seconds between replica health checks.
+
+    """
+
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._engine = None
+        self._sessions = None
+        self._checked_at = None
+        self._healthy = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app, uri: str = None):
+        """Connect to the replica, if one is configured.
+
+        Args:
+            app (Flask): The application.
+            uri (str): Replica connection string (defaults to `READ_REPLICA_URI`).
+
+        """
+        if uri is None:
+            uri = Config.get_read_replica_uri()
+        if not uri:
+            return
+
+        self._engine = create_engine(uri, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        self._sessions = scoped_session(sessionmaker(bind=self._engine, info={'read_replica': True}))
+        self._checked_at = None
+        event.listen(Session, 'after_flush', self._after_flush)
+        app.after_request(self._after_request)
+        app.teardown_appcontext(self._remove_session)
+        logger.info('Read replica configured (maximum lag {}s).'.format(self.max_lag))
+
+    def session(self):
+        """Retrieve the session read-only queries should use.
+
+        Returns:
+            Session: The replica session, or the primary session (`db.session`)
+                when the replica is not configured, not safe to read from or unhealthy.
+
+        """
+        if self._sessions is None or self._wrote_recently() or not self.is_healthy():
+            return db.session
+        return self._sessions
+
+    def is_healthy(self):
+        """Determine whether the replica can serve reads.
+
+        Returns:
+            bool: True if the replica answered its last health check and was
+                at most `max_lag` seconds behind the primary.
+
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._healthy
+            # other requests keep the previous verdict while this one checks
+            self._checked_at = now
+
+        healthy = self._check()
+        with self._lock:
+            self._healthy = healthy
+        return healthy
+
+    def _check(self):
+        try:
+            lag = self._replication_lag()
+        except Exception as e:
+            logger.warning('Read replica is unavailable, reading from the primary: {}'.format(str(e)))
+            return False
+
+        if lag is None or lag > self.max_lag:
+            logger.warning('Read replica lag is {}s, reading from the primary.'.format(lag))
+            return False
+        return True
+
+    def _replication_lag(self):
+        with self._engine.connect() as connection:
+            if connection.dialect.name != 'postgresql':
+                return 0
+            lag = connection.execute(REPLICATION_LAG_SQL).scalar()
+        return None if lag is None else float(lag)
+
+    def _wrote_recently(self):
+        if has_app_context() and g.get('wrote_to_primary', False):
+            return True
+        if not has_request_context():
+            return False
+
+        last_write = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+        try:
+            elapsed = time.time() - float(last_write)
+        except (TypeError, ValueError):
+            return False
+        # a time in the future is not one this API handed out
+        return 0 <= elapsed < self.max_lag
+
+    def _after_flush(self, session, flush_context):
+        if session.info.get('read_replica', False):
+            return
+        if has_app_context():
+            g.wrote_to_primary = True
+
+    def _after_request(self, response):
+        if g.get('wrote_to_primary', False):
+            last_write = '{:.3f}'.format(time.time())
+            response.headers[LAST_WRITE_HEADER] = last_write
+            response.set_cookie(LAST_WRITE_COOKIE, last_write, max_age=math.ceil(self.max_lag), httponly=True)
+        return response
+
+    def _remove_session(self, exception=None):
+        self._sessions.remove()
+
+
+read_replica = ReadReplica(max_lag=Config.get_replica_max_lag(),
+                           check_interval=Config.get_replica_check_interval())
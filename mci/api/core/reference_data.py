@@ -0,0 +1,125 @@
+"""Reference Data Cache
+
+Registering an individual resolves gender, source, ethnicity/race, education
+level, employment status and disposition names to their lookup table rows.
+These tables rarely change, so each worker keeps a copy of them in memory
+keyed by the lowercased name.
+
+"""
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from mci.config import Config
+from mci.helpers import TTLCache
+from mci_database.db import db
+from mci_database.db.models import (Disposition, EducationLevel,
+                                    EmploymentStatus, EthnicityRace, Gender,
+                                    Source)
+
+# lookup table model -> name of the column holding the looked up value
+REFERENCE_COLUMNS = {
+    Gender: 'gender',
+    Source: 'source',
+    EthnicityRace: 'ethnicity_race',
+    EducationLevel: 'education_level',
+    EmploymentStatus: 'employment_status',
+    Disposition: 'disposition'
+}
+
+
+class ReferenceDataCache(object):
+    """Per-worker cache of the MCI lookup tables.
+
+    A table is loaded in full the first time one of its values is requested and
+    is kept until it is invalidated or its time-to-live expires. Only primitive
+    `(id, value)` pairs are cached so that no ORM instance is ever shared
+    between sessions.
+
+    Args:
+        ttl (float): Number of seconds a loaded table remains valid.
+
+    """
+
+    def __init__(self, ttl: float):
+        self._tables = TTLCache(ttl=ttl, maxsize=len(REFERENCE_COLUMNS))
+
+    def get_id(self, model, value):
+        """Locate the ID of a lookup table row by its value.
+
+        Args:
+            model (db.Model): The lookup table model.
+            value (str): The value to look up (case insensitive).
+
+        Returns:
+            int: The row ID or None if the value is unknown.
+
+        """
+        row = self._get_row(model, value)
+        return None if row is None else row[0]
+
+    def get_instance(self, model, value):
+        """Locate a lookup table row by its value and attach it to the current session.
+
+        The instance is merged into the session without emitting any SQL, so it can
+        be appended to relationship collections (e.g. `Individual.ethnicity_races`).
+
+        Args:
+            model (db.Model): The lookup table model.
+            value (str): The value to look up (case insensitive).
+
+        Returns:
+            db.Model: The persistent instance or None if the value is unknown.
+
+        """
+        row = self._get_row(model, value)
+        if row is None:
+            return None
+
+        instance = model.__mapper__.class_manager.new_instance()
+        instance.id = row[0]
+        setattr(instance, REFERENCE_COLUMNS[model], row[1])
+        make_transient_to_detached(instance)
+        return db.session.merge(instance, load=False)
+
+    def invalidate(self, model):
+        """Drop a cached lookup table so that it is reloaded on next use.
+
+        Args:
+            model (db.Model): The lookup table model.
+
+        """
+        self._tables.invalidate(model.__name__)
+
+    def clear(self):
+        """Drop every cached lookup table."""
+        self._tables.clear()
+
+    def stats(self):
+        """Report the cache usage counters.
+
+        Returns:
+            dict: Hits, misses and size of the table cache.
+
+        """
+        return self._tables.stats()
+
+    def _get_row(self, model, value):
+        if not isinstance(value, str):
+            return None
+
+        rows = self._tables.get(model.__name__)
+        if rows is None:
+            rows = self._load(model)
+            self._tables.set(model.__name__, rows)
+        return rows.get(value.lower())
+
+    def _load(self, model):
+        column = getattr(model, REFERENCE_COLUMNS[model])
+        rows = {}
+        for row_id, row_value in db.session.query(model.id, column).order_by(model.id):
+            if row_value is not None:
+                rows.setdefault(row_value.lower(), (row_id, row_value))
+        return rows
+
+
+reference_data = ReferenceDataCache(ttl=Config.get_reference_cache_ttl())
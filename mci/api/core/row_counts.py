@@ -0,0 +1,132 @@
+"""Row Counts
+
+Paginated listings report the size of the table they page through so that a
+`last` link can be built. An exact `COUNT(*)` scans the whole table, so the way
+totals are computed is configurable (`COUNT_STRATEGY`):
+
+    exact     COUNT(*) on every request
+    cached    an exact count kept per worker and refreshed in the background once stale
+    estimate  the PostgreSQL planner estimate (`pg_class.reltuples`)
+
+Cached and estimated totals are approximate; callers must not rely on them to
+decide whether another page exists.
+
+"""
+
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, text
+
+from mci.api.core.read_replica import read_replica
+from mci.config import Config, settings
+
+logger = logging.getLogger(__name__)
+
+
+class RowCounter(object):
+    """Counts the rows of a table using the configured strategy.
+
+    Args:
+        ttl (float): Number of seconds a cached count is served before it is refreshed.
+
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._counts = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def count(self, model, strategy: str = None):
+        """Count the rows of a table.
+
+        Args:
+            model (db.Model): The model whose table is counted.
+            strategy (str): One of `exact`, `cached` or `estimate` (defaults to `COUNT_STRATEGY`).
+
+        Returns:
+            int: The number of rows, exact or approximate depending on the strategy.
+
+        """
+        if strategy is None:
+            strategy = settings.current.count_strategy
+
+        if strategy == 'cached':
+            return self._cached_count(model)
+        elif strategy == 'estimate':
+            return self._estimated_count(model)
+        elif strategy != 'exact':
+            logger.warning('Unknown count strategy {}, using exact counts.'.format(strategy))
+
+        return self._exact_count(model)
+
+    def clear(self):
+        """Drop every cached count."""
+        with self._lock:
+            self._counts.clear()
+
+    def _exact_count(self, model):
+        return read_replica.session().query(func.count()).select_from(model).scalar()
+
+    def _estimated_count(self, model):
+        session = read_replica.session()
+        if session.get_bind().dialect.name != 'postgresql':
+            return self._exact_count(model)
+
+        estimate = session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)'),
+            {'table_name': model.__tablename__}).scalar()
+
+        # tables that have never been vacuumed or analyzed have no estimate (-1 or 0)
+        if estimate is None or estimate <= 0:
+            return self._exact_count(model)
+
+        return int(estimate)
+
+    def _cached_count(self, model):
+        table_name = model.__tablename__
+        with self._lock:
+            cached = self._counts.get(table_name)
+
+        if cached is None:
+            value = self._exact_count(model)
+            with self._lock:
+                self._counts[table_name] = (time.monotonic(), value)
+            return value
+
+        refreshed_at, value = cached
+        if time.monotonic() - refreshed_at > self.ttl:
+            self._refresh_in_background(model)
+
+        return value
+
+    def _refresh_in_background(self, model):
+        table_name = model.__tablename__
+        with self._lock:
+            if table_name in self._refreshing:
+                return
+            self._refreshing.add(table_name)
+
+        app = current_app._get_current_object()
+        thread = threading.Thread(target=self._refresh, args=(app, model),
+                                  name='row-count-refresh', daemon=True)
+        thread.start()
+
+    def _refresh(self, app, model):
+        table_name = model.__tablename__
+        try:
+            with app.app_context():
+                value = self._exact_count(model)
+            with self._lock:
+                self._counts[table_name] = (time.monotonic(), value)
+        except Exception as e:
+            logger.error('Failed to refresh the row count of {}: {}'.format(table_name, str(e)))
+        finally:
+            with self._lock:
+                self._refreshing.discard(table_name)
+
+
+row_counts = RowCounter(ttl=Config.get_count_cache_ttl())
@@ -0,0 +1,201 @@
+"""User Blob Cache
+
+Caches the blobs served by `GET /users/<mci_id>` in two tiers: a per-worker LRU
+in front of a cache shared by every worker (a Redis server configured with
+`USER_CACHE_URL`). Without a shared cache, or if the `redis` package is not
+installed, blobs are not cached at all.
+
+Blobs hold PII, so removing an individual's PII must never leave a copy to be
+served. Every MCI ID has a version number in the shared cache and blobs are
+stored under the version they were read at; invalidating an MCI ID increments
+its version, which makes every stored blob of it unreachable in the shared
+tier. Local entries are served without asking the shared cache, so they only
+live `USER_CACHE_LOCAL_TTL` seconds (at most `MAX_LOCAL_TTL`): that bounds how
+long another worker may still serve a blob after its PII was removed. The
+worker removing the PII drops its local entries at once.
+
+An invalidation also marks the MCI ID unsettled for `UNSETTLED_TTL` seconds.
+While it is unsettled blobs of it are served from the database but never
+stored, so a read that raced the PII removal (or hit a lagging read replica)
+cannot repopulate the cache with the old data. When the shared cache is
+unreachable, reads bypass it.
+
+Blobs served by `GET /user-details/<mci_id>` include the SSN and are never cached.
+
+"""
+
+import json
+import logging
+
+from mci.config import Config
+from mci.helpers import TTLCache
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# seconds during which an invalidated MCI ID is not cached again
+UNSETTLED_TTL = 60
+
+# upper bound of the seconds a worker serves a blob without checking the shared cache
+MAX_LOCAL_TTL = 5
+
+
+class UserBlobCache(object):
+    """Two-tier cache of user detail blobs.
+
+    Args:
+        ttl (float): Number of seconds a blob stays cached.
+        maxsize (int): Number of blobs each worker keeps in memory.
+        client (redis.Redis): Client of the shared cache (caching is disabled without one).
+        local_ttl (float): Number of seconds a worker serves a blob from memory (at most `MAX_LOCAL_TTL`).
+
+    """
+
+    def __init__(self, ttl: float, maxsize: int, client=None, local_ttl: float = 1):
+        self.ttl = ttl
+        self.client = client
+        self.local_ttl = max(0, min(local_ttl, ttl, MAX_LOCAL_TTL))
+        self._blobs = TTLCache(ttl=self.local_ttl, maxsize=maxsize)
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float, maxsize: int, local_ttl: float = 1):
+        """Create a cache backed by the shared cache at a URL.
+
+        Args:
+            url (str): Redis URL of the shared cache, or None to disable caching.
+            ttl (float): Number of seconds a blob stays cached.
+            maxsize (int): Number of blobs each worker keeps in memory.
+            local_ttl (float): Number of seconds a worker serves a blob from memory.
+
+        Returns:
+            UserBlobCache: The cache.
+
+        """
+        client = None
+        if url:
+            if redis is None:
+                logger.warning('USER_CACHE_URL is set but redis is not installed, user blobs are not cached.')
+            else:
+                client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return cls(ttl=ttl, maxsize=maxsize, client=client, local_ttl=local_ttl)
+
+    @property
+    def enabled(self):
+        """bool: True if blobs are cached."""
+        return self.client is not None
+
+    def lookup(self, mci_id: str, fields: list = None):
+        """Retrieve the cached blob of an individual.
+
+        Args:
+            mci_id (str): The MCI ID.
+            fields (list): Names of the blob fields (None for every field).
+
+        Returns:
+            tuple, str: The cached blob and its entity tag (or None on a miss), and
+                the version to pass to `store` once the blob is built (or None if it
+                must not be stored).
+
+        """
+        if not self.enabled:
+            return None, None
+
+        fields_key = self._fields_key(fields)
+        entry = self._blobs.get((mci_id, fields_key))
+        if entry is not None:
+            return entry[1], entry[0]
+
+        try:
+            version, unsettled = self.client.mget(self._version_key(mci_id), self._unsettled_key(mci_id))
+            version = self._decode(version) or '0'
+            content = self.client.get(self._blob_key(mci_id, version, fields_key))
+        except Exception as e:
+            logger.warning('Failed to read the user cache: {}'.format(str(e)))
+            return None, None
+
+        if content is not None:
+            blob, etag = json.loads(self._decode(content))
+            self._blobs.set((mci_id, fields_key), (version, (blob, etag)))
+            return (blob, etag), version
+
+        return None, (None if unsettled is not None else version)
+
+    def store(self, mci_id: str, fields: list, version: str, blob: dict, etag: str):
+        """Cache the blob of an individual.
+
+        Args:
+            mci_id (str): The MCI ID.
+            fields (list): Names of the blob fields (None for every field).
+            version (str): The version returned by `lookup` before the blob was read.
+            blob (dict): The blob.
+            etag (str): The entity tag of the blob.
+
+        """
+        if not self.enabled or version is None:
+            return
+
+        fields_key = self._fields_key(fields)
+        try:
+            self.client.set(self._blob_key(mci_id, version, fields_key),
+                            json.dumps([blob, etag], default=str), ex=int(self.ttl))
+        except Exception as e:
+            logger.warning('Failed to write the user cache: {}'.format(str(e)))
+            return
+        self._blobs.set((mci_id, fields_key), (version, (blob, etag)))
+
+    def invalidate(self, mci_id: str):
+        """Make every cached blob of an individual unreachable.
+
+        Args:
+            mci_id (str): The MCI ID.
+
+        Raises:
+            Exception: The shared cache could not be updated; cached blobs may still be served.
+
+        """
+        if not self.enabled:
+            return
+
+        self.client.incr(self._version_key(mci_id))
+        self.client.set(self._unsettled_key(mci_id), 1, ex=UNSETTLED_TTL)
+        # other workers drop theirs within `local_ttl`; PII removals are rare enough to drop them all
+        self._blobs.clear()
+
+    def clear(self):
+        """Forget the blobs held by this worker."""
+        self._blobs.clear()
+
+    def stats(self):
+        """Report the cache usage counters of this worker.
+
+        Returns:
+            dict: Whether caching is enabled, and the hits, misses and size of the local tier.
+
+        """
+        stats = self._blobs.stats()
+        stats['enabled'] = self.enabled
+        return stats
+
+    def _fields_key(self, fields):
+        return '*' if fields is None else ','.join(fields)
+
+    def _version_key(self, mci_id):
+        return 'mci:user:{}:version'.format(mci_id)
+
+    def _unsettled_key(self, mci_id):
+        return 'mci:user:{}:unsettled'.format(mci_id)
+
+    def _blob_key(self, mci_id, version, fields_key):
+        return 'mci:user:{}:{}:{}'.format(mci_id, version, fields_key)
+
+    def _decode(self, value):
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+user_blobs = UserBlobCache.from_url(Config.get_user_cache_url(), ttl=Config.get_user_cache_ttl(),
+                                    maxsize=Config.get_user_cache_size(),
+                                    local_ttl=Config.get_user_cache_local_ttl())
@@ -0,0 +1,118 @@
+"""Verified Token Cache
+
+Validating an access token verifies its signature against the provider's key
+set, and service clients send the same token with every request for its whole
+lifetime. Once a token has been validated, each worker remembers it (by its
+SHA-256 hash, never the token itself) until the token's `exp` claim, capped at
+`TOKEN_CACHE_TTL` seconds.
+
+Required scopes are checked on every request against the scopes the cached
+token was issued with. A token lacking one of them is handed to the provider,
+which reports the error (or applies its own scope rules). Tokens without an
+`exp` claim, or that are not JWTs, are validated on every request.
+
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from brighthive_authlib import OAuth2ProviderError
+from jose import jwt
+
+from mci.config import Config
+from mci.helpers import TTLCache
+
+
+class VerifiedTokenCache(object):
+    """Per-worker cache of validated access tokens.
+
+    Args:
+        ttl (float): Maximum number of seconds a token stays cached.
+        maxsize (int): Number of tokens kept.
+
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self._tokens = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def validate(self, provider, scopes: list = None):
+        """Validate the access token of the current request.
+
+        Args:
+            provider (OAuth2Provider): Provider validating tokens that are not cached.
+            scopes (list): Scopes the token must have been issued with.
+
+        Returns:
+            bool: True if the token is valid.
+
+        Raises:
+            OAuth2ProviderError: The token is missing or invalid.
+
+        """
+        scopes = scopes or []
+        try:
+            token = provider.get_token()
+        except OAuth2ProviderError:
+            # no usable bearer token, let the provider report it
+            return provider.validate_token(scopes=scopes)
+
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        token_scopes = self._tokens.get(key)
+        if token_scopes is not None and all(scope in token_scopes for scope in scopes):
+            return True
+
+        valid = provider.validate_token(token=token, scopes=scopes)
+        if valid:
+            self._store(key, token)
+        return valid
+
+    def clear(self):
+        """Forget every validated token."""
+        self._tokens.clear()
+
+    def stats(self):
+        """Report the cache usage counters of this worker.
+
+        Returns:
+            dict: Hits, misses, current size and maximum size of the cache.
+
+        """
+        return self._tokens.stats()
+
+    def _store(self, key, token):
+        try:
+            claims = jwt.get_unverified_claims(token)
+            expires_in = float(claims['exp']) - time.time()
+        except Exception:
+            return
+        if expires_in > 0:
+            scope = claims.get('scope')
+            self._tokens.set(key, frozenset(scope.split() if isinstance(scope, str) else []),
+                             ttl=min(expires_in, self.ttl))
+
+
+def token_required(provider, scopes: list = None):
+    """Require a valid access token, using the verified token cache.
+
+    A replacement for `brighthive_authlib.token_required`.
+
+    Args:
+        provider (OAuth2Provider): Provider validating tokens that are not cached.
+        scopes (list): Scopes the token must have been issued with.
+
+    Returns:
+        callable: The decorator.
+
+    """
+    def wrap(f):
+        @wraps(f)
+        def wrapped_f(*args, **kwargs):
+            if verified_tokens.validate(provider, scopes):
+                return f(*args, **kwargs)
+        return wrapped_f
+    return wrap
+
+
+verified_tokens = VerifiedTokenCache(ttl=Config.get_token_cache_ttl(), maxsize=Config.get_token_cache_size())
@@ -7,12 +7,18 @@ identify the API version number in a request header.
 
 from flask_restful import Resource
 
+from mci.instrumentation.profiling import profiler
+
 
 class VersionedResource(Resource):
     """Represents a version-aware RESTful Resource.
 
+    Resource methods are profiled on demand (see `mci.instrumentation.profiling`).
+
     """
 
+    method_decorators = profiler.decorators()
+
     def __init__(self):
         super().__init__()
 
@@ -5,8 +5,8 @@ This class represents a user registered with the Master Client Index.
 """
 
 from flask import request
-from brighthive_authlib import token_required
 from mci.api import VersionedResource, V1_0_0_HelperHandler
+from mci.api.core.verified_tokens import token_required
 from mci.config import Config
 
 
@@ -51,7 +51,8 @@ class SourceResource(HelperResource):
 
         """
 
-        return self.get_request_handler(request.headers).get_all_sources()
+        return self.get_request_handler(request.headers).get_all_sources(
+            if_none_match=request.if_none_match)
 
     @token_required(Config.get_oauth2_provider())
     def post(self):
@@ -77,7 +78,8 @@ class GenderResource(HelperResource):
 
         """
 
-        return self.get_request_handler(request.headers).get_all_genders()
+        return self.get_request_handler(request.headers).get_all_genders(
+            if_none_match=request.if_none_match)
 
     @token_required(Config.get_oauth2_provider())
     def post(self):
@@ -103,7 +105,8 @@ class AddressResource(HelperResource):
 
         """
 
-        return self.get_request_handler(request.headers).get_all_addresses()
+        return self.get_request_handler(request.headers).get_all_addresses(
+            if_none_match=request.if_none_match)
 
     @token_required(Config.get_oauth2_provider())
     def post(self):
@@ -129,7 +132,8 @@ class DispositionResource(HelperResource):
 
         """
 
-        return self.get_request_handler(request.headers).get_all_dispositions()
+        return self.get_request_handler(request.headers).get_all_dispositions(
+            if_none_match=request.if_none_match)
 
     @token_required(Config.get_oauth2_provider())
     def post(self):
@@ -155,7 +159,8 @@ class EducationLevelResource(HelperResource):
 
         """
 
-        return self.get_request_handler(request.headers).get_all_education_levels()
+        return self.get_request_handler(request.headers).get_all_education_levels(
+            if_none_match=request.if_none_match)
 
     @token_required(Config.get_oauth2_provider())
     def post(self):
@@ -181,7 +186,8 @@ class EmploymentStatusResource(HelperResource):
 
         """
 
-        return self.get_request_handler(request.headers).get_all_employment_status()
+        return self.get_request_handler(request.headers).get_all_employment_status(
+            if_none_match=request.if_none_match)
 
     @token_required(Config.get_oauth2_provider())
     def post(self):
@@ -207,7 +213,8 @@ class EthnicityRaceResource(HelperResource):
 
         """
 
-        return self.get_request_handler(request.headers).get_all_ethnicities()
+        return self.get_request_handler(request.headers).get_all_ethnicities(
+            if_none_match=request.if_none_match)
 
     @token_required(Config.get_oauth2_provider())
     def post(self):
@@ -0,0 +1,45 @@
+"""API Metrics Resource
+
+This class represents the metrics resource scraped by Prometheus.
+
+"""
+
+from flask import request
+from mci.api import VersionedResource, V1_0_0_MetricsHandler
+
+
+class MetricsResource(VersionedResource):
+    """Represents the metrics resource.
+
+    """
+
+    def __init__(self):
+        super().__init__()
+
+    def get_request_handler(self, headers):
+        """Retrieve request handler based on API version number.
+
+        Args:
+            headers (dict): HTTP request headers passed in by the client.
+
+        Returns:
+            object: API request handler based on version number.
+
+        """
+        api_version = self.get_api_version(headers)
+
+        if api_version == '1.0.0':
+            request_handler = V1_0_0_MetricsHandler()
+        else:
+            request_handler = V1_0_0_MetricsHandler()
+
+        return request_handler
+
+    def get(self):
+        """ Handle GET request from API.
+
+        Returns:
+            Response: Request, latency, database, matching service and authentication metrics.
+
+        """
+        return self.get_request_handler(request.headers).get_metrics(request.headers)
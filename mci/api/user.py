@@ -5,9 +5,9 @@ This class represents a user registered with the Master Client Index.
 """
 
 from flask import request
-from brighthive_authlib import token_required
 from mci.api import VersionedResource, V1_0_0_UserHandler
-from mci.config import Config
+from mci.api.core.verified_tokens import token_required
+from mci.config import Config, settings
 
 
 class UserResource(VersionedResource):
@@ -47,7 +47,7 @@ class UserResource(VersionedResource):
         """
 
         offset = 0
-        limit = Config.get_page_limit()
+        limit = settings.current.page_limit
         args = request.args
         try:
             offset = request.args['offset']
@@ -59,7 +59,14 @@ class UserResource(VersionedResource):
         except Exception:
             pass
 
-        return self.get_request_handler(request.headers).get_all_users(offset=offset, limit=limit)
+        if 'cursor' in args:
+            include_count = args.get('count', 'false').lower() in ('1', 'true', 'yes')
+            return self.get_request_handler(request.headers).get_users_by_cursor(
+                cursor=args['cursor'], limit=limit, include_count=include_count, fields=args.get('fields'))
+
+        include_count = args.get('count', 'true').lower() not in ('0', 'false', 'no')
+        return self.get_request_handler(request.headers).get_all_users(
+            offset=offset, limit=limit, include_count=include_count, fields=args.get('fields'))
 
     @token_required(Config.get_oauth2_provider())
     def post(self):
@@ -107,7 +114,8 @@ class UserDetailResource(UserResource):
 
     @token_required(Config.get_oauth2_provider())
     def get(self, mci_id: str):
-        return self.get_request_handler(request.headers).create_user_blob(mci_id)
+        return self.get_request_handler(request.headers).create_user_blob(
+            mci_id, if_none_match=request.if_none_match, fields=request.args.get('fields'))
 
     def post(self):
         pass
@@ -124,7 +132,8 @@ class SecureUserDetailResource(UserResource):
 
     @token_required(Config.get_oauth2_provider(), scopes=['mci.secure-user-detail:get'])
     def get(self, mci_id: str):
-        return self.get_request_handler(request.headers).create_secure_user_blob(mci_id)
+        return self.get_request_handler(request.headers).create_secure_user_blob(
+            mci_id, if_none_match=request.if_none_match, fields=request.args.get('fields'))
 
     def post(self):
         pass
@@ -142,3 +151,55 @@ class UserRemovePIIResource(UserResource):
     @token_required(Config.get_oauth2_provider())
     def post(self):
         return self.get_request_handler(request.headers).remove_pii(request)
+
+
+class UserBatchResource(UserResource):
+    """ A resource for looking up several users by their MCI IDs """
+
+    @token_required(Config.get_oauth2_provider())
+    def post(self):
+        return self.get_request_handler(request.headers).create_user_blobs(request)
+
+
+class UserBulkResource(UserResource):
+    """ A resource for registering many users from newline-delimited JSON """
+
+    @token_required(Config.get_oauth2_provider())
+    def post(self):
+        return self.get_request_handler(request.headers).create_new_users(request)
+
+
+class UserExportResource(UserResource):
+    """ A resource for streaming every user in the MCI """
+
+    @token_required(Config.get_oauth2_provider())
+    def get(self):
+        args = request.args
+        return self.get_request_handler(request.headers).export_users(
+            export_format=args.get('format', 'ndjson'), fields=args.get('fields'), since=args.get('since'))
+
+    def post(self):
+        pass
+
+    def put(self):
+        pass
+
+    def delete(self):
+        pass
+
+
+class PendingUserResource(UserResource):
+    """ The status of a registration deferred while the matching service is unavailable """
+
+    @token_required(Config.get_oauth2_provider())
+    def get(self, ticket_id: str):
+        return self.get_request_handler(request.headers).get_pending_registration(ticket_id)
+
+    def post(self):
+        pass
+
+    def put(self):
+        pass
+
+    def delete(self):
+        pass
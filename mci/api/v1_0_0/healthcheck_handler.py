@@ -6,6 +6,14 @@ Handle health check requests from the API.
 
 from datetime import datetime
 
+from mci.api.core.access_log import access_log
+from mci.api.core.address_index import address_index
+from mci.api.core.reference_data import reference_data
+from mci.api.core.user_cache import user_blobs
+from mci.api.core.verified_tokens import verified_tokens
+from mci.api.v1_0_0.helper_handler import list_responses
+from mci.matching import get_matching_client
+
 
 class HealthCheckHandler(object):
     """Health Check Handler.
@@ -16,7 +24,8 @@ class HealthCheckHandler(object):
         """ Returns basic API health check information.
 
         Returns:
-            dict: API health check status and other details.
+            dict: API health check status and other details, including the
+                matching service connection pool usage, access log and cache counters of this worker.
             int: HTTP Status Code
 
         """
@@ -24,5 +33,14 @@ class HealthCheckHandler(object):
             'api_name': 'BrightHive Master Client Index API',
             'current_time': str(datetime.utcnow()),
             'current_api_version': '1.0.0',
-            'api_status': 'OK'
+            'api_status': 'OK',
+            'matching_service': get_matching_client().stats(),
+            'access_log': access_log.stats(),
+            'caches': {
+                'addresses': address_index.stats(),
+                'helper_responses': list_responses.stats(),
+                'reference_data': reference_data.stats(),
+                'user_blobs': user_blobs.stats(),
+                'verified_tokens': verified_tokens.stats()
+            }
         }, 200
@@ -15,7 +15,13 @@ from mci_database.db.models import (Address, Disposition, EducationLevel,
 from sqlalchemy import func
 
 from mci.config import Config
-from mci.helpers import build_links, error_message, validate_email
+from mci.helpers import (TTLCache, build_links, compute_etag,
+                         conditional_response, error_message, validate_email)
+from mci.api.core.read_replica import read_replica
+from mci.api.core.reference_data import reference_data
+
+# lookup table model name -> (list response, ETag), shared by the requests of a worker
+list_responses = TTLCache(ttl=Config.get_helper_cache_ttl(), maxsize=16)
 
 
 class HelperHandler(object):
@@ -25,17 +31,21 @@ class HelperHandler(object):
 
     """
 
-    def get_all_education_levels(self):
+    def get_all_education_levels(self, if_none_match=None):
         """Return all education level codes."""
+        cached_response = self._get_cached_response(EducationLevel, if_none_match)
+        if cached_response is not None:
+            return cached_response
+
         try:
             response = {'education_levels': []}
-            education_levels = EducationLevel.query.all()
+            education_levels = read_replica.session().query(EducationLevel).all()
             for education_level in education_levels:
                 response['education_levels'].append({
                     'id': education_level.id,
                     'education_level': education_level.education_level
                 })
-            return response, 200
+            return self._cache_response(EducationLevel, response, if_none_match)
         except Exception as e:
             return {'error': 'Not Found {}'.format(e)}, 404
 
@@ -52,21 +62,27 @@ class HelperHandler(object):
                 education_level_obj['education_level'])
             db.session.add(education_level)
             db.session.commit()
+            reference_data.invalidate(EducationLevel)
+            list_responses.invalidate(EducationLevel.__name__)
             return {'success': 'New education level', 'id': education_level.id}, 201
         except Exception:
             return {'error': 'Invalid request'}, 400
 
-    def get_all_employment_status(self):
+    def get_all_employment_status(self, if_none_match=None):
         """Return all employment status codes."""
+        cached_response = self._get_cached_response(EmploymentStatus, if_none_match)
+        if cached_response is not None:
+            return cached_response
+
         try:
             response = {'employment_status': []}
-            employmet_statuses = EmploymentStatus.query.all()
+            employmet_statuses = read_replica.session().query(EmploymentStatus).all()
             for employment_status in employmet_statuses:
                 response['employment_status'].append({
                     'id': employment_status.id,
                     'employment_status': employment_status.employment_status
                 })
-            return response, 200
+            return self._cache_response(EmploymentStatus, response, if_none_match)
         except Exception as e:
             return {'error': 'Not Found {}'.format(e)}, 404
 
@@ -83,21 +99,27 @@ class HelperHandler(object):
                 employment_status_obj['employment_status'])
             db.session.add(employment_status)
             db.session.commit()
+            reference_data.invalidate(EmploymentStatus)
+            list_responses.invalidate(EmploymentStatus.__name__)
             return {'success': 'New employment status', 'id': employment_status.id}, 201
         except Exception:
             return {'error': 'Invalid request'}, 400
 
-    def get_all_ethnicities(self):
+    def get_all_ethnicities(self, if_none_match=None):
         """Return all ethnicity codes known to the application."""
+        cached_response = self._get_cached_response(EthnicityRace, if_none_match)
+        if cached_response is not None:
+            return cached_response
+
         try:
             response = {'ethnicities': []}
-            ethnicity_races = EthnicityRace.query.all()
+            ethnicity_races = read_replica.session().query(EthnicityRace).all()
             for ethnicity_race in ethnicity_races:
                 response['ethnicities'].append({
                     'id': ethnicity_race.id,
                     'ethnicity_Race': ethnicity_race.ethnicity_race
                 })
-            return response, 200
+            return self._cache_response(EthnicityRace, response, if_none_match)
         except Exception as e:
             return {'error': 'Not Found {}'.format(e)}, 404
 
@@ -113,21 +135,27 @@ class HelperHandler(object):
             ethnicity = EthnicityRace(ethnicity_obj['ethnicity_race'])
             db.session.add(ethnicity)
             db.session.commit()
+            reference_data.invalidate(EthnicityRace)
+            list_responses.invalidate(EthnicityRace.__name__)
             return {'success': 'New ethnicity created', 'id': ethnicity.id}, 201
         except Exception:
             return {'error': 'Invalid request'}, 400
 
-    def get_all_dispositions(self):
+    def get_all_dispositions(self, if_none_match=None):
         """Return all individual disposition codes."""
+        cached_response = self._get_cached_response(Disposition, if_none_match)
+        if cached_response is not None:
+            return cached_response
+
         try:
             response = {'dispositions': []}
-            dispositions = Disposition.query.all()
+            dispositions = read_replica.session().query(Disposition).all()
             for disposition in dispositions:
                 response['dispositions'].append({
                     'id': disposition.id,
                     'disposition': disposition.disposition
                 })
-            return response, 200
+            return self._cache_response(Disposition, response, if_none_match)
         except Exception as e:
             return {'error': 'Not Found {}'.format(e)}, 404
 
@@ -143,15 +171,17 @@ class HelperHandler(object):
             disposition = Disposition(disposition_obj['disposition'])
             db.session.add(disposition)
             db.session.commit()
+            reference_data.invalidate(Disposition)
+            list_responses.invalidate(Disposition.__name__)
             return {'success': 'New disposition created', 'id': disposition.id}, 201
         except Exception:
             return {'error': 'Invalid request'}, 400
 
-    def get_all_addresses(self):
+    def get_all_addresses(self, if_none_match=None):
         """Return all addresses known to the application."""
         try:
             response = {'addresses': []}
-            addresses = Address.query.all()
+            addresses = read_replica.session().query(Address).all()
             for address in addresses:
                 response['addresses'].append({
                     'id': address.id,
@@ -160,7 +190,7 @@ class HelperHandler(object):
                     'postal_code': address.postal_code,
                     'country': address.country
                 })
-            return response, 200
+            return conditional_response(response, 200, if_none_match)
         except Exception as e:
             return {'error': 'Not Found {}'.format(e)}, 404
 
@@ -181,17 +211,21 @@ class HelperHandler(object):
         except Exception:
             return {'error': 'Invalid request'}, 400
 
-    def get_all_sources(self):
+    def get_all_sources(self, if_none_match=None):
         """Return all sources known to the application."""
+        cached_response = self._get_cached_response(Source, if_none_match)
+        if cached_response is not None:
+            return cached_response
+
         try:
             response = {'sources': []}
-            sources = Source.query.all()
+            sources = read_replica.session().query(Source).all()
             for source in sources:
                 response['sources'].append({
                     'id': source.id,
                     'source': source.source
                 })
-            return response, 200
+            return self._cache_response(Source, response, if_none_match)
         except Exception:
             return {'error': 'Not Found {}'}, 404
 
@@ -207,21 +241,27 @@ class HelperHandler(object):
             source = Source(source_obj['source'])
             db.session.add(source)
             db.session.commit()
+            reference_data.invalidate(Source)
+            list_responses.invalidate(Source.__name__)
             return {'success': 'New source created', 'id': source.id}, 201
         except Exception:
             return {'error': 'Invalid request'}, 400
 
-    def get_all_genders(self):
+    def get_all_genders(self, if_none_match=None):
         """Return all genders known to the application."""
+        cached_response = self._get_cached_response(Gender, if_none_match)
+        if cached_response is not None:
+            return cached_response
+
         try:
             response = {'genders': []}
-            genders = Gender.query.all()
+            genders = read_replica.session().query(Gender).all()
             for gender in genders:
                 response['genders'].append({
                     'id': gender.id,
                     'gender': gender.gender
                 })
-            return response, 200
+            return self._cache_response(Gender, response, if_none_match)
         except Exception:
             return {'error': 'Not Found'}, 404
 
@@ -237,6 +277,42 @@ class HelperHandler(object):
             gender = Gender(source_obj['gender'])
             db.session.add(gender)
             db.session.commit()
+            reference_data.invalidate(Gender)
+            list_responses.invalidate(Gender.__name__)
             return {'success': 'New gender created', 'id': gender.id}, 201
         except Exception:
             return {'error': 'Invalid request'}, 400
+
+    def _get_cached_response(self, model, if_none_match=None):
+        """Answer a lookup table listing from the response cache.
+
+        Args:
+            model (db.Model): The lookup table model.
+            if_none_match (ETags): Entity tags from the client's `If-None-Match` header.
+
+        Returns:
+            The cached response, or None if the listing is not cached.
+
+        """
+        cached = list_responses.get(model.__name__)
+        if cached is None:
+            return None
+
+        response, etag = cached
+        return conditional_response(response, 200, if_none_match, etag=etag)
+
+    def _cache_response(self, model, response, if_none_match=None):
+        """Store a lookup table listing in the response cache and answer with it.
+
+        Args:
+            model (db.Model): The lookup table model.
+            response (dict): The listing.
+            if_none_match (ETags): Entity tags from the client's `If-None-Match` header.
+
+        Returns:
+            The response, honouring `If-None-Match`.
+
+        """
+        etag = compute_etag(response)
+        list_responses.set(model.__name__, (response, etag))
+        return conditional_response(response, 200, if_none_match, etag=etag)
@@ -0,0 +1,39 @@
+"""Metrics Handler
+
+Handle metrics requests from the API.
+
+"""
+
+import hmac
+
+from flask import Response
+
+from mci.config import Config
+from mci.helpers import error_message
+from mci.instrumentation import CONTENT_TYPE, metrics
+
+
+class MetricsHandler(object):
+    """Metrics Handler.
+
+    """
+
+    def get_metrics(self, headers):
+        """Returns the metrics of every worker of this host.
+
+        Args:
+            headers (dict): HTTP request headers, holding the `METRICS_TOKEN` bearer token.
+
+        Returns:
+            Response: The metrics in the Prometheus text exposition format.
+
+        """
+        token = Config.get_metrics_token()
+        if token is None:
+            return error_message('Metrics are not enabled.', 404)
+
+        authorization = headers.get('Authorization', '')
+        if not hmac.compare_digest(authorization.encode('utf-8'), 'Bearer {}'.format(token).encode('utf-8')):
+            return {'message': 'Access Denied'}, 401
+
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
@@ -4,18 +4,30 @@ Handle user endpoint requests from the API.
 
 """
 
+import csv
+import io
 import json
-import os
+import logging
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-import requests
-from requests.exceptions import ConnectionError
-from sqlalchemy import func
-from sqlalchemy.exc import IntegrityError
-
-from mci.config import Config, ConfigurationFactory
-from mci.helpers import build_links, error_message, validate_email
+from flask import Response, stream_with_context
+from requests.exceptions import ConnectionError, RequestException, Timeout
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Load, joinedload
+
+from mci.config import ConfigurationFactory, settings
+from mci.helpers import (build_cursor_links, build_links, compute_etag,
+                         conditional_response, decode_cursor, encode_cursor,
+                         error_message, validate_email)
+from mci.api.core.address_index import address_index, normalize_address
+from mci.api.core.read_replica import read_replica
+from mci.api.core.reference_data import reference_data
+from mci.api.core.representations import dumps
+from mci.api.core.row_counts import row_counts
+from mci.api.core.user_cache import user_blobs
+from mci.matching import CircuitOpenError, get_matching_client, pending_matches
 from mci.api.errors import IndividualDoesNotExist
 from mci_database.db import db
 from mci_database.db.models import (Address, Disposition, EducationLevel,
@@ -24,6 +36,64 @@ from mci_database.db.models import (Address, Disposition, EducationLevel,
                                     IndividualPIIRemoval)
 
 config = ConfigurationFactory.from_env()
+logger = logging.getLogger(__name__)
+
+# user blob field, in response order -> (Individual columns it reads, related model it reads)
+USER_FIELDS = OrderedDict([
+    ('mci_id', (('mci_id',), None)),
+    ('vendor_id', (('vendor_id',), None)),
+    ('registration_date', (('registration_date',), None)),
+    ('vendor_creation_date', (('vendor_creation_date',), None)),
+    ('ssn', (('ssn',), None)),
+    ('first_name', (('first_name',), None)),
+    ('suffix', (('suffix',), None)),
+    ('last_name', (('last_name',), None)),
+    ('middle_name', (('middle_name',), None)),
+    ('mailing_address', ((), Address)),
+    ('date_of_birth', (('date_of_birth',), None)),
+    ('email_address', (('email_address',), None)),
+    ('telephone', (('telephone',), None)),
+    ('gender', ((), Gender)),
+    ('ethnicity_race', ((), None)),
+    ('education_level', ((), None)),
+    ('employment_status', ((), EmploymentStatus)),
+    ('source', ((), Source))
+])
+
+# fields returned for each user by the listings unless `fields` is given
+LISTING_FIELDS = ['mci_id', 'first_name', 'last_name', 'suffix']
+
+# related model -> condition joining it to Individual
+USER_JOINS = OrderedDict([
+    (Address, Address.id == Individual.mailing_address_id),
+    (Gender, Gender.id == Individual.gender_id),
+    (Source, Source.id == Individual.source_id),
+    (EmploymentStatus, EmploymentStatus.id == Individual.employment_status_id)
+])
+
+# export field name -> (column, model the column needs joined)
+EXPORT_FIELDS = OrderedDict([
+    ('mci_id', (Individual.mci_id, None)),
+    ('vendor_id', (Individual.vendor_id, None)),
+    ('registration_date', (Individual.registration_date, None)),
+    ('vendor_creation_date', (Individual.vendor_creation_date, None)),
+    ('first_name', (Individual.first_name, None)),
+    ('middle_name', (Individual.middle_name, None)),
+    ('last_name', (Individual.last_name, None)),
+    ('suffix', (Individual.suffix, None)),
+    ('date_of_birth', (Individual.date_of_birth, None)),
+    ('email_address', (Individual.email_address, None)),
+    ('telephone', (Individual.telephone, None)),
+    ('address', (Address.address, Address)),
+    ('city', (Address.city, Address)),
+    ('state', (Address.state, Address)),
+    ('postal_code', (Address.postal_code, Address)),
+    ('county', (Address.county, Address)),
+    ('country', (Address.country, Address)),
+    ('gender', (Gender.gender, Gender)),
+    ('employment_status', (EmploymentStatus.employment_status, EmploymentStatus)),
+    ('source', (Source.source, Source))
+])
 
 
 class UserHandler(object):
@@ -31,87 +101,530 @@ class UserHandler(object):
     A class for handling all requests made to the users endpoint.
     """
 
-    def create_user_blob(self, mci_id: str):
+    def create_user_blob(self, mci_id: str, if_none_match=None, fields=None):
         """
         Creates an object with data of an existing user.
         Called when GETing the `user` endpoint with an MCI ID.
 
+        Blobs are cached when a shared cache is configured (see `mci.api.core.user_cache`).
+
         Args:
             mci_id (str): The MCI ID to query for.
+            if_none_match (ETags): Entity tags from the client's `If-None-Match` header.
+            fields (str): Comma separated names of the fields to return (defaults to all fields).
 
         Return:
-            dict, int: An object representing the specified user and the associated error code.
-        """
-        user_obj = self._get_user(mci_id)
-
-        user = {
-            'mci_id': user_obj.mci_id,
-            'vendor_id': '' if user_obj.vendor_id is None else user_obj.vendor_id,
-            'registration_date': '' if user_obj.registration_date is None else datetime.strftime(user_obj.registration_date, '%Y-%m-%d'),
-            'vendor_creation_date': '' if user_obj.vendor_creation_date is None else datetime.strftime(user_obj.vendor_creation_date, '%Y-%m-%d'),
-            # 'ssn': '' if user_obj.ssn is None else user_obj.ssn,
-            'first_name': '' if user_obj.first_name is None else user_obj.first_name,
-            'suffix': '' if user_obj.suffix is None else user_obj.suffix,
-            'last_name': '' if user_obj.last_name is None else user_obj.last_name,
-            'middle_name': '' if user_obj.middle_name is None else user_obj.middle_name,
-            'mailing_address': self._get_mailing_address(user_obj),
-            'date_of_birth': '' if user_obj.date_of_birth is None else str(user_obj.date_of_birth),
-            'email_address': '' if user_obj.email_address is None else user_obj.email_address,
-            'telephone': '' if user_obj.telephone is None else user_obj.telephone,
-            'gender': self._find_gender_type(user_obj),
-            'ethnicity_race': self._find_user_ethnicity(user_obj),
-            'education_level': '',
-            'employment_status': self._find_employment_status_type(user_obj),
-            'source': self._find_source_type(user_obj)
-        }
-        return user, 200
+            dict, int, dict: An object representing the specified user, the associated error code and its `ETag`,
+                or an empty `304 Not Modified` response if the client's copy is current.
+        """
+        try:
+            fields = self._parse_fields(fields)
+        except ValueError as e:
+            return error_message(str(e))
+
+        cached, version = user_blobs.lookup(mci_id, fields)
+        if cached is not None:
+            user, etag = cached
+        else:
+            user = self._build_user_blob(self._get_user_detail(mci_id, fields), fields=fields)
+            etag = compute_etag(user)
+            user_blobs.store(mci_id, fields, version, user, etag)
 
-    def create_secure_user_blob(self, mci_id: str):
+        return conditional_response(user, 200, if_none_match, etag=etag)
+
+    def create_secure_user_blob(self, mci_id: str, if_none_match=None, fields=None):
         """
-        Creates an object with data of an existing user.
-        Called when GETing the `user` endpoint with an MCI ID.
+        Creates an object with data of an existing user, including sensitive fields.
+        Called when GETing the `user-details` endpoint with an MCI ID.
+
+        These blobs include the SSN and are never cached.
 
         Args:
             mci_id (str): The MCI ID to query for.
+            if_none_match (ETags): Entity tags from the client's `If-None-Match` header.
+            fields (str): Comma separated names of the fields to return (defaults to all fields).
 
         Return:
-            dict, int: An object representing the specified user and the associated error code.
-        """
-        user_obj = self._get_user(mci_id)
-
-        user = {
-            'mci_id': user_obj.mci_id,
-            'vendor_id': '' if user_obj.vendor_id is None else user_obj.vendor_id,
-            'registration_date': '' if user_obj.registration_date is None else datetime.strftime(user_obj.registration_date, '%Y-%m-%d'),
-            'vendor_creation_date': '' if user_obj.vendor_creation_date is None else datetime.strftime(user_obj.vendor_creation_date, '%Y-%m-%d'),
-            'ssn': '' if user_obj.ssn is None else user_obj.ssn,
-            'first_name': '' if user_obj.first_name is None else user_obj.first_name,
-            'suffix': '' if user_obj.suffix is None else user_obj.suffix,
-            'last_name': '' if user_obj.last_name is None else user_obj.last_name,
-            'middle_name': '' if user_obj.middle_name is None else user_obj.middle_name,
-            'mailing_address': self._get_mailing_address(user_obj),
-            'date_of_birth': '' if user_obj.date_of_birth is None else str(user_obj.date_of_birth),
-            'email_address': '' if user_obj.email_address is None else user_obj.email_address,
-            'telephone': '' if user_obj.telephone is None else user_obj.telephone,
-            'gender': self._find_gender_type(user_obj),
-            'ethnicity_race': self._find_user_ethnicity(user_obj),
-            'education_level': '',
-            'employment_status': self._find_employment_status_type(user_obj),
-            'source': self._find_source_type(user_obj)
-        }
-        return user, 200
+            dict, int, dict: An object representing the specified user, the associated error code and its `ETag`,
+                or an empty `304 Not Modified` response if the client's copy is current.
+        """
+        try:
+            fields = self._parse_fields(fields, secure=True)
+        except ValueError as e:
+            return error_message(str(e))
+
+        user = self._build_user_blob(
+            self._get_user_detail(mci_id, fields), secure=True, fields=fields)
+        return conditional_response(user, 200, if_none_match)
+
+    def create_user_blobs(self, request_obj):
+        """
+        Creates objects with data of several existing users.
+        Called when POSTing a list of MCI IDs to the `users/batch` endpoint.
+
+        Args:
+            request_obj (Request): Request whose JSON body holds an `mci_ids` array.
+
+        Return:
+            dict, int: One result per requested MCI ID, in request order, and the associated error code.
+                Unknown MCI IDs are reported in their own result rather than failing the batch.
+        """
+        try:
+            mci_ids = request_obj.json['mci_ids']
+        except Exception:
+            return error_message('Malformed or empty JSON object found. Please include JSON with an mci_ids array in the request body.')
+
+        if not isinstance(mci_ids, list) or not all(isinstance(mci_id, str) for mci_id in mci_ids):
+            return error_message('mci_ids must be an array of MCI IDs.')
+
+        batch_limit = settings.current.batch_limit
+        if len(mci_ids) > batch_limit:
+            return error_message('A batch may contain at most {} MCI IDs.'.format(batch_limit), 413)
+
+        users = {}
+        unique_mci_ids = list(OrderedDict.fromkeys(mci_ids))
+        if len(unique_mci_ids) > 0:
+            user_details = self._user_detail_query()\
+                .filter(Individual.mci_id.in_(unique_mci_ids))
+            for user_detail in user_details:
+                users[user_detail[0].mci_id] = self._build_user_blob(user_detail)
+
+        response = {'users': []}
+        for mci_id in mci_ids:
+            if mci_id in users:
+                response['users'].append({
+                    'mci_id': mci_id,
+                    'status': 200,
+                    'user': users[mci_id]
+                })
+            else:
+                response['users'].append({
+                    'mci_id': mci_id,
+                    'status': 410,
+                    'error': 'An individual with that ID does not exist in the MCI.'
+                })
+
+        return response, 200
 
     def create_new_user(self, user_object):
         """
         Creates a new user.
         Called when POSTing to the `users` endpoint.
         """
-        errors = []
         try:
             user = user_object.json
         except Exception:
             return error_message('Malformed or empty JSON object found in request body.')
 
+        # the registration is a single unit of work: any new address is only
+        # created once the matching service has answered, and saved together
+        # with the new individual by one commit
+        new_user, mailing_address, errors = self._build_individual(user)
+        self._discard(new_user)
+
+        if len(errors) == 0:
+            new_user_json = json.dumps(new_user.as_dict, default=str)
+            try:
+                match_data = self._match_data(get_matching_client().match(new_user_json))
+            except CircuitOpenError:
+                if settings.current.matching_deferred_mode and pending_matches.enabled:
+                    return self._defer_registration(user)
+                return {
+                    'error': 'The matching service is unavailable.'
+                }, 503, {'Retry-After': str(get_matching_client().breaker.retry_after())}
+            except (ConnectionError, Timeout):
+                return {
+                    'error': 'The matching service did not return a response.'
+                }, 400
+            except ValueError:
+                return {
+                    'error': 'The matching service returned an invalid response.'
+                }, 400
+            else:
+                return self._handle_match_response(
+                    match_data=match_data, new_user=new_user, mailing_address=mailing_address)
+        else:
+            return {
+                'error': errors
+            }, 400
+
+    def get_pending_registration(self, ticket_id: str):
+        """
+        Retrieve the status of a deferred registration.
+        Called when GETing the status URL returned with a `202 Accepted` registration.
+
+        Args:
+            ticket_id (str): The ticket ID of the deferred registration.
+
+        Return:
+            dict, int: The registration status and the associated status code.
+        """
+        record = pending_matches.status(ticket_id)
+        if record is None:
+            return error_message('No pending registration with that ID exists.', 404)
+
+        status_codes = {
+            'pending': 202,
+            'created': 201,
+            'matched': 200,
+            'failed': 400
+        }
+        return record, status_codes.get(record['status'], 200)
+
+    def complete_pending_registration(self, user: dict):
+        """Register an individual whose registration was deferred.
+
+        Note:
+            Called by the pending match worker with an application context.
+
+        Args:
+            user (dict): The registration payload.
+
+        Return:
+            dict: The outcome (`status`, and `mci_id` or `errors`).
+
+        Raises:
+            RequestException: If the matching service is still unavailable, failed
+                or returned an invalid response.
+        """
+        new_user, mailing_address, errors = self._build_individual(user)
+        self._discard(new_user)
+        if len(errors) > 0:
+            return {'status': 'failed', 'errors': errors}
+
+        new_user_json = json.dumps(new_user.as_dict, default=str)
+        response = get_matching_client().match(new_user_json)
+        # a failing matching service is retried later rather than failing the registration
+        if response.status_code >= 500:
+            raise RequestException('The matching service failed.', response=response)
+        try:
+            match_data = self._match_data(response)
+        except ValueError as e:
+            raise RequestException(str(e), response=response)
+
+        result, status_code = self._handle_match_response(
+            match_data=match_data, new_user=new_user, mailing_address=mailing_address)
+        result['status'] = 'matched' if status_code == 200 else 'created'
+        return result
+
+    def create_new_users(self, request_obj):
+        """
+        Creates new users from a stream of registration payloads.
+        Called when POSTing newline-delimited JSON to the `users/bulk` endpoint.
+
+        Every line is validated and matched like a `POST /users` body. Lines are
+        processed in batches: the candidates of a batch are sent to the matching
+        service concurrently and the new individuals are saved with one commit.
+
+        Args:
+            request_obj (Request): Request whose body holds one JSON object per line.
+
+        Return:
+            Response: One newline-delimited JSON result per line, streamed as each is known.
+        """
+        current_settings = settings.current
+        batch_size = current_settings.bulk_batch_size
+        concurrency = current_settings.bulk_match_concurrency
+        stream = request_obj.stream
+
+        def generate():
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                batch = []
+                for line_number, line in enumerate(iter(stream.readline, b''), start=1):
+                    if len(line.strip()) == 0:
+                        continue
+                    batch.append((line_number, line))
+                    if len(batch) == batch_size:
+                        for result in self._ingest_batch(batch, executor):
+                            yield dumps(result) + '\n'
+                        batch = []
+
+                if len(batch) > 0:
+                    for result in self._ingest_batch(batch, executor):
+                        yield dumps(result) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    def get_all_users(self, offset=0, limit=20, include_count=True, fields=None):
+        """
+        Retrieve all users.
+        Called when GETing the `users` endpoint.
+
+        Args:
+            offset (int): Database offset to look up datasets by
+            limit (int): Number of results to return in the query set.
+            include_count (bool): Count the users to build a `last` link (see `COUNT_STRATEGY`).
+            fields (str): Comma separated names of the fields to return for each user
+                (defaults to `LISTING_FIELDS`).
+
+        """
+
+        status_code = 200
+        try:
+            offset = int(offset)
+            limit = int(limit)
+            if offset < 0 or limit < 0:
+                return error_message('Offset and Limit must be positive integers.')
+            limit = min(limit, settings.current.page_limit)
+        except Exception:
+            return error_message('Offset and Limit must be integers.')
+
+        link_params = None if fields is None else {'fields': fields}
+        try:
+            fields = self._parse_fields(fields) or LISTING_FIELDS
+        except ValueError as e:
+            return error_message(str(e))
+
+        # fetch one extra row to learn whether another page follows
+        users = self._user_detail_query(fields).order_by(Individual.id).limit(limit + 1).offset(offset).all()
+        has_more = len(users) > limit
+        users = users[:limit]
+
+        row_count = row_counts.count(Individual) if include_count else None
+        if row_count == 0 or (row_count is None and offset == 0 and len(users) == 0):
+            links = []
+        else:
+            links = build_links('users', offset, limit, row_count, has_more=has_more, params=link_params)
+
+        response = OrderedDict()
+        response['users'] = []
+
+        for user_detail in users:
+            response['users'].append(self._build_user_blob(user_detail, fields=fields))
+
+        response['links'] = links
+        return response, status_code
+
+    def get_users_by_cursor(self, cursor='', limit=20, include_count=False, fields=None):
+        """
+        Retrieve a page of users using keyset pagination.
+        Called when GETing the `users` endpoint with a `cursor` parameter.
+
+        Pages are ordered on the indexed `mci_id` column and each page is located with
+        a range condition on that key rather than an offset, so deep pages cost the
+        same as the first one.
+
+        Args:
+            cursor (str): Opaque cursor from a previous page's links (empty for the first page).
+            limit (int): Number of results to return in the query set.
+            include_count (bool): Include the total number of users in the response.
+            fields (str): Comma separated names of the fields to return for each user
+                (defaults to `LISTING_FIELDS`).
+
+        """
+
+        status_code = 200
+        try:
+            limit = int(limit)
+            if limit < 0:
+                return error_message('Limit must be a positive integer.')
+            limit = min(limit, settings.current.page_limit)
+        except Exception:
+            return error_message('Limit must be an integer.')
+
+        link_params = None if fields is None else {'fields': fields}
+        try:
+            fields = self._parse_fields(fields) or LISTING_FIELDS
+        except ValueError as e:
+            return error_message(str(e))
+
+        direction, key = 'next', None
+        if cursor:
+            try:
+                direction, key = decode_cursor(cursor)
+            except ValueError as e:
+                return error_message(str(e))
+
+        query = self._user_detail_query(fields)
+        if direction == 'next':
+            if key is not None:
+                query = query.filter(Individual.mci_id > key)
+            query = query.order_by(Individual.mci_id.asc())
+        else:
+            query = query.filter(Individual.mci_id < key).order_by(Individual.mci_id.desc())
+
+        # fetch one extra row to learn whether another page follows
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == 'prev':
+            rows.reverse()
+        mci_ids = [(row if isinstance(row, Individual) else row[0]).mci_id for row in rows]
+
+        next_cursor = None
+        prev_cursor = None
+        if len(rows) > 0:
+            if direction == 'next':
+                if has_more:
+                    next_cursor = encode_cursor('next', mci_ids[-1])
+                if key is not None:
+                    prev_cursor = encode_cursor('prev', mci_ids[0])
+            else:
+                next_cursor = encode_cursor('next', mci_ids[-1])
+                if has_more:
+                    prev_cursor = encode_cursor('prev', mci_ids[0])
+
+        response = OrderedDict()
+        response['users'] = []
+
+        for user_detail in rows:
+            response['users'].append(self._build_user_blob(user_detail, fields=fields))
+
+        if include_count:
+            response['total'] = row_counts.count(Individual)
+
+        response['links'] = build_cursor_links('users', limit, cursor, next_cursor, prev_cursor,
+                                               params=link_params)
+        return response, status_code
+
+    def export_users(self, export_format='ndjson', fields=None, since=None):
+        """
+        Stream every individual in the MCI.
+        Called when GETing the `users/export` endpoint.
+
+        Rows are read from a server-side cursor `EXPORT_FETCH_SIZE` rows at a time
+        and only the requested columns are selected, so memory use does not grow
+        with the size of the index.
+
+        Args:
+            export_format (str): `ndjson` or `csv`.
+            fields (str): Comma separated names of the fields to export (defaults to all of `EXPORT_FIELDS`).
+            since (str): Only export individuals registered on or after this date (YYYY-MM-DD).
+
+        Return:
+            Response: The individuals, one per line.
+
+        """
+        if export_format not in ('ndjson', 'csv'):
+            return error_message('Format must be ndjson or csv.')
+
+        if fields:
+            field_names = [field.strip() for field in fields.split(',') if field.strip()]
+            unknown_fields = [field for field in field_names if field not in EXPORT_FIELDS]
+            if len(unknown_fields) > 0:
+                return error_message('Unknown export fields: {}.'.format(', '.join(unknown_fields)))
+        else:
+            field_names = list(EXPORT_FIELDS.keys())
+
+        since_date = None
+        if since:
+            try:
+                since_date = datetime.strptime(since, '%Y-%m-%d')
+            except ValueError:
+                return error_message('Since must be a date formatted as YYYY-MM-DD.')
+
+        query = self._export_query(field_names, since_date)
+
+        def generate():
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(field_names)
+                for row in query:
+                    writer.writerow(self._export_values(field_names, row))
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            else:
+                for row in query:
+                    yield dumps(OrderedDict(zip(field_names, self._export_values(field_names, row)))) + '\n'
+
+        if export_format == 'csv':
+            mimetype = 'text/csv'
+        else:
+            mimetype = 'application/x-ndjson'
+        return Response(stream_with_context(generate()), mimetype=mimetype)
+
+    def remove_pii(self, request):
+        json_payload = request.json
+
+        try:
+            mci_id = json_payload['mci_id']
+        except Exception:
+            return {'message': 'Malformed or empty JSON object found. Please include JSON with an mci_id in the request body.'}, 400
+
+        comment = None
+        if "comment" in json_payload.keys():
+            comment = json_payload['comment']
+
+        user = self._get_user(mci_id)
+
+        # make cached blobs unreachable before the PII is removed, and refuse to
+        # remove it if that fails, so that no cached copy can outlive it
+        try:
+            user_blobs.invalidate(mci_id)
+        except Exception as e:
+            logger.error('Failed to invalidate the cached blobs of {}: {}'.format(mci_id, str(e)))
+            return {'message': 'The PII could not be removed, please try again later.'}, 503
+
+        user.first_name = None
+        user.middle_name = None
+        user.last_name = None
+        user.suffix = None
+        user.email_address = None
+        user.telephone = None
+        user.telephone_2 = None
+        user.telephone_3 = None
+        user.mailing_address_id = None
+        user.date_of_birth = None
+        user.ssn = None
+
+        db.session.commit()
+        self._invalidate_cached_blobs(mci_id)
+
+        pii_removal_data = {
+            "individual_id": user.mci_id,
+            "comment": comment,
+        }
+        pii_removal = IndividualPIIRemoval(**pii_removal_data)
+        db.session.add(pii_removal)
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            return {"message": "Nothing to do. PII has already been removed for this individual"}, 200
+
+        return {"message": "Success! PII removed for individual with MCI ID {}".format(mci_id)}, 201
+
+    # (Private) helper functions
+    def _invalidate_cached_blobs(self, mci_id: str):
+        """Invalidate the cached blobs of an individual again once their change is committed.
+
+        This restarts the period during which the individual is not cached, so blobs
+        read from a lagging read replica after the commit are not cached either.
+
+        Args:
+            mci_id (str): The MCI ID.
+
+        """
+        try:
+            user_blobs.invalidate(mci_id)
+        except Exception as e:
+            logger.error('Failed to invalidate the cached blobs of {}: {}'.format(mci_id, str(e)))
+
+    def _get_user(self, mci_id: str):
+        user_obj = Individual.query.filter_by(mci_id=mci_id).first()
+        if not user_obj:
+            raise IndividualDoesNotExist
+
+        return user_obj
+
+    def _build_individual(self, user: dict):
+        """Build a new individual from a registration payload.
+
+        Args:
+            user (dict): The registration payload.
+
+        Note:
+            Nothing is written: a new mailing address is returned normalized, to be
+            created by `_save_individual` if no existing individual matches.
+
+        Return:
+            Individual, dict, list: The new (unsaved) individual, its new mailing address
+                (or None if it has none or the address exists) and any validation errors.
+        """
+        errors = []
+        mailing_address = None
         new_user = Individual()
         # basic user information
         if 'vendor_id' in user.keys():
@@ -151,7 +664,7 @@ class UserHandler(object):
                 if address['error'] is not None:
                     errors.append(address['error'])
                 else:
-                    errors.append('Invalid Mailing Address format.')
+                    mailing_address = address['values']
 
         if 'gender' in user.keys():
             gender = self._find_gender_id(user['gender'])
@@ -208,121 +721,436 @@ class UserHandler(object):
         if 'vendor_creation_date' in user.keys():
             new_user.vendor_creation_date = user['vendor_creation_date']
 
-        if len(errors) == 0:
-            matching_service_uri = config.get_matching_service_uri()
+        return new_user, mailing_address, errors
+
+    def _detach(self, new_user: Individual):
+        """Keep a new individual out of the session until it is explicitly saved.
+
+        Appending persistent lookup rows (e.g. ethnicities) to a new individual may
+        cascade it into the session, where a commit made for another row would save it.
+
+        Args:
+            new_user (Individual): The new individual.
+
+        """
+        if new_user in db.session:
+            db.session.expunge(new_user)
+
+    def _discard(self, new_user: Individual):
+        """Keep a new individual out of the session and end the lookups' transaction.
+
+        Called before the matching service is, so no transaction is held open
+        while waiting for it.
+
+        Args:
+            new_user (Individual): The new individual.
+
+        """
+        self._detach(new_user)
+        db.session.rollback()
+
+    def _save_individual(self, new_user: Individual, mailing_address: dict = None):
+        """Add a new individual to the session, creating its mailing address if it is new.
+
+        Note:
+            Called once the matching service found no existing individual. On
+            PostgreSQL the address lock is held until the caller commits.
+
+        Args:
+            new_user (Individual): The new individual.
+            mailing_address (dict): Its new normalized mailing address, if any.
+
+        """
+        if mailing_address is not None:
+            new_user.mailing_address_id, _ = address_index.resolve(mailing_address)
+        db.session.add(new_user)
+
+    def _defer_registration(self, user: dict):
+        """Accept a validated registration into the pending match queue.
+
+        Args:
+            user (dict): The registration payload.
+
+        Return:
+            dict, int, dict: The ticket, `202 Accepted` and the status URL as `Location`.
+        """
+        ticket_id = pending_matches.enqueue(user)
+        status_url = '/users/pending/{}'.format(ticket_id)
+
+        return {
+            'status': 'pending',
+            'ticket_id': ticket_id,
+            'status_url': status_url
+        }, 202, {'Location': status_url}
+
+    def _ingest_batch(self, batch: list, executor: ThreadPoolExecutor):
+        """Validate, match and save one batch of bulk registration lines.
+
+        Args:
+            batch (list): (line number, raw line) pairs.
+            executor (ThreadPoolExecutor): Pool bounding the concurrent matching service calls.
+
+        Yields:
+            dict: The result for each line of the batch.
+        """
+        candidates = {}
+
+        for line_number, line in batch:
+            try:
+                user = json.loads(line)
+                new_user, mailing_address, errors = self._build_individual(user)
+            except Exception:
+                yield self._bulk_result(line_number, 'error', errors=['Malformed or invalid JSON object.'])
+                continue
+
+            self._detach(new_user)
+            if len(errors) > 0:
+                yield self._bulk_result(line_number, 'error', errors=errors)
+                continue
+
             new_user_json = json.dumps(new_user.as_dict, default=str)
+            future = executor.submit(self._request_match, new_user_json)
+            candidates[future] = (line_number, new_user, mailing_address)
+
+        # only lookups ran so far: no transaction is held open while the matches are computed
+        db.session.rollback()
+
+        created = []
+        for future in as_completed(candidates):
+            line_number, new_user, mailing_address = candidates[future]
             try:
-                response = requests.post(
-                    matching_service_uri, data=new_user_json, timeout=5)
-            except ConnectionError:
-                return {
-                    'error': 'The matching service did not return a response.'
-                }, 400
+                match_data = future.result()
+            except RequestException:
+                yield self._bulk_result(line_number, 'error', errors=['The matching service did not return a response.'])
+                continue
+            except ValueError:
+                yield self._bulk_result(line_number, 'error', errors=['The matching service returned an invalid response.'])
+                continue
+
+            if self._is_match(match_data):
+                yield self._bulk_result(line_number, 'matched', mci_id=match_data['mci_id'],
+                                        match_probability=match_data['score'])
+                continue
+
+            # a line that cannot be saved only rolls back its own rows
+            savepoint = db.session.begin_nested()
+            try:
+                self._save_individual(new_user, mailing_address)
+                db.session.flush()
+            except SQLAlchemyError:
+                savepoint.rollback()
+                self._detach(new_user)
+                yield self._bulk_result(line_number, 'error', errors=['Unable to save the individual.'])
             else:
-                return self._handle_match_response(response=response, new_user=new_user)
+                savepoint.commit()
+                created.append((line_number, new_user))
+
+        # the batch transaction always ends here, releasing any address lock it holds
+        if len(created) == 0:
+            db.session.rollback()
+            return
+
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            for line_number, _ in created:
+                yield self._bulk_result(line_number, 'error', errors=['Unable to save the individual.'])
         else:
-            return {
-                'error': errors
-            }, 400
+            for line_number, new_user in created:
+                yield self._bulk_result(line_number, 'created', mci_id=new_user.mci_id)
 
-    def get_all_users(self, offset=0, limit=20):
-        """
-        Retrieve all users.
-        Called when GETing the `users` endpoint.
+    def _bulk_result(self, line_number: int, status: str, mci_id=None, errors=None, match_probability=None):
+        """Describe the outcome of one bulk registration line.
 
         Args:
-            offset (int): Database offset to look up datasets by
-            limit (int): Number of results to return in the query set.
+            line_number (int): Line of the request body the result belongs to.
+            status (str): One of `created`, `matched` or `error`.
+            mci_id (str): MCI ID of the created or matched individual.
+            errors (list): Validation or processing errors.
+            match_probability (float): Score reported by the matching service for a match.
 
+        Return:
+            dict: The line result.
         """
+        result = {
+            'line': line_number,
+            'status': status,
+            'mci_id': mci_id,
+            'errors': [] if errors is None else errors
+        }
+        if match_probability is not None:
+            result['match_probability'] = match_probability
 
-        status_code = 200
-        try:
-            offset = int(offset)
-            limit = int(limit)
-            if offset < 0 or limit < 0:
-                return error_message('Offset and Limit must be positive integers.')
-            if limit > Config.get_page_limit():
-                limit = Config.get_page_limit()
-        except Exception:
-            return error_message('Offset and Limit must be integers.')
+        return result
 
-        users = Individual.query.limit(limit).offset(offset)
-        row_count = Individual.query.count()
-        if row_count > 0:
-            links = build_links('users', offset, limit, row_count)
-        else:
-            links = []
+    def _request_match(self, new_user_json: str):
+        """Ask the matching service for an existing individual matching a candidate.
 
-        response = OrderedDict()
-        response['users'] = []
+        Note:
+            Called from the bulk registration worker threads, so it must not touch the session.
 
-        for user in users:
-            response['users'].append({
-                'mci_id': user.mci_id,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'suffix': user.suffix
-            })
+        Args:
+            new_user_json (str): The serialized candidate.
 
-        response['links'] = links
-        return response, status_code
+        Return:
+            dict: The match data (`mci_id` and `score`).
 
-    def remove_pii(self, request):
-        json_payload = request.json
+        Raises:
+            RequestException: If the matching service could not be reached or timed out.
+            ValueError: If the matching service returned an invalid response.
+        """
+        return self._match_data(get_matching_client().match(new_user_json))
+
+    def _match_data(self, response):
+        """Read the match data from a matching service response.
+
+        Args:
+            response (Response): The matching service response.
 
+        Return:
+            dict: The match data (`mci_id` and `score`).
+
+        Raises:
+            ValueError: If the response does not hold match data.
+        """
         try:
-            mci_id = json_payload['mci_id']
-        except Exception:
-            return {'message': 'Malformed or empty JSON object found. Please include JSON with an mci_id in the request body.'}, 400
+            match_data = response.json()
+        except ValueError:
+            match_data = None
 
-        comment = None
-        if "comment" in json_payload.keys():
-            comment = json_payload['comment']
+        if not isinstance(match_data, dict) or 'mci_id' not in match_data or 'score' not in match_data:
+            raise ValueError('The matching service returned an invalid response.')
 
-        user = self._get_user(mci_id)
+        # an empty score means no match; any other score must be a number
+        score = match_data['score']
+        if score not in (None, '') and (isinstance(score, bool) or not isinstance(score, (int, float))):
+            raise ValueError('The matching service returned an invalid response.')
 
-        user.first_name = None
-        user.middle_name = None
-        user.last_name = None
-        user.suffix = None
-        user.email_address = None
-        user.telephone = None
-        user.telephone_2 = None
-        user.telephone_3 = None
-        user.mailing_address_id = None
-        user.date_of_birth = None
-        user.ssn = None
+        return match_data
 
-        db.session.commit()
+    def _is_match(self, match_data: dict):
+        """Decide whether the matching service found an existing individual.
 
-        pii_removal_data = {
-            "individual_id": user.mci_id,
-            "comment": comment,
-        }
-        pii_removal = IndividualPIIRemoval(**pii_removal_data)
-        db.session.add(pii_removal)
+        Args:
+            match_data (dict): The match data returned by the matching service.
 
-        try:
-            db.session.commit()
-        except IntegrityError:
-            return {"message": "Nothing to do. PII has already been removed for this individual"}, 200
+        Return:
+            bool: True if the match score reaches the MCI threshold.
+        """
+        mci_threshold = settings.current.mci_threshold
+        computed_mci_threshold = match_data['score']
 
-        return {"message": "Success! PII removed for individual with MCI ID {}".format(mci_id)}, 201
+        return bool(computed_mci_threshold and (computed_mci_threshold >= mci_threshold))
 
-    # (Private) helper functions
-    def _get_user(self, mci_id: str):
-        user_obj = Individual.query.filter_by(mci_id=mci_id).first()
-        if not user_obj:
+    def _get_user_detail(self, mci_id: str, fields: list = None):
+        """Load an individual and every table needed to describe them in a single query.
+
+        Args:
+            mci_id (str): The MCI ID to query for.
+            fields (list): Names of the blob fields to load (defaults to all of them).
+
+        Return:
+            tuple: The Individual followed by the related rows `fields` needs
+                (see `_user_detail_query`), any of which may be None.
+
+        """
+        user_detail = self._user_detail_query(fields)\
+            .filter(Individual.mci_id == mci_id)\
+            .first()
+        if not user_detail:
             raise IndividualDoesNotExist
 
-        return user_obj
+        return user_detail
+
+    def _user_detail_query(self, fields: list = None):
+        """Build the query that loads individuals along with the tables needed to describe them.
+
+        Only the columns and relationships behind `fields` are loaded; the other
+        tables are neither joined nor lazily loaded later.
+
+        Args:
+            fields (list): Names of the blob fields to load (defaults to all of them).
+
+        Return:
+            Query: Query yielding (Individual, *related) rows, where related holds the Address,
+                Gender, Source and EmploymentStatus rows `fields` needs, in that order. When no
+                related table is needed the query yields bare Individual instances.
+
+        """
+        related_models = self._related_models(fields)
+        query = read_replica.session().query(Individual, *related_models)
+        for model in related_models:
+            query = query.outerjoin(model, USER_JOINS[model])
+
+        options = [Load(Individual).lazyload('*')]
+        if fields is not None:
+            columns = set(['mci_id'])
+            for field in fields:
+                columns.update(USER_FIELDS[field][0])
+            options.append(Load(Individual).load_only(*[getattr(Individual, column) for column in sorted(columns)]))
+        if fields is None or 'ethnicity_race' in fields:
+            options.append(joinedload(Individual.ethnicity_races))
+
+        return query.options(*options)
+
+    def _related_models(self, fields: list = None):
+        """List the related tables a set of blob fields is read from.
+
+        Args:
+            fields (list): Names of the blob fields (defaults to all of them).
+
+        Return:
+            list: The related models, in `USER_JOINS` order.
+
+        """
+        if fields is None:
+            return list(USER_JOINS.keys())
+
+        needed = set(USER_FIELDS[field][1] for field in fields)
+        return [model for model in USER_JOINS if model in needed]
+
+    def _parse_fields(self, fields: str, secure: bool = False):
+        """Parse the `fields` query parameter of a user endpoint.
+
+        Args:
+            fields (str): Comma separated names of blob fields, or None for all fields.
+            secure (bool): Whether sensitive fields (e.g. SSN) may be requested.
+
+        Return:
+            list: The requested field names, or None for all fields.
+
+        Raises:
+            ValueError: If a field is unknown.
+
+        """
+        field_names = [field.strip() for field in (fields or '').split(',') if field.strip()]
+        if len(field_names) == 0:
+            return None
+
+        unknown_fields = [field for field in field_names
+                          if field not in USER_FIELDS or (field == 'ssn' and not secure)]
+        if len(unknown_fields) > 0:
+            raise ValueError('Unknown fields: {}.'.format(', '.join(unknown_fields)))
+
+        return field_names
+
+    def _build_user_blob(self, user_detail, secure=False, fields=None):
+        """Describe an individual loaded by `_get_user_detail`.
+
+        Args:
+            user_detail (tuple): The row returned by `_get_user_detail`.
+            secure (bool): Whether to include sensitive fields (e.g. SSN).
+            fields (list): The blob fields to include (defaults to all of them).
+                Must match the fields the row was loaded with.
+
+        Return:
+            dict: An object representing the user.
+
+        """
+        if isinstance(user_detail, Individual):
+            # the query returns bare individuals when `fields` needs no related table
+            user_detail = (user_detail,)
+        user_obj = user_detail[0]
+        related = dict(zip(self._related_models(fields), user_detail[1:]))
+
+        user = {}
+        for field in USER_FIELDS:
+            if field == 'ssn' and not secure:
+                continue
+            if fields is not None and field not in fields:
+                continue
+            user[field] = self._format_user_field(field, user_obj, related)
+        return user
+
+    def _format_user_field(self, field: str, user_obj: Individual, related: dict):
+        """Format a single user blob field.
+
+        Args:
+            field (str): The field name (a key of `USER_FIELDS`).
+            user_obj (Individual): The individual.
+            related (dict): The related rows loaded with the individual, keyed by model.
+
+        Return:
+            object: The field value; missing values are empty strings.
+
+        """
+        if field == 'mailing_address':
+            return self._get_mailing_address(related.get(Address))
+        elif field == 'gender':
+            gender = related.get(Gender)
+            return '' if gender is None else gender.gender
+        elif field == 'ethnicity_race':
+            return self._find_user_ethnicity(user_obj)
+        elif field == 'education_level':
+            return ''
+        elif field == 'employment_status':
+            employment_status = related.get(EmploymentStatus)
+            return '' if employment_status is None else employment_status.employment_status
+        elif field == 'source':
+            source = related.get(Source)
+            return '' if source is None else source.source
+
+        value = getattr(user_obj, field)
+        if value is None:
+            return ''
+        elif field in ('registration_date', 'vendor_creation_date'):
+            return datetime.strftime(value, '%Y-%m-%d')
+        elif field == 'date_of_birth':
+            return str(value)
+        return value
+
+    def _export_query(self, field_names: list, since_date: datetime = None):
+        """Build the streaming query behind `export_users`.
+
+        Args:
+            field_names (list): Names of the fields to select (keys of `EXPORT_FIELDS`).
+            since_date (datetime): Only select individuals registered on or after this date.
+
+        Return:
+            Query: Rows holding the selected columns, fetched from a server-side cursor.
+
+        """
+        models = set(EXPORT_FIELDS[field][1] for field in field_names)
+        query = read_replica.session().query(*[EXPORT_FIELDS[field][0] for field in field_names])\
+            .select_from(Individual)
+        for model, condition in USER_JOINS.items():
+            if model in models:
+                query = query.outerjoin(model, condition)
+
+        if since_date is not None:
+            query = query.filter(Individual.registration_date >= since_date)
+
+        return query.order_by(Individual.id).yield_per(settings.current.export_fetch_size)
+
+    def _export_values(self, field_names: list, row: tuple):
+        """Format an exported row the way user blobs format their fields.
+
+        Args:
+            field_names (list): Names of the selected fields.
+            row (tuple): The row returned by `_export_query`.
+
+        Return:
+            list: The formatted values, in field order.
 
-    def _get_mailing_address(self, user: Individual):
+        """
+        values = []
+        for field, value in zip(field_names, row):
+            if value is None:
+                values.append('')
+            elif field in ('registration_date', 'vendor_creation_date'):
+                values.append(datetime.strftime(value, '%Y-%m-%d'))
+            elif field == 'date_of_birth':
+                values.append(str(value))
+            else:
+                values.append(value)
+        return values
+
+    def _get_mailing_address(self, address: Address):
         """ Return an individuals mailing address if available.
 
         Args:
-            user (Individual): The user to find the mailing address of.
+            address (Address): The individual's mailing address, or None.
 
         Return:
             dict: Mailing address
@@ -337,79 +1165,38 @@ class UserHandler(object):
             'country': ''
         }
 
-        if user.mailing_address_id is not None:
-            address = Address.query.filter_by(
-                id=user.mailing_address_id).first()
-            if address is not None:
-                mailing_address['address'] = '' if address.address is None else address.address
-                mailing_address['city'] = '' if address.city is None else address.city
-                mailing_address['state'] = '' if address.state is None else address.state
-                mailing_address['postal_code'] = '' if address.postal_code is None else address.postal_code
-                mailing_address['county'] = '' if address.county is None else address.county
-                mailing_address['country'] = '' if address.country is None else address.country
+        if address is not None:
+            mailing_address['address'] = '' if address.address is None else address.address
+            mailing_address['city'] = '' if address.city is None else address.city
+            mailing_address['state'] = '' if address.state is None else address.state
+            mailing_address['postal_code'] = '' if address.postal_code is None else address.postal_code
+            mailing_address['county'] = '' if address.county is None else address.county
+            mailing_address['country'] = '' if address.country is None else address.country
 
         return mailing_address
 
     def _find_address_id(self, address):
-        """Look up address.
+        """Look up an address without creating it.
 
         Args:
             address (dict): The address object to query for.
 
         Return:
-            dict: Response object with details about the address.
+            dict: Response object with details about the address, and its normalized `values`.
         """
         result = {
             'exists': False,
             'id': None,
+            'values': None,
             'error': None
         }
 
         try:
-            try:
-                _address = address.get('address', '').title()
-            except Exception:
-                _address = None
-
-            try:
-                _city = address.get('city', '').title()
-            except Exception:
-                _city = None
-
-            try:
-                _state = address.get('state', '').upper()
-            except Exception:
-                _state = None
-
-            try:
-                _postal_code = address.get('postal_code', '')
-            except Exception:
-                _postal_code = None
-
-            try:
-                _county = address.get('county')
-            except Exception:
-                _county = None
-
-            try:
-                _country = address.get('country', '').upper()
-            except Exception:
-                _country = None
-
-            new_address = Address(_address, _city, _state,
-                                  _postal_code, _county, _country)
-
-            address = Address.query.filter_by(address=new_address.address, city=new_address.city,
-                                              state=new_address.state, postal_code=new_address.postal_code,
-                                              county=new_address.county,
-                                              country=new_address.country).first()
-            if address is not None:
-                result['id'] = address.id
-                result['exists'] = True
-            else:
-                db.session.add(new_address)
-                db.session.commit()
-                result['id'] = new_address.id
+            values = normalize_address(address)
+            address_id = address_index.find(values)
+            result['id'] = address_id
+            result['exists'] = address_id is not None
+            result['values'] = values
         except Exception as e:
             result['error'] = 'Invalid Mailing Address format.'
 
@@ -428,55 +1215,14 @@ class UserHandler(object):
             'id': None,
             'error': None
         }
-        gender = Gender.query.filter(func.lower(
-            Gender.gender) == func.lower(gender_type)).first()
-        if gender is None:
+        gender_id = reference_data.get_id(Gender, gender_type)
+        if gender_id is None:
             result['error'] = 'Invalid gender type specified.'
         else:
-            result['id'] = gender.id
+            result['id'] = gender_id
 
         return result
 
-    def _find_employment_status_type(self, user: Individual):
-        """
-        """
-        try:
-            employment_status = EmploymentStatus.query.filter_by(
-                id=user.employment_status_id).first()
-            return employment_status.employment_status
-        except Exception:
-            return ''
-
-    def _find_gender_type(self, user: Individual):
-        """Locate Gender value based on its type.
-
-        Args:
-            gender_id: Gender type value to look up.
-
-        Return:
-            str: The gender type based on the string.
-        """
-        try:
-            gender = Gender.query.filter_by(id=user.gender_id).first()
-            return gender.gender
-        except Exception:
-            return ''
-
-    def _find_source_type(self, user: Individual):
-        """Locate Registration source value based on its id.
-
-        Args:
-            user (Individual): Gender type value to look up.
-
-        Return:
-            str: The source type string.
-        """
-        try:
-            source = Source.query.filter_by(id=user.source_id).first()
-            return source.source
-        except Exception:
-            return ''
-
     def _find_user_ethnicity(self, user: Individual):
         """Retrieve a user's ethnicities based on their IDs
         """
@@ -503,8 +1249,8 @@ class UserHandler(object):
             'error': None
         }
         try:
-            ethnicity = EthnicityRace.query.filter(func.lower(
-                EthnicityRace.ethnicity_race) == func.lower(ethnicity_type)).first()
+            ethnicity = reference_data.get_instance(
+                EthnicityRace, ethnicity_type)
 
             if ethnicity is not None:
                 result['object'] = ethnicity
@@ -530,12 +1276,11 @@ class UserHandler(object):
             'id': None,
             'error': None
         }
-        education = EducationLevel.query.filter(func.lower(
-            EducationLevel.education_level) == func.lower(education_level)).first()
-        if education is None:
+        education_id = reference_data.get_id(EducationLevel, education_level)
+        if education_id is None:
             result['error'] = 'Invalid education level specified.'
         else:
-            result['id'] = education.id
+            result['id'] = education_id
 
         return result
 
@@ -553,12 +1298,12 @@ class UserHandler(object):
             'id': None,
             'error': None
         }
-        employment_status = EmploymentStatus.query.filter(func.lower(
-            EmploymentStatus.employment_status) == func.lower(employment_status_type)).first()
-        if employment_status is None:
+        employment_status_id = reference_data.get_id(
+            EmploymentStatus, employment_status_type)
+        if employment_status_id is None:
             result['error'] = 'Invalid employment status type specified.'
         else:
-            result['id'] = employment_status.id
+            result['id'] = employment_status_id
 
         return result
 
@@ -576,12 +1321,11 @@ class UserHandler(object):
             'id': None,
             'error': None
         }
-        source = Source.query.filter(func.lower(
-            Source.source) == func.lower(source_type)).first()
-        if source is None:
+        source_id = reference_data.get_id(Source, source_type)
+        if source_id is None:
             result['error'] = 'Invalid source type specified.'
         else:
-            result['id'] = source.id
+            result['id'] = source_id
 
         return result
 
@@ -600,8 +1344,8 @@ class UserHandler(object):
             'error': None
         }
         try:
-            disposition = Disposition.query.filter(func.lower(
-                Disposition.disposition) == func.lower(disposition_type)).first()
+            disposition = reference_data.get_instance(
+                Disposition, disposition_type)
 
             if disposition is not None:
                 result['object'] = disposition
@@ -613,13 +1357,12 @@ class UserHandler(object):
 
         return result
 
-    def _handle_match_response(self, response, new_user):
-        mci_threshold = os.getenv('MCI_THRESHOLD', 0.9)
-        match_data = response.json()
+    def _handle_match_response(self, match_data, new_user, mailing_address=None):
         computed_mci_threshold = match_data['score']
         matched_mci_id = match_data['mci_id']
 
-        if computed_mci_threshold and (computed_mci_threshold >= mci_threshold):
+        if self._is_match(match_data):
+            # the candidate is not saved, nor is any address created for it
             matched_individual = Individual.query.filter_by(
                 mci_id=matched_mci_id).first()
 
@@ -632,7 +1375,7 @@ class UserHandler(object):
             }, 200
 
         else:
-            db.session.add(new_user)
+            self._save_individual(new_user, mailing_address)
             db.session.commit()
 
             return {
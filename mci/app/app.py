@@ -19,10 +19,18 @@ from flask_sqlalchemy import SQLAlchemy
 from mci.api import (AddressResource, DispositionResource,
                      EducationLevelResource, EmploymentStatusResource,
                      EthnicityRaceResource, GenderResource,
-                     HealthCheckResource, SourceResource, UserDetailResource,
-                     UserResource, SecureUserDetailResource, UserRemovePIIResource)
+                     HealthCheckResource, MetricsResource, SourceResource,
+                     UserDetailResource, UserResource, SecureUserDetailResource,
+                     UserRemovePIIResource, UserBatchResource, UserBulkResource,
+                     UserExportResource, PendingUserResource,
+                     V1_0_0_UserHandler)
+from mci.api.core.access_log import access_log
+from mci.api.core.read_replica import read_replica
+from mci.api.core.representations import output_json
 from mci.api.errors import IndividualDoesNotExist
-from mci.config import ConfigurationFactory
+from mci.config import Config, ConfigurationFactory, settings
+from mci.instrumentation import metrics, query_tracker
+from mci.matching import PendingMatchWorker, pending_matches
 from mci_database.db import db
 
 # logger configuration
@@ -93,19 +101,20 @@ def after_request(response):
         'content_length': response.content_length,
         'user_agent': str(request.user_agent)
     }
-    if info['status_code'] >= 200 and info['status_code'] < 300:
-        logger.info(info)
-    else:
-        logger.error(info)
+    access_log.log(info)
     return response
 
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(ConfigurationFactory.from_env())
+    logger.info('Database engine options: {}'.format(
+        app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or 'SQLAlchemy defaults'))
     db.init_app(app)
+    read_replica.init_app(app)
     migrate = Migrate(app, db)
     api = Api(app)
+    api.representations['application/json'] = output_json
 
     # core endpoints
     api.add_resource(UserResource, '/users', endpoint='users_ep')
@@ -115,8 +124,17 @@ def create_app():
                      '/user-details/<mci_id>', endpoint='secure_user_detail_ep')
     api.add_resource(UserRemovePIIResource, '/users/remove-pii',
                      endpoint='user_remove_pii_ep')
+    api.add_resource(UserBatchResource, '/users/batch',
+                     endpoint='user_batch_ep')
+    api.add_resource(UserBulkResource, '/users/bulk',
+                     endpoint='user_bulk_ep')
+    api.add_resource(UserExportResource, '/users/export',
+                     endpoint='user_export_ep')
+    api.add_resource(PendingUserResource, '/users/pending/<ticket_id>',
+                     endpoint='pending_user_ep')
     # helper endpoints
     api.add_resource(HealthCheckResource, '/', endpoint='healthcheck_ep')
+    api.add_resource(MetricsResource, '/metrics', endpoint='metrics_ep')
     api.add_resource(SourceResource, '/source', endpoint='sources_ep')
     api.add_resource(GenderResource, '/gender', endpoint='gender_ep')
     api.add_resource(AddressResource, '/address', endpoint='address_ep')
@@ -130,5 +148,22 @@ def create_app():
                      endpoint='education_ep')
 
     app.register_error_handler(Exception, handle_errors)
+    settings.install_signal_handler()
+    access_log.init_app(logger)
+    key_set = getattr(Config.get_oauth2_provider(), 'key_set', None)
+    if key_set is not None:
+        key_set.start()
+    query_tracker.init_app(app, repeat_threshold=Config.get_query_repeat_threshold())
+    metrics.init_app(app, directory=Config.get_metrics_dir(),
+                     flush_interval=Config.get_metrics_flush_interval())
     app.after_request(after_request)
+
+    if Config.get_matching_deferred_mode() and not pending_matches.enabled:
+        logger.error('Deferred matching requires PENDING_MATCH_DIR and PENDING_MATCH_KEY; '
+                     'registrations will not be deferred.')
+    elif Config.get_matching_deferred_mode():
+        PendingMatchWorker(app, pending_matches,
+                           V1_0_0_UserHandler().complete_pending_registration,
+                           poll_interval=Config.get_pending_match_poll_interval()).start()
+
     return app
@@ -0,0 +1,2 @@
+from mci.auth.jwks import JWKSKeySet
+from mci.auth.provider import JWKSProvider
@@ -0,0 +1,143 @@
+"""JSON Web Key Set
+
+The keys that sign access tokens are published by the OAuth 2.0 provider at
+`OAUTH2_JWKS_URL`. Each process fetches the key set once when the application
+starts and a background thread refreshes it every `JWKS_REFRESH_INTERVAL`
+seconds.
+
+A token signed with a key ID that is not in the set (the provider rotated its
+keys) triggers an immediate refresh. Concurrent requests wait for a single
+fetch rather than each fetching the set, and unknown key IDs cannot trigger a
+fetch more than once every `JWKS_MIN_REFRESH_INTERVAL` seconds. When the
+provider is unreachable the last key set fetched keeps being used.
+
+"""
+
+import logging
+import os
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSKeySet(object):
+    """The signing keys of an OAuth 2.0 provider, indexed by key ID.
+
+    Args:
+        url (str): URL of the JSON Web Key Set.
+        refresh_interval (float): Seconds between background refreshes.
+        min_refresh_interval (float): Minimum seconds between two refreshes for an unknown key ID.
+        timeout (float): Seconds to wait for the key set to be fetched.
+        fetch (callable): Returns the key set document; fetches `url` if not set.
+
+    """
+
+    def __init__(self, url: str, refresh_interval: float = 600, min_refresh_interval: float = 30,
+                 timeout: float = 5, fetch=None):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.fetch = fetch or self._fetch
+        self.failures = 0
+        self._keys = {}
+        self._fetched_at = None
+        self._demanded_at = None
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """Fetch the key set and start refreshing it in the background."""
+        self.refresh()
+        self._ensure_started()
+
+    def get(self, kid: str):
+        """Retrieve a signing key.
+
+        Args:
+            kid (str): The key ID from the token header.
+
+        Returns:
+            dict: The JSON Web Key, or None if the provider does not publish it.
+
+        """
+        self._ensure_started()
+        key = self._keys.get(kid)
+        if key is None:
+            self._refresh_for(kid)
+            key = self._keys.get(kid)
+        return key
+
+    def refresh(self):
+        """Fetch the key set, keeping the current one if the fetch fails.
+
+        Returns:
+            bool: True if the key set was fetched.
+
+        """
+        with self._refresh_lock:
+            return self._refresh()
+
+    def stats(self):
+        """Report the state of the key set in this process.
+
+        Returns:
+            dict: Number of keys, seconds since the last successful fetch and failed fetches.
+
+        """
+        return {
+            'keys': len(self._keys),
+            'age': None if self._fetched_at is None else time.monotonic() - self._fetched_at,
+            'failures': self.failures
+        }
+
+    def _refresh_for(self, kid):
+        with self._refresh_lock:
+            # another request may have refreshed while this one waited
+            if kid in self._keys:
+                return
+            if self._demanded_at is not None and \
+                    time.monotonic() - self._demanded_at < self.min_refresh_interval:
+                return
+            self._demanded_at = time.monotonic()
+            self._refresh()
+
+    def _refresh(self):
+        try:
+            document = self.fetch()
+            keys = {key['kid']: key for key in document['keys'] if 'kid' in key}
+        except Exception as e:
+            self.failures += 1
+            logger.warning('Failed to fetch the JSON Web Key Set from {}, keeping {} known keys: {}'.format(
+                self.url, len(self._keys), str(e)))
+            return False
+
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        return True
+
+    def _fetch(self):
+        response = requests.get(self.url, headers={'Accept': 'application/json'}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _ensure_started(self):
+        # threads do not survive a fork, so each worker process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='jwks-refresh', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            self.refresh()
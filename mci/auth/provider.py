@@ -0,0 +1,60 @@
+"""Auth0 Provider With a Shared Key Set
+
+`brighthive_authlib.AuthZeroProvider` fetches the JSON Web Key Set on every
+token validation. This provider validates tokens the same way against a
+`JWKSKeySet` kept up to date in the background.
+
+"""
+
+from brighthive_authlib import AuthLibConfiguration, AuthZeroProvider, OAuth2ProviderError
+from jose import jwt
+
+from mci.auth.jwks import JWKSKeySet
+
+
+class JWKSProvider(AuthZeroProvider):
+    """Auth0 OAuth 2.0 provider validating tokens against a cached key set.
+
+    Args:
+        config (AuthLibConfiguration): The provider configuration.
+        key_set (JWKSKeySet): The provider's signing keys.
+
+    """
+
+    def __init__(self, config: AuthLibConfiguration, key_set: JWKSKeySet):
+        super().__init__()
+        self.from_object(config)
+        self.key_set = key_set
+
+    def validate_token(self, token: str = None, scopes: list = []):
+        """Validate an access token.
+
+        Args:
+            token (str): The token (default is the bearer token of the current request).
+            scopes (list): Scopes the token must have been issued with.
+
+        Returns:
+            bool: True if the token is valid.
+
+        Raises:
+            OAuth2ProviderError: The token is missing or invalid.
+
+        """
+        if not token:
+            token = self.get_token()
+
+        try:
+            key = self.key_set.get(jwt.get_unverified_header(token)['kid'])
+            if key is None:
+                raise OAuth2ProviderError('Unknown signing key')
+
+            claims = jwt.decode(token, key, algorithms=self.algorithms, audience=self.audience,
+                                issuer='{}/'.format(self.base_url))
+            token_scopes = (claims.get('scope') or '').split()
+            for scope in scopes:
+                if scope not in token_scopes:
+                    raise OAuth2ProviderError('Required scope ({}) is not present for this client'.format(scope))
+        except Exception:
+            raise OAuth2ProviderError('Access Denied')
+
+        return True
@@ -1 +1,2 @@
 from mci.config.config import ConfigurationFactory, Config
+from mci.config.snapshot import Settings, settings
@@ -6,8 +6,15 @@ A collection of classes for describing various application configuration environ
 
 import os
 import json
+import base64
+import tempfile
 from brighthive_authlib import OAuth2ProviderFactory, AuthLibConfiguration
 
+from mci.auth import JWKSKeySet, JWKSProvider
+from mci.instrumentation import InstrumentedProvider
+
+_oauth2_provider = None
+
 
 class Config(object):
     """Base configuration class.
@@ -44,6 +51,8 @@ class Config(object):
             Note:
                 The purpose of this attribute is to ensure that the actual path where the application resides can
                 easily be found regardless of where the application is currently being run.
+
+        SETTINGS_FILE (str): Path of the `settings.json` file holding the API name and version.
     """
 
     RELATIVE_PATH = os.path.dirname(os.path.relpath(__file__))
@@ -76,16 +85,20 @@ class Config(object):
     OAUTH2_AUDIENCE = os.getenv('OAUTH2_AUDIENCE', 'http://localhost:8000')
     OAUTH2_ALGORITHMS = ['RS256']
 
+    SETTINGS_FILE = os.path.join(ABSOLUTE_PATH, 'settings.json')
+
     @staticmethod
-    def get_settings():
+    def get_settings(settings_file: str = None):
         """Retrieve application settings from local settings file.
 
+        Args:
+            settings_file (str): Path of the settings file (defaults to `SETTINGS_FILE`).
+
         Returns:
             dict: Settings retrieved from local `settings.json` file.
 
         """
-        settings_file = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), 'settings.json')
+        settings_file = settings_file or Config.SETTINGS_FILE
         settings = {}
 
         if os.path.exists(settings_file) and os.path.isfile(settings_file):
@@ -114,6 +127,344 @@ class Config(object):
         """
         return os.getenv('MATCHING_SERVICE_URI', 'http://mcimatchingservice_mci_1:8000/compute-match')
 
+    @staticmethod
+    def get_matching_service_pool_size():
+        """Retrieve the number of keep-alive connections pooled for the matching service.
+
+        Note:
+            The pool belongs to one worker process and is shared by all of its greenlets.
+
+        Returns:
+            int: Pool size (default is 10)
+
+        """
+        return int(os.getenv('MATCHING_SERVICE_POOL_SIZE', 10))
+
+    @staticmethod
+    def get_matching_service_connect_timeout():
+        """Retrieve how long to wait for a connection to the matching service.
+
+        Returns:
+            float: Timeout in seconds (default is 1)
+
+        """
+        return float(os.getenv('MATCHING_SERVICE_CONNECT_TIMEOUT', 1))
+
+    @staticmethod
+    def get_matching_service_read_timeout():
+        """Retrieve how long to wait for the matching service to compute a match.
+
+        Returns:
+            float: Timeout in seconds (default is 5)
+
+        """
+        return float(os.getenv('MATCHING_SERVICE_READ_TIMEOUT', 5))
+
+    @staticmethod
+    def get_matching_service_max_retries():
+        """Retrieve how many times a failed connection to the matching service is retried.
+
+        Returns:
+            int: Number of retries (default is 2)
+
+        """
+        return int(os.getenv('MATCHING_SERVICE_MAX_RETRIES', 2))
+
+    @staticmethod
+    def get_matching_service_backoff_factor():
+        """Retrieve the backoff factor applied between matching service connection retries.
+
+        Returns:
+            float: Backoff factor (default is 0.1)
+
+        """
+        return float(os.getenv('MATCHING_SERVICE_BACKOFF_FACTOR', 0.1))
+
+    @staticmethod
+    def get_matching_breaker_failure_threshold():
+        """Retrieve how many consecutive matching service failures open the circuit breaker.
+
+        Returns:
+            int: Failure threshold (default is 5)
+
+        """
+        return int(os.getenv('MATCHING_BREAKER_FAILURE_THRESHOLD', 5))
+
+    @staticmethod
+    def get_matching_breaker_reset_timeout():
+        """Retrieve how long the circuit breaker stays open before retrying the matching service.
+
+        Returns:
+            float: Timeout in seconds (default is 30)
+
+        """
+        return float(os.getenv('MATCHING_BREAKER_RESET_TIMEOUT', 30))
+
+    @staticmethod
+    def get_matching_deferred_mode():
+        """Determine whether registrations are deferred while the matching service is unavailable.
+
+        When enabled, registrations received while the circuit breaker is open are accepted
+        with `202 Accepted` and completed in the background. Otherwise they fail fast.
+
+        Returns:
+            bool: True if deferred matching is enabled (default is False)
+
+        """
+        return os.getenv('MATCHING_DEFERRED_MODE', 'false').lower() in ('1', 'true', 'yes')
+
+    @staticmethod
+    def get_pending_match_dir():
+        """Retrieve the spool directory of deferred registrations.
+
+        Note:
+            Every worker serving the API must see the same directory. It holds
+            registrations (encrypted), so it has no default: registrations are not
+            deferred unless it is set.
+
+        Returns:
+            str: Spool directory path, or None if not configured.
+
+        """
+        return os.getenv('PENDING_MATCH_DIR')
+
+    @staticmethod
+    def get_pending_match_key():
+        """Retrieve the key encrypting the deferred registrations.
+
+        Returns:
+            bytes: The base64-decoded `PENDING_MATCH_KEY` (a 256-bit AES key), or None if not configured.
+
+        """
+        key = os.getenv('PENDING_MATCH_KEY')
+        return base64.b64decode(key) if key else None
+
+    @staticmethod
+    def get_pending_match_retention():
+        """Retrieve how long the outcome of a deferred registration is kept.
+
+        Returns:
+            float: Retention in seconds (default is 86400)
+
+        """
+        return float(os.getenv('PENDING_MATCH_RETENTION', 86400))
+
+    @staticmethod
+    def get_pending_match_poll_interval():
+        """Retrieve how often deferred registrations are retried.
+
+        Returns:
+            float: Interval in seconds (default is 5)
+
+        """
+        return float(os.getenv('PENDING_MATCH_POLL_INTERVAL', 5))
+
+    @staticmethod
+    def get_engine_options():
+        """Retrieve the SQLAlchemy engine options of the database connection pool.
+
+        Every worker process has its own pool, so the database must accept
+        `DB_POOL_SIZE + DB_MAX_OVERFLOW` connections per worker.
+
+        Environment variables:
+            DB_POOL_SIZE: Connections kept open (default is 5)
+            DB_MAX_OVERFLOW: Connections opened beyond the pool size under load (default is 10)
+            DB_POOL_TIMEOUT: Seconds to wait for a free connection (default is 30)
+            DB_POOL_RECYCLE: Seconds after which a connection is replaced (default is 1800)
+            DB_POOL_PRE_PING: Test connections before using them (default is true)
+            DB_STATEMENT_TIMEOUT: PostgreSQL `statement_timeout` in milliseconds, 0 disables it (default is 0)
+            DB_APPLICATION_NAME: PostgreSQL `application_name` of the connections (default is mci)
+
+        Returns:
+            dict: Value for `SQLALCHEMY_ENGINE_OPTIONS`.
+
+        """
+        connect_args = {
+            'application_name': os.getenv('DB_APPLICATION_NAME', 'mci')
+        }
+        statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
+        if statement_timeout > 0:
+            connect_args['options'] = '-c statement_timeout={}'.format(statement_timeout)
+
+        return {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+            'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+            'connect_args': connect_args
+        }
+
+    @staticmethod
+    def get_read_replica_uri():
+        """Retrieve the connection string of the PostgreSQL read replica.
+
+        Returns:
+            str: Connection string, or None if reads are served by the primary (default).
+
+        """
+        return os.getenv('READ_REPLICA_URI') or None
+
+    @staticmethod
+    def get_replica_max_lag():
+        """Retrieve how far the read replica may lag behind the primary before reads fail over.
+
+        Note:
+            This is also how long reads stay on the primary after a worker writes.
+
+        Returns:
+            float: Lag in seconds (default is 5)
+
+        """
+        return float(os.getenv('REPLICA_MAX_LAG', 5))
+
+    @staticmethod
+    def get_replica_check_interval():
+        """Retrieve how often the read replica's health and lag are checked.
+
+        Returns:
+            float: Interval in seconds (default is 5)
+
+        """
+        return float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+
+    @staticmethod
+    def get_access_log_queue_size():
+        """Retrieve how many access log records may wait to be written before records are dropped.
+
+        Returns:
+            int: Queue size (default is 10000)
+
+        """
+        return int(os.getenv('ACCESS_LOG_QUEUE_SIZE', 10000))
+
+    @staticmethod
+    def get_access_log_batch_size():
+        """Retrieve the maximum number of access log records written at a time.
+
+        Returns:
+            int: Batch size (default is 100)
+
+        """
+        return int(os.getenv('ACCESS_LOG_BATCH_SIZE', 100))
+
+    @staticmethod
+    def get_access_log_flush_interval():
+        """Retrieve how long the access log writer waits for records.
+
+        Returns:
+            float: Interval in seconds (default is 1)
+
+        """
+        return float(os.getenv('ACCESS_LOG_FLUSH_INTERVAL', 1))
+
+    @staticmethod
+    def get_access_log_success_sample_rate():
+        """Retrieve the fraction of successful (2xx) responses written to the access log.
+
+        Returns:
+            float: Sample rate between 0 and 1 (default is 1)
+
+        """
+        return float(os.getenv('ACCESS_LOG_SUCCESS_SAMPLE_RATE', 1))
+
+    @staticmethod
+    def get_access_log_error_sample_rate():
+        """Retrieve the fraction of unsuccessful responses written to the access log.
+
+        Returns:
+            float: Sample rate between 0 and 1 (default is 1)
+
+        """
+        return float(os.getenv('ACCESS_LOG_ERROR_SAMPLE_RATE', 1))
+
+    @staticmethod
+    def get_metrics_dir():
+        """Retrieve the directory where the workers of a host share their metrics.
+
+        Note:
+            Every worker serving the API must see the same directory. Empty it when the
+            server starts so that the totals of a previous deployment are not reported.
+
+        Returns:
+            str: Metrics directory path.
+
+        """
+        return os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'mci-metrics'))
+
+    @staticmethod
+    def get_metrics_token():
+        """Retrieve the bearer token Prometheus must present to scrape `/metrics`.
+
+        Returns:
+            str: The token, or None if not configured (metrics are then not served).
+
+        """
+        return os.getenv('METRICS_TOKEN') or None
+
+    @staticmethod
+    def get_metrics_flush_interval():
+        """Retrieve how often each worker writes its metrics to the metrics directory.
+
+        Returns:
+            float: Interval in seconds (default is 5)
+
+        """
+        return float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+    @staticmethod
+    def get_query_repeat_threshold():
+        """Retrieve the number of times a request may run the same statement shape before it is reported.
+
+        Returns:
+            int: Number of executions from which a statement shape is reported (default is 3)
+
+        """
+        return int(os.getenv('QUERY_REPEAT_THRESHOLD', 3))
+
+    @staticmethod
+    def get_profile_token():
+        """Retrieve the token that requests send in their `X-Profile-Token` header to be profiled.
+
+        Returns:
+            str: Profiling token, or None if requests cannot ask to be profiled (default).
+
+        """
+        return os.getenv('PROFILE_TOKEN') or None
+
+    @staticmethod
+    def get_profile_sample_rate():
+        """Retrieve the fraction of requests profiled at random.
+
+        Returns:
+            float: Sample rate between 0 and 1 (default is 0)
+
+        """
+        return float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+
+    @staticmethod
+    def get_profile_dir():
+        """Retrieve the directory request profiles are written to.
+
+        Returns:
+            str: Profile directory path.
+
+        """
+        return os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'mci-profiles'))
+
+    @staticmethod
+    def get_profile_inline():
+        """Determine whether request profiles are also returned in the response body.
+
+        Note:
+            Meant for development; the profile lists the SQL statements of the request.
+
+        Returns:
+            bool: True if profiles are returned inline (default is False)
+
+        """
+        return os.getenv('PROFILE_INLINE', 'false').lower() in ('1', 'true', 'yes')
+
     @staticmethod
     def get_api_version():
         """Return API version.
@@ -150,17 +501,94 @@ class Config(object):
 
         return api_name
 
+    @staticmethod
+    def get_token_cache_ttl():
+        """Retrieve the maximum number of seconds a validated access token stays cached.
+
+        Note:
+            Tokens are never cached past their `exp` claim.
+
+        Returns:
+            float: Maximum time-to-live in seconds (default is 3600)
+
+        """
+        return float(os.getenv('TOKEN_CACHE_TTL', 3600))
+
+    @staticmethod
+    def get_token_cache_size():
+        """Retrieve the number of validated access tokens each worker keeps.
+
+        Returns:
+            int: Number of tokens (default is 1024)
+
+        """
+        return int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+
+    @staticmethod
+    def get_jwks_refresh_interval():
+        """Retrieve how often the OAuth 2.0 provider's signing keys are refreshed in the background.
+
+        Returns:
+            float: Interval in seconds (default is 600)
+
+        """
+        return float(os.getenv('JWKS_REFRESH_INTERVAL', 600))
+
+    @staticmethod
+    def get_jwks_min_refresh_interval():
+        """Retrieve the minimum time between two refreshes of the signing keys for an unknown key ID.
+
+        Returns:
+            float: Interval in seconds (default is 30)
+
+        """
+        return float(os.getenv('JWKS_MIN_REFRESH_INTERVAL', 30))
+
+    @staticmethod
+    def get_jwks_timeout():
+        """Retrieve how long to wait for the OAuth 2.0 provider's signing keys.
+
+        Returns:
+            float: Timeout in seconds (default is 5)
+
+        """
+        return float(os.getenv('JWKS_TIMEOUT', 5))
+
     @staticmethod
     def get_oauth2_provider():
         """Retrieve the OAuth 2.0 Provider.
+
+        Note:
+            The provider is created on the first call and shared by every resource of the process.
+
         Return:
-            object: The OAuth 2.0 Provider.
+            object: The OAuth 2.0 Provider, timing token validations for the metrics endpoint.
         """
-        auth_config = AuthLibConfiguration(provider=Config.OAUTH2_PROVIDER, base_url=Config.OAUTH2_URL,
-                                           jwks_url=Config.OAUTH2_JWKS_URL, algorithms=Config.OAUTH2_ALGORITHMS, audience=Config.OAUTH2_AUDIENCE)
-        oauth2_provider = OAuth2ProviderFactory.get_provider(
-            Config.OAUTH2_PROVIDER, auth_config)
-        return oauth2_provider
+        global _oauth2_provider
+        if _oauth2_provider is None:
+            auth_config = AuthLibConfiguration(provider=Config.OAUTH2_PROVIDER, base_url=Config.OAUTH2_URL,
+                                               jwks_url=Config.OAUTH2_JWKS_URL, algorithms=Config.OAUTH2_ALGORITHMS, audience=Config.OAUTH2_AUDIENCE)
+            if str(Config.OAUTH2_PROVIDER).upper() == 'AUTH0':
+                key_set = JWKSKeySet(Config.OAUTH2_JWKS_URL, refresh_interval=Config.get_jwks_refresh_interval(),
+                                     min_refresh_interval=Config.get_jwks_min_refresh_interval(),
+                                     timeout=Config.get_jwks_timeout())
+                oauth2_provider = JWKSProvider(auth_config, key_set)
+            else:
+                oauth2_provider = OAuth2ProviderFactory.get_provider(
+                    Config.OAUTH2_PROVIDER, auth_config)
+            _oauth2_provider = InstrumentedProvider(oauth2_provider)
+        return _oauth2_provider
+
+    @staticmethod
+    def get_json_library():
+        """Retrieve the JSON encoder used for API responses.
+
+        Returns:
+            str: `orjson` or `json` (default is orjson, falling back to json if it is not installed)
+
+        """
+
+        return os.getenv('JSON_LIBRARY', 'orjson').lower()
 
     @staticmethod
     def get_page_limit():
@@ -173,6 +601,177 @@ class Config(object):
 
         return int(os.getenv('PAGE_LIMIT', 20))
 
+    @staticmethod
+    def get_mci_threshold():
+        """Retrieve the match score from which a registration is matched to an existing individual.
+
+        Returns:
+            float: MCI threshold (default is 0.9)
+
+        """
+
+        return float(os.getenv('MCI_THRESHOLD', 0.9))
+
+    @staticmethod
+    def get_settings_check_interval():
+        """Retrieve how often the settings file is checked for changes.
+
+        Returns:
+            float: Interval in seconds (default is 5)
+
+        """
+
+        return float(os.getenv('SETTINGS_CHECK_INTERVAL', 5))
+
+    @staticmethod
+    def get_batch_limit():
+        """Retrieve the maximum number of MCI IDs accepted by a batch lookup.
+
+        Returns:
+            int: Batch limit (default is 500)
+
+        """
+
+        return int(os.getenv('BATCH_LIMIT', 500))
+
+    @staticmethod
+    def get_bulk_batch_size():
+        """Retrieve the number of lines processed together by a bulk registration.
+
+        Returns:
+            int: Batch size (default is 100)
+
+        """
+
+        return int(os.getenv('BULK_BATCH_SIZE', 100))
+
+    @staticmethod
+    def get_bulk_match_concurrency():
+        """Retrieve the number of concurrent matching service calls made by a bulk registration.
+
+        Returns:
+            int: Concurrency limit (default is 8)
+
+        """
+
+        return int(os.getenv('BULK_MATCH_CONCURRENCY', 8))
+
+    @staticmethod
+    def get_export_fetch_size():
+        """Retrieve the number of rows fetched at a time by the users export.
+
+        Returns:
+            int: Fetch size (default is 1000)
+
+        """
+
+        return int(os.getenv('EXPORT_FETCH_SIZE', 1000))
+
+    @staticmethod
+    def get_reference_cache_ttl():
+        """Retrieve how long cached lookup tables (gender, source, etc.) remain valid.
+
+        Returns:
+            int: Time-to-live in seconds (default is 300)
+
+        """
+
+        return int(os.getenv('REFERENCE_CACHE_TTL', 300))
+
+    @staticmethod
+    def get_address_cache_size():
+        """Retrieve how many recently resolved mailing addresses each worker remembers.
+
+        Returns:
+            int: Number of addresses (default is 1024)
+
+        """
+
+        return int(os.getenv('ADDRESS_CACHE_SIZE', 1024))
+
+    @staticmethod
+    def get_user_cache_url():
+        """Retrieve the Redis URL of the cache shared by the workers for user blobs.
+
+        Returns:
+            str: Redis URL, or None if user blobs are not cached (default).
+
+        """
+
+        return os.getenv('USER_CACHE_URL') or None
+
+    @staticmethod
+    def get_user_cache_ttl():
+        """Retrieve how long a user blob stays cached.
+
+        Returns:
+            int: Time-to-live in seconds (default is 300)
+
+        """
+
+        return int(os.getenv('USER_CACHE_TTL', 300))
+
+    @staticmethod
+    def get_user_cache_size():
+        """Retrieve how many user blobs each worker keeps in memory.
+
+        Returns:
+            int: Number of blobs (default is 1024)
+
+        """
+
+        return int(os.getenv('USER_CACHE_SIZE', 1024))
+
+    @staticmethod
+    def get_user_cache_local_ttl():
+        """Retrieve how long a worker serves a user blob from memory without checking the shared cache.
+
+        Note:
+            Another worker may serve a blob for this long after its PII was removed.
+
+        Returns:
+            float: Time-to-live in seconds (default is 1, at most 5)
+
+        """
+
+        return float(os.getenv('USER_CACHE_LOCAL_TTL', 1))
+
+    @staticmethod
+    def get_helper_cache_ttl():
+        """Retrieve how long cached helper listings (/gender, /source, etc.) are served.
+
+        Returns:
+            int: Time-to-live in seconds (default is 60)
+
+        """
+
+        return int(os.getenv('HELPER_CACHE_TTL', 60))
+
+    @staticmethod
+    def get_count_strategy():
+        """Retrieve how table totals for pagination links are counted.
+
+        One of `exact` (COUNT(*) on every request), `cached` (an exact count refreshed
+        in the background) or `estimate` (the PostgreSQL planner estimate).
+
+        Returns:
+            str: Count strategy (default is exact)
+
+        """
+
+        return os.getenv('COUNT_STRATEGY', 'exact').lower()
+
+    @staticmethod
+    def get_count_cache_ttl():
+        """Retrieve how long a cached table total is served before it is refreshed.
+
+        Returns:
+            int: Time-to-live in seconds (default is 60)
+
+        """
+
+        return int(os.getenv('COUNT_CACHE_TTL', 60))
+
 
 class DevelopmentConfig(Config):
     """Development Configuration class.
@@ -184,6 +783,7 @@ class DevelopmentConfig(Config):
     Class Attributes:
         POSTGRES user, password, database, hostname, and port.
         SQLALCHEMY_DATABASE_URI (str): Connection string for PostgreSQL database.
+        SQLALCHEMY_ENGINE_OPTIONS (dict): Connection pool settings (see `Config.get_engine_options`).
     """
 
     def __init__(self):
@@ -202,6 +802,7 @@ class DevelopmentConfig(Config):
         POSTGRES_PORT,
         POSTGRES_DATABASE
     )
+    SQLALCHEMY_ENGINE_OPTIONS = Config.get_engine_options()
 
     def get_postgresql_image(self):
         """Provide the name of the PostgreSQL Docker image to load for development.
@@ -282,6 +883,8 @@ class SandboxConfig(Config):
 
         SQLALCHEMY_DATABASE_URI (str): Connection string for PostgreSQL database. This string is comprised of the
             POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DATABASE, POSTGRES_HOSTNAME, and POSTGRES_PORT attributes
+
+        SQLALCHEMY_ENGINE_OPTIONS (dict): Connection pool settings (see `Config.get_engine_options`).
     """
 
     def __init__(self):
@@ -302,6 +905,7 @@ class SandboxConfig(Config):
         POSTGRES_PORT,
         POSTGRES_DATABASE
     )
+    SQLALCHEMY_ENGINE_OPTIONS = Config.get_engine_options()
 
 
 class ProductionConfig(Config):
@@ -309,12 +913,16 @@ class ProductionConfig(Config):
 
     This class provides the configuration necessary for the `production` environment.
 
+    Class Attributes:
+        SQLALCHEMY_ENGINE_OPTIONS (dict): Connection pool settings (see `Config.get_engine_options`).
     """
 
     def __init__(self):
         super().__init__()
         os.environ['FLASK_ENV'] = 'production'
 
+    SQLALCHEMY_ENGINE_OPTIONS = Config.get_engine_options()
+
 
 class IntegrationTestConfig(Config):
     """Integration Testing configuration class.
@@ -0,0 +1,161 @@
+"""Settings Snapshot
+
+The settings read while serving requests are resolved once, from the
+environment and `settings.json`, into an immutable `Settings` snapshot rather
+than read from the file and the environment on every request.
+
+The snapshot is rebuilt when the process receives SIGHUP, or when the
+modification time of `settings.json` changes (checked at most every
+`SETTINGS_CHECK_INTERVAL` seconds). A new snapshot replaces the previous one in
+a single assignment, so a request never sees a mix of old and new values. If
+the new settings cannot be read, the previous snapshot is kept.
+
+"""
+
+import logging
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass
+
+from mci.config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Settings(object):
+    """An immutable snapshot of the settings read on hot paths.
+
+    See the `Config` getter of each attribute for its meaning and default.
+
+    """
+
+    api_name: str
+    api_version: str
+    page_limit: int
+    batch_limit: int
+    bulk_batch_size: int
+    bulk_match_concurrency: int
+    export_fetch_size: int
+    mci_threshold: float
+    matching_deferred_mode: bool
+    count_strategy: str
+
+    @classmethod
+    def load(cls, settings_file: str = None):
+        """Resolve the settings from the environment and a settings file.
+
+        Args:
+            settings_file (str): Path of the settings file (defaults to `Config.SETTINGS_FILE`).
+
+        Returns:
+            Settings: The snapshot.
+
+        """
+        file_settings = Config.get_settings(settings_file)
+        return cls(
+            api_name=str(file_settings.get('API_NAME', 'Unknown')).strip(),
+            api_version=str(file_settings.get('API_VERSION', 'Unknown')).strip(),
+            page_limit=Config.get_page_limit(),
+            batch_limit=Config.get_batch_limit(),
+            bulk_batch_size=Config.get_bulk_batch_size(),
+            bulk_match_concurrency=Config.get_bulk_match_concurrency(),
+            export_fetch_size=Config.get_export_fetch_size(),
+            mci_threshold=Config.get_mci_threshold(),
+            matching_deferred_mode=Config.get_matching_deferred_mode(),
+            count_strategy=Config.get_count_strategy()
+        )
+
+
+class LiveSettings(object):
+    """Holds the current settings snapshot and replaces it when the settings change.
+
+    Args:
+        settings_file (str): Path of the settings file (defaults to `Config.SETTINGS_FILE`).
+        check_interval (float): Minimum seconds between two checks of the file's modification time.
+
+    """
+
+    def __init__(self, settings_file: str = None, check_interval: float = 5):
+        self.settings_file = settings_file or Config.SETTINGS_FILE
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._reload_requested = False
+        self._checked_at = time.monotonic()
+        self._mtime = self._modification_time()
+        self._snapshot = Settings.load(self.settings_file)
+
+    @property
+    def current(self):
+        """Settings: The current snapshot."""
+        if self._reload_requested or time.monotonic() - self._checked_at >= self.check_interval:
+            self._check()
+        return self._snapshot
+
+    def reload(self):
+        """Rebuild the snapshot from the environment and the settings file.
+
+        Returns:
+            bool: True if the snapshot was replaced.
+
+        """
+        with self._lock:
+            return self._reload()
+
+    def install_signal_handler(self):
+        """Rebuild the snapshot when the process receives SIGHUP.
+
+        Any handler installed before is still called. Signal handlers can only be
+        installed from the main thread.
+
+        Returns:
+            bool: True if the handler was installed.
+
+        """
+        if not hasattr(signal, 'SIGHUP') or threading.current_thread() is not threading.main_thread():
+            return False
+
+        previous = signal.getsignal(signal.SIGHUP)
+
+        def handle_sighup(signum, frame):
+            # the reload itself runs on the next read, outside of the signal handler
+            self._reload_requested = True
+            if callable(previous):
+                previous(signum, frame)
+
+        signal.signal(signal.SIGHUP, handle_sighup)
+        return True
+
+    def _check(self):
+        with self._lock:
+            # another thread may have checked while this one waited
+            if not self._reload_requested and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            self._checked_at = time.monotonic()
+            if self._reload_requested or self._modification_time() != self._mtime:
+                self._reload()
+
+    def _reload(self):
+        self._reload_requested = False
+        # a file that cannot be read is retried once it changes again
+        self._mtime = self._modification_time()
+        try:
+            snapshot = Settings.load(self.settings_file)
+        except Exception as e:
+            logger.error('Failed to reload the settings, keeping the current ones: {}'.format(str(e)))
+            return False
+
+        self._snapshot = snapshot
+        logger.info('Reloaded the settings: {}'.format(snapshot))
+        return True
+
+    def _modification_time(self):
+        try:
+            return os.stat(self.settings_file).st_mtime_ns
+        except OSError:
+            return None
+
+
+settings = LiveSettings(check_interval=Config.get_settings_check_interval())
@@ -1,2 +1,4 @@
 from mci.helpers.helpers import build_links, compute_offset, compute_page, validate_email,\
-    error_message
+    error_message, encode_cursor, decode_cursor, build_cursor_links, compute_etag,\
+    conditional_response
+from mci.helpers.cache import TTLCache
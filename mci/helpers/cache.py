@@ -0,0 +1,100 @@
+"""In-Process Caches.
+
+Small, thread-safe caches shared by every request served by a single worker.
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    """A bounded least-recently-used cache whose entries expire.
+
+    Each gunicorn worker holds its own instances, so entries written by one
+    worker are never seen by another. The time-to-live bounds how long a
+    worker may serve data that was changed elsewhere.
+
+    Args:
+        ttl (float): Number of seconds an entry stays valid.
+        maxsize (int): Number of entries kept before the least recently used one is evicted.
+
+    """
+
+    def __init__(self, ttl: float = 300, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Retrieve a value from the cache.
+
+        Args:
+            key (object): The cache key.
+            default (object): Value to return if the key is missing or expired.
+
+        Returns:
+            object: The cached value or `default`.
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl: float = None):
+        """Store a value in the cache.
+
+        Args:
+            key (object): The cache key.
+            value (object): The value to store.
+            ttl (float): Optional time-to-live overriding the cache default.
+
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove a single entry from the cache.
+
+        Args:
+            key (object): The cache key.
+
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Report the cache usage counters.
+
+        Returns:
+            dict: Hits, misses, current size and maximum size of the cache.
+
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
@@ -1,8 +1,15 @@
 """General Purpose Helper Functions."""
 
+import base64
+import hashlib
+import json
 import math
 import re
 from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import Response
+from werkzeug.http import quote_etag
 
 
 def compute_offset(page, items_per_page):
@@ -34,14 +41,21 @@ def compute_page(offset, items_per_page):
     return int(math.ceil((offset / items_per_page))) + 1
 
 
-def build_links(endpoint: str, offset: int, limit: int, rows: int):
+def build_links(endpoint: str, offset: int, limit: int, rows: int, has_more: bool = None,
+                params: dict = None):
     """Build links for a paginated response
 
+    When `has_more` is given it decides whether a `next` link is produced, so the
+    links stay correct when `rows` is an estimate. When `rows` is None the total is
+    unknown and no `last` link is produced unless this is the last page.
+
     Args:
         endpoint (str): Name of the endpoint to provide in the link.
         offset (int): Database query offset.
         limit (int): Number of items to return in query.
-        rows (int): Count of rows in table.
+        rows (int): Count of rows in table (possibly approximate), or None if unknown.
+        has_more (bool): Whether rows exist beyond the current page, if known.
+        params (dict): Additional query parameters to carry into every link (e.g. `fields`).
 
     Returns:
         dict: The links based on the offset and limit
@@ -50,9 +64,22 @@ def build_links(endpoint: str, offset: int, limit: int, rows: int):
 
     # URL and pages
     url_link = '/{}?offset={}&limit={}'
-    total_pages = int(math.ceil(rows / limit))
+    if rows is None:
+        # keep the client's choice not to count on every page it follows
+        url_link += '&count=false'
+    url_link += _link_params(params)
     current_page = compute_page(offset, limit)
 
+    if has_more is None:
+        total_pages = int(math.ceil(rows / limit))
+        has_more = current_page < total_pages
+    elif not has_more:
+        total_pages = current_page
+    elif rows is not None:
+        total_pages = max(int(math.ceil(rows / limit)), current_page + 1)
+    else:
+        total_pages = None
+
     # Links
     links = OrderedDict()
     current = OrderedDict()
@@ -76,20 +103,138 @@ def build_links(endpoint: str, offset: int, limit: int, rows: int):
             endpoint, compute_offset(current_page - 1, limit), limit)
         links.append(prev)
 
-    if current_page < total_pages:
+    if has_more:
         next['rel'] = 'next'
         next['href'] = url_link.format(
             endpoint, compute_offset(current_page + 1, limit), limit)
         links.append(next)
 
-    last['rel'] = 'last'
-    last['href'] = url_link.format(
-        endpoint, compute_offset(total_pages, limit), limit)
-    links.append(last)
+    if total_pages is not None:
+        last['rel'] = 'last'
+        last['href'] = url_link.format(
+            endpoint, compute_offset(total_pages, limit), limit)
+        links.append(last)
 
     return links
 
 
+def _link_params(params: dict = None):
+    if not params:
+        return ''
+    return '&' + urlencode(params, safe=',')
+
+
+def encode_cursor(direction: str, key: str):
+    """Encode an opaque pagination cursor.
+
+    Args:
+        direction (str): Either `next` (rows after the key) or `prev` (rows before the key).
+        key (str): The sort key of the row the cursor points from.
+
+    Returns:
+        str: The URL-safe cursor.
+
+    """
+    payload = json.dumps({'d': direction, 'k': key}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Decode an opaque pagination cursor.
+
+    Args:
+        cursor (str): A cursor produced by `encode_cursor`.
+
+    Returns:
+        str, str: The direction and the sort key.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        direction, key = payload['d'], payload['k']
+    except Exception:
+        raise ValueError('Invalid cursor.')
+
+    if direction not in ('next', 'prev') or not isinstance(key, str):
+        raise ValueError('Invalid cursor.')
+
+    return direction, key
+
+
+def build_cursor_links(endpoint: str, limit: int, cursor: str = '', next_cursor: str = None,
+                       prev_cursor: str = None, params: dict = None):
+    """Build links for a cursor paginated response.
+
+    Args:
+        endpoint (str): Name of the endpoint to provide in the link.
+        limit (int): Number of items to return in query.
+        cursor (str): The cursor of the current page (empty for the first page).
+        next_cursor (str): Cursor of the following page, if there is one.
+        prev_cursor (str): Cursor of the preceding page, if there is one.
+        params (dict): Additional query parameters to carry into every link (e.g. `fields`).
+
+    Returns:
+        list: The links based on the cursors and limit.
+
+    """
+
+    url_link = '/{}?cursor={}&limit={}' + _link_params(params)
+    links = []
+
+    links.append(OrderedDict([('rel', 'self'), ('href', url_link.format(endpoint, cursor, limit))]))
+    links.append(OrderedDict([('rel', 'first'), ('href', url_link.format(endpoint, '', limit))]))
+
+    if prev_cursor is not None:
+        links.append(OrderedDict([('rel', 'prev'), ('href', url_link.format(endpoint, prev_cursor, limit))]))
+
+    if next_cursor is not None:
+        links.append(OrderedDict([('rel', 'next'), ('href', url_link.format(endpoint, next_cursor, limit))]))
+
+    return links
+
+
+def compute_etag(body):
+    """Compute a strong entity tag from the content of a response body.
+
+    Args:
+        body (dict): The response body.
+
+    Returns:
+        str: The unquoted entity tag.
+
+    """
+    content = json.dumps(body, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+
+
+def conditional_response(body, status_code=200, if_none_match=None, etag: str = None):
+    """Answer a GET request, honouring its `If-None-Match` header.
+
+    Args:
+        body (dict): The response body.
+        status_code (int): HTTP status code to return with the body.
+        if_none_match (ETags): The entity tags sent by the client (`request.if_none_match`).
+        etag (str): The unquoted entity tag of the body, if already known.
+
+    Return:
+        dict, int, dict: The body, status code and `ETag` header, or
+            Response: An empty `304 Not Modified` response if the client's copy is current.
+
+    """
+    if etag is None:
+        etag = compute_etag(body)
+
+    headers = {'ETag': quote_etag(etag)}
+    if if_none_match is not None and etag in if_none_match:
+        return Response(status=304, headers=headers)
+
+    return body, status_code, headers
+
+
 def validate_email(email_address):
     """Rudimentary email address validator.
 
@@ -0,0 +1,3 @@
+from mci.instrumentation.queries import QueryLog, QueryTracker, query_tracker, statement_shape
+from mci.instrumentation.registry import CONTENT_TYPE, MetricsRegistry, metrics
+from mci.instrumentation.auth import InstrumentedProvider
@@ -0,0 +1,42 @@
+"""Instrumented OAuth 2.0 Provider
+
+Times access token validation for the `mci_auth_validation_duration_seconds` metric.
+
+"""
+
+import time
+
+from mci.instrumentation.registry import AUTH_VALIDATION_DURATION
+
+
+class InstrumentedProvider(object):
+    """Wraps an OAuth 2.0 provider, timing each token validation.
+
+    Every other attribute is read from the wrapped provider.
+
+    Args:
+        provider (OAuth2Provider): The provider.
+
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def validate_token(self, *args, **kwargs):
+        """Validate the access token of the current request.
+
+        Returns:
+            bool: The result of the wrapped provider.
+
+        """
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            valid = self.provider.validate_token(*args, **kwargs)
+            outcome = 'valid' if valid else 'invalid'
+            return valid
+        finally:
+            AUTH_VALIDATION_DURATION.observe(time.perf_counter() - start, outcome=outcome)
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
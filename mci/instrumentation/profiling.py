@@ -0,0 +1,182 @@
+"""Request Profiling
+
+Profiles individual requests with cProfile, on demand. A request is profiled when
+it carries the profiling token in its `X-Profile-Token` header (`PROFILE_TOKEN`),
+or at random at `PROFILE_SAMPLE_RATE`. Each profile records the SQL statements the
+request executed and its matching service calls, with their durations.
+
+Profiles are written to `PROFILE_DIR` as a pstats file (`<id>.prof`, readable with
+`pstats` or snakeviz) and a JSON summary (`<id>.json`). With `PROFILE_INLINE`
+(meant for development) the summary is also returned in place of the response
+body, as `{"response": <body>, "profile": <summary>}`.
+
+When neither a token nor a sample rate is configured, no resource method is
+wrapped, so profiling costs nothing.
+
+cProfile hooks the thread it is enabled in, and gevent workers serve every
+request in one thread, so each worker profiles one request at a time: a request
+selected while another one is profiled is served unprofiled. Greenlets that run
+while the profiled request waits on I/O are still charged to its profile.
+
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import wraps
+
+from flask import g, has_request_context, request
+from werkzeug.wrappers import Response
+
+from mci.config import Config
+from mci.instrumentation.queries import query_tracker
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+# number of functions listed in the JSON summary
+SUMMARY_FUNCTIONS = 40
+
+
+class RequestProfiler(object):
+    """Profiles the resource methods of selected requests.
+
+    Args:
+        token (str): Token a request sends in `X-Profile-Token` to be profiled.
+        sample_rate (float): Fraction of requests profiled at random.
+        directory (str): Directory the profiles are written to.
+        inline (bool): Also return the summary in the response body.
+
+    """
+
+    def __init__(self, token: str = None, sample_rate: float = 0, directory: str = None, inline: bool = False):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.inline = inline
+        self._active = threading.Lock()
+
+    @property
+    def enabled(self):
+        """bool: True if some requests may be profiled."""
+        return bool(self.token) or self.sample_rate > 0
+
+    def decorators(self):
+        """List the decorators resource methods are wrapped in.
+
+        Returns:
+            list: `[profile]` if profiling is enabled, otherwise an empty list.
+
+        """
+        return [self.profile] if self.enabled else []
+
+    def profile(self, f):
+        """Wrap a resource method so that selected requests are profiled.
+
+        Args:
+            f (callable): The resource method.
+
+        Returns:
+            callable: The wrapped method.
+
+        """
+        @wraps(f)
+        def wrapped_f(*args, **kwargs):
+            if not self._selected():
+                return f(*args, **kwargs)
+
+            try:
+                g.profile = {'matching_service': []}
+                profile = cProfile.Profile()
+                with query_tracker.track() as query_log:
+                    start = time.perf_counter()
+                    profile.enable()
+                    try:
+                        result = f(*args, **kwargs)
+                    finally:
+                        profile.disable()
+                        duration = time.perf_counter() - start
+                        attachments = g.pop('profile')
+                        attachments['sql'] = [{'statement': statement, 'duration': statement_duration}
+                                              for statement, statement_duration in zip(query_log.statements,
+                                                                                       query_log.durations)]
+                        summary = self._save(profile, duration, attachments)
+            finally:
+                self._active.release()
+
+            if self.inline:
+                result = self._inline(result, summary)
+            return result
+        return wrapped_f
+
+    def record_matching_call(self, duration: float, outcome: str):
+        """Attach a matching service call to the profile of the current request.
+
+        Args:
+            duration (float): Seconds the call took.
+            outcome (str): The call outcome (see `mci_matching_service_request_duration_seconds`).
+
+        """
+        if has_request_context() and 'profile' in g:
+            g.profile['matching_service'].append({'duration': duration, 'outcome': outcome})
+
+    def _selected(self):
+        selected = False
+        if self.token:
+            header = request.headers.get(PROFILE_HEADER)
+            selected = bool(header) and hmac.compare_digest(header, self.token)
+        if not selected:
+            selected = self.sample_rate > 0 and random.random() < self.sample_rate
+        # the caller releases the lock once the profile is saved
+        return selected and self._active.acquire(blocking=False)
+
+    def _save(self, profile, duration, attachments):
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(SUMMARY_FUNCTIONS)
+
+        profile_id = '{}-{}'.format(datetime.utcnow().strftime('%Y%m%dT%H%M%S'), uuid.uuid4().hex[:8])
+        summary = {
+            'profile_id': profile_id,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.url_rule.rule if request.url_rule is not None else None,
+            'duration': duration,
+            'sql': attachments['sql'],
+            'matching_service': attachments['matching_service'],
+            'functions': stream.getvalue().splitlines()
+        }
+
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            profile.dump_stats(os.path.join(self.directory, '{}.prof'.format(profile_id)))
+            with open(os.path.join(self.directory, '{}.json'.format(profile_id)), 'w') as f:
+                json.dump(summary, f, indent=2)
+        except OSError as e:
+            logger.error('Failed to write profile {}: {}'.format(profile_id, str(e)))
+        else:
+            logger.info('Profiled {} {} in {:.3f}s: {}'.format(request.method, request.path, duration, profile_id))
+
+        return summary
+
+    def _inline(self, result, summary):
+        # streamed and other prebuilt responses are left alone
+        if isinstance(result, Response):
+            return result
+        if isinstance(result, tuple):
+            return ({'response': result[0], 'profile': summary},) + result[1:]
+        return {'response': result, 'profile': summary}
+
+
+profiler = RequestProfiler(token=Config.get_profile_token(), sample_rate=Config.get_profile_sample_rate(),
+                           directory=Config.get_profile_dir(), inline=Config.get_profile_inline())
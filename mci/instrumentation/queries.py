@@ -0,0 +1,211 @@
+"""Query Tracking
+
+Records the SQL statements executed by each request: how many, how long they
+took, and which statement shapes were repeated. A shape is a statement with its
+parameters and literals masked, so the same query issued for different rows
+(the N+1 pattern: one query per row of a listing) has a single shape.
+
+In debug mode every response carries `X-Query-Count`, `X-Query-Time` (seconds)
+and `X-Query-Repeated` (the number of shapes executed at least
+`QUERY_REPEAT_THRESHOLD` times) headers, and repeated shapes are logged.
+
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_PARAMETERS = re.compile(r'%\(\w+\)s|%s|(?<!:):\w+|\?')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETER_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def statement_shape(statement: str):
+    """Mask the parameters and literals of a SQL statement.
+
+    Args:
+        statement (str): The statement.
+
+    Returns:
+        str: The statement with whitespace collapsed, every parameter and literal
+            replaced by `?` and every list of them by `(?)`.
+
+    """
+    shape = ' '.join(statement.split())
+    shape = _PARAMETERS.sub('?', shape)
+    shape = _LITERALS.sub('?', shape)
+    return _PARAMETER_LISTS.sub('(?)', shape)
+
+
+class QueryLog(object):
+    """The statements executed during a request or a tracked block.
+
+    Attributes:
+        statements (list): The statements, in execution order.
+        durations (list): Seconds each statement took.
+        total_time (float): Seconds spent executing them.
+
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.durations = []
+        self.total_time = 0.0
+
+    @property
+    def count(self):
+        """int: Number of statements executed."""
+        return len(self.statements)
+
+    def record(self, statement: str, duration: float):
+        """Record an executed statement.
+
+        Args:
+            statement (str): The statement.
+            duration (float): Seconds it took.
+
+        """
+        self.statements.append(statement)
+        self.durations.append(duration)
+        self.total_time += duration
+
+    def repeated(self, threshold: int):
+        """Find the statement shapes executed repeatedly.
+
+        Args:
+            threshold (int): Number of executions from which a shape is reported.
+
+        Returns:
+            dict: Shape -> number of executions, for the shapes executed at least `threshold` times.
+
+        """
+        shapes = Counter(statement_shape(statement) for statement in self.statements)
+        return {shape: count for shape, count in shapes.items() if count >= threshold}
+
+
+class QueryTracker(object):
+    """Keeps the query log of each request.
+
+    Args:
+        repeat_threshold (int): Number of executions from which a statement shape is reported.
+
+    """
+
+    def __init__(self, repeat_threshold: int = 3):
+        self.repeat_threshold = repeat_threshold
+        self._observers = []
+        self._tracked = threading.local()
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def init_app(self, app, repeat_threshold: int = None):
+        """Log the queries of every request of an application.
+
+        Args:
+            app (Flask): The application.
+            repeat_threshold (int): Number of executions from which a statement shape is reported.
+
+        """
+        if repeat_threshold is not None:
+            self.repeat_threshold = repeat_threshold
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def current(self):
+        """Retrieve the query log of the current request.
+
+        Returns:
+            QueryLog: The log, or None outside of a request.
+
+        """
+        if has_request_context():
+            return g.get('query_log')
+        return None
+
+    @contextmanager
+    def track(self):
+        """Log the queries executed by the current thread within a block.
+
+        Yields:
+            QueryLog: The log, filled in as queries run.
+
+        """
+        query_log = QueryLog()
+        stack = self._tracking()
+        stack.append(query_log)
+        try:
+            yield query_log
+        finally:
+            stack.remove(query_log)
+
+    def add_observer(self, observer):
+        """Call a function with the query log of each completed request.
+
+        Args:
+            observer (callable): Called with the endpoint (`METHOD /rule`) and the `QueryLog`.
+
+        """
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        """Stop calling a function added with `add_observer`.
+
+        Args:
+            observer (callable): The function.
+
+        """
+        self._observers.remove(observer)
+
+    def _tracking(self):
+        if not hasattr(self._tracked, 'logs'):
+            self._tracked.logs = []
+        return self._tracked.logs
+
+    def _before_request(self):
+        g.query_log = QueryLog()
+
+    def _after_request(self, response):
+        query_log = g.get('query_log')
+        if query_log is None:
+            return response
+
+        endpoint = '{} {}'.format(request.method, request.url_rule.rule if request.url_rule is not None else request.path)
+        for observer in list(self._observers):
+            observer(endpoint, query_log)
+
+        if current_app.debug:
+            repeated = query_log.repeated(self.repeat_threshold)
+            for shape, count in repeated.items():
+                logger.warning('Statement executed {} times by {}: {}'.format(count, endpoint, shape))
+            response.headers['X-Query-Count'] = str(query_log.count)
+            response.headers['X-Query-Time'] = '{:.6f}'.format(query_log.total_time)
+            response.headers['X-Query-Repeated'] = str(len(repeated))
+
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_start')
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+
+        query_log = self.current()
+        if query_log is not None:
+            query_log.record(statement, duration)
+        for tracked_log in self._tracking():
+            tracked_log.record(statement, duration)
+
+
+query_tracker = QueryTracker()
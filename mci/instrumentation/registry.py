@@ -0,0 +1,402 @@
+"""Metrics
+
+Counters and histograms exposed at `/metrics` in the Prometheus text format.
+
+Recording a value only updates a dictionary under a lock. Every gunicorn worker
+keeps its own values and periodically writes them to a file of its own in the
+metrics directory (`METRICS_DIR`, shared by the workers of a host); the worker
+answering a scrape merges every file, so the totals cover all workers. The
+values of workers that exited are folded into a single archive file, so that
+their counts are not lost and the directory does not grow with every restart
+of a worker. The directory is cleared when the server starts (see `cmd.sh`).
+
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+from mci.instrumentation.queries import query_tracker
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# the values of exited workers, in the metrics directory
+ARCHIVE_FILE = 'archive.json'
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append('{}="{}"'.format(*extra))
+    return '{{{}}}'.format(','.join(pairs)) if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric(object):
+    """A family of values sharing a name, one per combination of label values.
+
+    Args:
+        registry (MetricsRegistry): The registry holding the values.
+        name (str): Metric name.
+        documentation (str): Help text.
+        labelnames (tuple): Names of the labels.
+
+    """
+
+    kind = None
+
+    def __init__(self, registry, name: str, documentation: str, labelnames: tuple = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        """Increment the counter.
+
+        Args:
+            amount (float): Amount to add.
+            **labels: Label values.
+
+        """
+        key = self._key(labels)
+        with self.registry.lock:
+            values = self.registry.values[self.name]
+            values[key] = values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Counts observations in cumulative buckets.
+
+    Args:
+        buckets (tuple): Upper bounds of the buckets, in increasing order.
+
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        """Record an observation.
+
+        Args:
+            value (float): The observed value.
+            **labels: Label values.
+
+        """
+        key = self._key(labels)
+        with self.registry.lock:
+            values = self.registry.values[self.name]
+            entry = values.get(key)
+            if entry is None:
+                entry = values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+
+class MetricsRegistry(object):
+    """The metrics of a worker process.
+
+    Args:
+        directory (str): Directory where the workers of a host write their values.
+        flush_interval (float): Seconds between writes of this worker's values.
+
+    """
+
+    def __init__(self, directory: str = None, flush_interval: float = 5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self.values = {}
+        self.lock = threading.Lock()
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()):
+        """Declare a counter.
+
+        Returns:
+            Counter: The counter.
+
+        """
+        return self._declare(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        """Declare a histogram.
+
+        Returns:
+            Histogram: The histogram.
+
+        """
+        return self._declare(Histogram(self, name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """Copy the values of this worker.
+
+        Returns:
+            dict: Metric name -> list of [label values, value] pairs (JSON serializable).
+
+        """
+        with self.lock:
+            return {name: [[list(key), value if self.metrics[name].kind == 'counter'
+                            else [list(value[0]), value[1], value[2]]]
+                           for key, value in values.items()]
+                    for name, values in self.values.items()}
+
+    def flush(self):
+        """Write the values of this worker to the metrics directory."""
+        if self.directory is None:
+            return
+        self._write('{}.json'.format(os.getpid()), self.snapshot())
+
+    def collect(self):
+        """Gather the values of every worker of the host.
+
+        Returns:
+            list: Snapshots (see `snapshot`), this worker's being current.
+
+        """
+        if self.directory is None:
+            return [self.snapshot()]
+
+        self.flush()
+        for entry in os.scandir(self.directory):
+            pid = entry.name[:-len('.json')]
+            if entry.name.endswith('.json') and pid.isdigit() and not _is_running(int(pid)):
+                self.mark_process_dead(int(pid))
+
+        # a worker's values move to the archive under an exclusive lock, so they are counted exactly once
+        with self._directory_lock(fcntl.LOCK_SH):
+            snapshots = []
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith('.json'):
+                    continue
+                snapshot = self._read(entry.path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        return snapshots
+
+    def mark_process_dead(self, pid: int):
+        """Fold the values of an exited worker into the archive and remove its file.
+
+        Args:
+            pid (int): Process ID of the worker.
+
+        """
+        if self.directory is None:
+            return
+
+        path = os.path.join(self.directory, '{}.json'.format(pid))
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        with self._directory_lock(fcntl.LOCK_EX):
+            snapshot = self._read(path)
+            if snapshot is None:
+                return
+            archive = self._read(archive_path) or {}
+            merged = self._merge([archive, snapshot])
+            self._write(ARCHIVE_FILE, {name: [[list(key), value] for key, value in values.items()]
+                                       for name, values in merged.items()})
+            os.remove(path)
+
+    def render(self, snapshots: list = None):
+        """Render metrics in the Prometheus text exposition format.
+
+        Args:
+            snapshots (list): Snapshots to sum (defaults to `collect()`).
+
+        Returns:
+            str: The exposition.
+
+        """
+        if snapshots is None:
+            snapshots = self.collect()
+
+        merged_values = self._merge(snapshots)
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            merged = merged_values[name]
+            lines.append('# HELP {} {}'.format(name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(name, metric.kind))
+            for key, value in sorted(merged.items()):
+                if metric.kind == 'counter':
+                    lines.append('{}{} {}'.format(name, _format_labels(metric.labelnames, key), _format_value(value)))
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value[0]):
+                    cumulative += count
+                    labels = _format_labels(metric.labelnames, key, ('le', _format_value(bound)))
+                    lines.append('{}_bucket{} {}'.format(name, labels, _format_value(cumulative)))
+                labels = _format_labels(metric.labelnames, key)
+                lines.append('{}_sum{} {}'.format(name, labels, _format_value(value[1])))
+                lines.append('{}_count{} {}'.format(name, labels, _format_value(value[2])))
+
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        """Reset the values of this worker."""
+        with self.lock:
+            for values in self.values.values():
+                values.clear()
+
+    def init_app(self, app, directory: str = None, flush_interval: float = None):
+        """Record request, latency and database metrics for an application.
+
+        Args:
+            app (Flask): The application.
+            directory (str): Directory where the workers of a host write their values.
+            flush_interval (float): Seconds between writes of this worker's values.
+
+        """
+        if directory is not None:
+            self.directory = directory
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _merge(self, snapshots: list):
+        merged_values = {}
+        for name, metric in self.metrics.items():
+            merged = merged_values[name] = {}
+            for snapshot in snapshots:
+                for key, value in snapshot.get(name, []):
+                    key = tuple(key)
+                    if metric.kind == 'counter':
+                        merged[key] = merged.get(key, 0) + value
+                    else:
+                        entry = merged.setdefault(key, [[0] * len(metric.buckets), 0.0, 0])
+                        entry[0] = [a + b for a, b in zip(entry[0], value[0])]
+                        entry[1] += value[1]
+                        entry[2] += value[2]
+        return merged_values
+
+    def _read(self, path: str):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name: str, snapshot: dict):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        # write to a temporary file first so scrapes never read a partial snapshot
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.rename(temporary_path, os.path.join(self.directory, name))
+
+    @contextmanager
+    def _directory_lock(self, operation: int):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'a') as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _declare(self, metric):
+        self.metrics[metric.name] = metric
+        self.values[metric.name] = {}
+        return metric
+
+    def _ensure_writer(self):
+        # threads do not survive a fork, so each worker process starts its own
+        if self.directory is None or self._writer_pid == os.getpid():
+            return
+        with self._writer_lock:
+            if self._writer_pid == os.getpid():
+                return
+            threading.Thread(target=self._write_periodically, name='metrics-writer', daemon=True).start()
+            self._writer_pid = os.getpid()
+
+    def _write_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def _before_request(self):
+        self._ensure_writer()
+        g.metrics_start = time.perf_counter()
+
+    def _after_request(self, response):
+        start = g.get('metrics_start')
+        if start is None:
+            return response
+
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = {'endpoint': endpoint, 'method': request.method, 'status': response.status_code}
+        HTTP_REQUESTS.inc(**labels)
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, **labels)
+        query_log = query_tracker.current()
+        if query_log is not None:
+            DB_QUERIES.observe(query_log.count, endpoint=endpoint)
+            DB_TIME.observe(query_log.total_time, endpoint=endpoint)
+        return response
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    'mci_http_requests_total', 'HTTP requests served.', ('endpoint', 'method', 'status'))
+HTTP_REQUEST_DURATION = metrics.histogram(
+    'mci_http_request_duration_seconds', 'Time spent serving HTTP requests.', ('endpoint', 'method', 'status'))
+DB_QUERIES = metrics.histogram(
+    'mci_db_queries_per_request', 'Database queries issued by an HTTP request.', ('endpoint',),
+    buckets=QUERY_COUNT_BUCKETS)
+DB_TIME = metrics.histogram(
+    'mci_db_time_per_request_seconds', 'Time an HTTP request spent waiting on database queries.', ('endpoint',))
+MATCHING_REQUEST_DURATION = metrics.histogram(
+    'mci_matching_service_request_duration_seconds', 'Time spent calling the matching service.', ('outcome',))
+AUTH_VALIDATION_DURATION = metrics.histogram(
+    'mci_auth_validation_duration_seconds', 'Time spent validating access tokens.', ('outcome',))
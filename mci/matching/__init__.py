@@ -0,0 +1,3 @@
+from mci.matching.breaker import CircuitBreaker, CircuitOpenError
+from mci.matching.client import MatchingServiceClient, get_matching_client
+from mci.matching.pending import PendingMatchQueue, PendingMatchWorker, pending_matches
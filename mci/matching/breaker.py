@@ -0,0 +1,132 @@
+"""Matching Service Circuit Breaker
+
+Stops calling the matching service for a while after repeated failures, so
+that registrations fail (or are deferred) immediately instead of waiting
+for a timeout.
+
+"""
+
+import threading
+import time
+
+from requests.exceptions import RequestException
+
+
+class CircuitOpenError(RequestException):
+    """Raise when a call is refused because the circuit breaker is open."""
+    pass
+
+
+class CircuitBreaker(object):
+    """A consecutive-failure circuit breaker.
+
+    The breaker starts `closed`. After `failure_threshold` consecutive failures it
+    opens and refuses every call for `reset_timeout` seconds. It then becomes
+    `half_open` and lets a single trial call through: a success closes the
+    breaker, a failure opens it again.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the breaker.
+        reset_timeout (float): Seconds the breaker stays open before a trial call.
+
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._trial_in_flight = False
+        self._rejected = 0
+
+    @property
+    def state(self):
+        """str: The current state of the breaker."""
+        with self._lock:
+            if self._state == self.OPEN and self._reset_timeout_elapsed():
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        """Decide whether a call may be made.
+
+        Returns:
+            bool: True if the call may proceed, False if it must fail fast.
+
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._reset_timeout_elapsed():
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        """Record a successful call."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Let another trial call through after one was interrupted without an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_after(self):
+        """Seconds until the breaker lets a trial call through.
+
+        Returns:
+            int: Seconds to wait, 0 if calls are currently allowed.
+
+        """
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            return max(0, int(remaining + 0.999))
+
+    def reset(self):
+        """Close the breaker and forget past failures."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+            self._rejected = 0
+
+    def stats(self):
+        """Report the breaker state.
+
+        Returns:
+            dict: State, consecutive failures and number of refused calls.
+
+        """
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'rejected': self._rejected
+            }
+
+    def _reset_timeout_elapsed(self):
+        return time.monotonic() - self._opened_at >= self.reset_timeout
@@ -0,0 +1,183 @@
+"""Matching Service Client
+
+A pooled, keep-alive HTTP client for the mci-matching-service.
+
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from mci.config import Config
+from mci.instrumentation.profiling import profiler
+from mci.instrumentation.registry import MATCHING_REQUEST_DURATION
+from mci.matching.breaker import CircuitBreaker, CircuitOpenError
+
+
+class MatchingServiceClient(object):
+    """HTTP client for the matching service.
+
+    Connections are kept alive in a bounded pool and reused across requests.
+    Only failures to connect are retried: the request never reached the
+    matching service, so sending it again is always safe. Read timeouts and
+    error responses are returned to the caller immediately.
+
+    Failed calls (connection errors, timeouts and 5xx responses) are reported
+    to the optional circuit breaker; while it is open, calls fail fast with
+    `CircuitOpenError`.
+
+    Args:
+        uri (str): URI of the matching service `compute-match` endpoint.
+        pool_size (int): Maximum number of connections kept open.
+        connect_timeout (float): Seconds to wait for a connection.
+        read_timeout (float): Seconds to wait for the match response.
+        max_retries (int): Number of times a failed connection is retried.
+        backoff_factor (float): Backoff factor between connection retries.
+        breaker (CircuitBreaker): Optional circuit breaker guarding the calls.
+
+    """
+
+    def __init__(self, uri: str, pool_size: int = 10, connect_timeout: float = 1.0,
+                 read_timeout: float = 5.0, max_retries: int = 2, backoff_factor: float = 0.1,
+                 breaker: CircuitBreaker = None):
+        self.uri = uri
+        self.breaker = breaker
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+
+        retries = Retry(total=max_retries, connect=max_retries, read=0, status=0,
+                        redirect=0, backoff_factor=backoff_factor, raise_on_status=False)
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                    max_retries=retries)
+        self._session = requests.Session()
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests = 0
+        self._saturated = 0
+        self._failures = 0
+
+    def match(self, new_user_json: str):
+        """Ask the matching service for an existing individual matching a candidate.
+
+        Args:
+            new_user_json (str): The serialized candidate.
+
+        Returns:
+            Response: The matching service response.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker refused the call.
+            RequestException: If the matching service could not be reached or timed out.
+
+        """
+        if self.breaker is not None and not self.breaker.allow_request():
+            MATCHING_REQUEST_DURATION.observe(0, outcome='circuit_open')
+            raise CircuitOpenError('The matching service circuit breaker is open.')
+
+        with self._lock:
+            if self._in_flight >= self.pool_size:
+                self._saturated += 1
+            self._in_flight += 1
+            self._requests += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        start = time.perf_counter()
+        try:
+            response = self._session.post(
+                self.uri, data=new_user_json, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            self._record_call(start, 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'connection_error')
+            with self._lock:
+                self._failures += 1
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        except BaseException:
+            # an interrupted call (e.g. the client went away) says nothing about the matching service
+            if self.breaker is not None:
+                self.breaker.release_trial()
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        self._record_call(start, 'ok' if response.status_code < 400 else 'error_response')
+
+        if self.breaker is not None:
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+        return response
+
+    def _record_call(self, start: float, outcome: str):
+        duration = time.perf_counter() - start
+        MATCHING_REQUEST_DURATION.observe(duration, outcome=outcome)
+        profiler.record_matching_call(duration, outcome)
+
+    def stats(self):
+        """Report connection pool usage.
+
+        Returns:
+            dict: Pool size, requests in flight (current and peak), total requests,
+                requests started while every pooled connection was busy, failures
+                and the circuit breaker state.
+
+        """
+        with self._lock:
+            stats = {
+                'pool_size': self.pool_size,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'requests': self._requests,
+                'saturated': self._saturated,
+                'failures': self._failures
+            }
+        if self.breaker is not None:
+            stats['circuit_breaker'] = self.breaker.stats()
+
+        return stats
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_matching_client():
+    """Retrieve the matching service client of the current worker process.
+
+    The client is created lazily and recreated after a fork, so gunicorn workers
+    never share pooled connections.
+
+    Returns:
+        MatchingServiceClient: The client of the current process.
+
+    """
+    global _client, _client_pid
+
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = MatchingServiceClient(
+                    uri=Config.get_matching_service_uri(),
+                    pool_size=Config.get_matching_service_pool_size(),
+                    connect_timeout=Config.get_matching_service_connect_timeout(),
+                    read_timeout=Config.get_matching_service_read_timeout(),
+                    max_retries=Config.get_matching_service_max_retries(),
+                    backoff_factor=Config.get_matching_service_backoff_factor(),
+                    breaker=CircuitBreaker(
+                        failure_threshold=Config.get_matching_breaker_failure_threshold(),
+                        reset_timeout=Config.get_matching_breaker_reset_timeout()))
+                _client_pid = os.getpid()
+
+    return _client
@@ -0,0 +1,292 @@
+"""Pending Match Queue
+
+When the matching service is unavailable and deferred matching is enabled,
+registrations are accepted into a spool directory and completed later by a
+background worker.
+
+The spool is a directory rather than a table so that every worker process on
+the host sees the same tickets: the status URL may be polled on any worker and
+any worker may drain the queue. Each ticket moves between three directories:
+
+    pending/     waiting for the matching service (holds the registration payload)
+    processing/  claimed by a worker (claims are atomic renames)
+    done/        the outcome (MCI ID or errors); the payload is discarded
+
+The spool must be configured explicitly with `PENDING_MATCH_DIR` and
+`PENDING_MATCH_KEY`: registration payloads hold PII, so they are only written
+encrypted (AES-GCM, bound to their ticket ID) to a directory chosen for them.
+Outcomes are removed `PENDING_MATCH_RETENTION` seconds after completion.
+
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from Crypto.Cipher import AES
+from requests.exceptions import RequestException
+
+from mci.config import Config
+
+logger = logging.getLogger(__name__)
+
+TICKET_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class PendingMatchQueue(object):
+    """A file-system spool of registrations waiting for the matching service.
+
+    Args:
+        directory (str): Spool directory, shared by the worker processes of a host.
+        key (bytes): AES key (16, 24 or 32 bytes) encrypting the registration payloads.
+        lease (float): Seconds after which a claimed ticket whose worker died is reclaimed.
+        retention (float): Seconds an outcome can be polled for after completion.
+
+    """
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+
+    def __init__(self, directory: str, key: bytes, lease: float = 300, retention: float = 86400):
+        self.directory = directory
+        self.key = key
+        self.lease = lease
+        self.retention = retention
+
+    @property
+    def enabled(self):
+        """bool: True if both the spool directory and the encryption key are configured."""
+        return bool(self.directory) and bool(self.key)
+
+    def enqueue(self, user: dict):
+        """Accept a registration into the queue.
+
+        Args:
+            user (dict): The registration payload.
+
+        Returns:
+            str: The ticket ID used to poll for the outcome.
+
+        """
+        ticket_id = uuid.uuid4().hex
+        self._write(self.PENDING, ticket_id, {
+            'ticket_id': ticket_id,
+            'status': 'pending',
+            'submitted': str(datetime.utcnow()),
+            'payload': self._encrypt(ticket_id, user)
+        })
+        return ticket_id
+
+    def status(self, ticket_id: str):
+        """Retrieve the status of a ticket.
+
+        Args:
+            ticket_id (str): The ticket ID.
+
+        Returns:
+            dict: The ticket status (without the registration payload), or None if the ticket is unknown.
+
+        """
+        if not TICKET_PATTERN.match(ticket_id):
+            return None
+
+        for state in (self.DONE, self.PROCESSING, self.PENDING):
+            record = self._read(state, ticket_id)
+            if record is not None:
+                record.pop('payload', None)
+                return record
+
+        return None
+
+    def claim(self):
+        """Claim the oldest pending ticket for processing.
+
+        Returns:
+            str, dict: The ticket ID and its record, or None if nothing is pending.
+
+        """
+        self._reclaim_expired()
+        self._remove_expired_outcomes()
+        os.makedirs(os.path.join(self.directory, self.PROCESSING), mode=0o700, exist_ok=True)
+        for ticket_id in self._tickets(self.PENDING):
+            try:
+                os.rename(self._path(self.PENDING, ticket_id),
+                          self._path(self.PROCESSING, ticket_id))
+            except OSError:
+                # another worker claimed it first
+                continue
+            os.utime(self._path(self.PROCESSING, ticket_id))
+            record = self._read(self.PROCESSING, ticket_id)
+            if record is None:
+                continue
+            try:
+                record['user'] = self._decrypt(ticket_id, record.pop('payload'))
+            except (KeyError, ValueError) as e:
+                logger.error('Failed to decrypt pending registration {}: {}'.format(ticket_id, str(e)))
+                self.complete(ticket_id, {'status': 'failed', 'errors': ['The registration could not be completed.']})
+                continue
+            return ticket_id, record
+
+        return None
+
+    def release(self, ticket_id: str):
+        """Return a claimed ticket to the queue.
+
+        Args:
+            ticket_id (str): The ticket ID.
+
+        """
+        try:
+            os.rename(self._path(self.PROCESSING, ticket_id),
+                      self._path(self.PENDING, ticket_id))
+        except OSError:
+            pass
+
+    def complete(self, ticket_id: str, result: dict):
+        """Record the outcome of a claimed ticket and discard its payload.
+
+        Args:
+            ticket_id (str): The ticket ID.
+            result (dict): The outcome (`status`, and `mci_id` or `errors`).
+
+        """
+        record = dict(result)
+        record['ticket_id'] = ticket_id
+        record['completed'] = str(datetime.utcnow())
+        self._write(self.DONE, ticket_id, record)
+        try:
+            os.remove(self._path(self.PROCESSING, ticket_id))
+        except OSError:
+            pass
+
+    def _reclaim_expired(self):
+        now = time.time()
+        for ticket_id in self._tickets(self.PROCESSING):
+            try:
+                if now - os.path.getmtime(self._path(self.PROCESSING, ticket_id)) > self.lease:
+                    self.release(ticket_id)
+            except OSError:
+                pass
+
+    def _remove_expired_outcomes(self):
+        now = time.time()
+        for ticket_id in self._tickets(self.DONE):
+            try:
+                if now - os.path.getmtime(self._path(self.DONE, ticket_id)) > self.retention:
+                    os.remove(self._path(self.DONE, ticket_id))
+            except OSError:
+                pass
+
+    def _encrypt(self, ticket_id: str, user: dict):
+        cipher = AES.new(self.key, AES.MODE_GCM)
+        cipher.update(ticket_id.encode('ascii'))
+        ciphertext, tag = cipher.encrypt_and_digest(json.dumps(user, default=str).encode('utf-8'))
+        return base64.b64encode(cipher.nonce + tag + ciphertext).decode('ascii')
+
+    def _decrypt(self, ticket_id: str, payload: str):
+        sealed = base64.b64decode(payload)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=sealed[:16])
+        cipher.update(ticket_id.encode('ascii'))
+        return json.loads(cipher.decrypt_and_verify(sealed[32:], sealed[16:32]).decode('utf-8'))
+
+    def _tickets(self, state: str):
+        directory = os.path.join(self.directory, state)
+        try:
+            entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.json')]
+        except OSError:
+            return []
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        return [entry.name[:-len('.json')] for entry in entries]
+
+    def _path(self, state: str, ticket_id: str):
+        return os.path.join(self.directory, state, '{}.json'.format(ticket_id))
+
+    def _read(self, state: str, ticket_id: str):
+        try:
+            with open(self._path(state, ticket_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, state: str, ticket_id: str, record: dict):
+        directory = os.path.join(self.directory, state)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # write to a temporary file first so readers never see a partial record
+        fd, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f, default=str)
+        os.rename(temporary_path, self._path(state, ticket_id))
+
+
+class PendingMatchWorker(threading.Thread):
+    """Background thread draining the pending match queue.
+
+    Args:
+        app (Flask): The application whose context the registrations run in.
+        queue (PendingMatchQueue): The queue to drain.
+        process (callable): Completes one registration payload and returns its outcome.
+            It raises `RequestException` while the matching service is unavailable or
+            failing, and the registration is retried.
+        poll_interval (float): Seconds between attempts to drain the queue.
+
+    """
+
+    def __init__(self, app, queue: PendingMatchQueue, process, poll_interval: float = 5):
+        super().__init__(name='pending-match-worker', daemon=True)
+        self.app = app
+        self.queue = queue
+        self.process = process
+        self.poll_interval = poll_interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error('Failed to drain the pending match queue: {}'.format(str(e)))
+
+    def stop(self):
+        """Stop the worker after its current attempt."""
+        self._stopped.set()
+
+    def drain(self):
+        """Complete pending registrations until the queue is empty or the matching service fails.
+
+        Returns:
+            int: Number of registrations completed.
+
+        """
+        completed = 0
+        while not self._stopped.is_set():
+            claimed = self.queue.claim()
+            if claimed is None:
+                break
+
+            ticket_id, record = claimed
+            try:
+                with self.app.app_context():
+                    result = self.process(record['user'])
+            except RequestException:
+                self.queue.release(ticket_id)
+                break
+            except Exception as e:
+                logger.error('Failed to complete pending registration {}: {}'.format(ticket_id, str(e)))
+                result = {'status': 'failed', 'errors': ['The registration could not be completed.']}
+
+            self.queue.complete(ticket_id, result)
+            completed += 1
+
+        return completed
+
+
+pending_matches = PendingMatchQueue(Config.get_pending_match_dir(), Config.get_pending_match_key(),
+                                    retention=Config.get_pending_match_retention())
@@ -12,12 +12,22 @@ import pytest
 from flask_migrate import upgrade
 
 from mci import create_app
-from mci.config import ConfigurationFactory
+from mci.config import ConfigurationFactory, settings
+from mci.instrumentation import query_tracker
+from mci.api.core.address_index import address_index
+from mci.api.core.reference_data import reference_data
+from mci.api.core.row_counts import row_counts
+from mci.api.core.user_cache import user_blobs
+from mci.api.core.verified_tokens import verified_tokens
+from mci.api.v1_0_0.helper_handler import list_responses
+from mci.matching import get_matching_client
 from mci_database import db
 from mci_database.db.models import (Address, Disposition, EducationLevel,
                                     EmploymentStatus, EthnicityRace, Gender,
                                     Individual)
 
+from .utils import QUERY_BUDGETS
+
 environment = os.getenv('APP_ENV', 'TEST')
 config = ConfigurationFactory.get_config(environment.upper())
 app = create_app()
@@ -123,6 +133,49 @@ def database():
     teardown_postgres_container()
 
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    '''
+    Fixtures write lookup table rows directly, bypassing the endpoints that
+    invalidate the per-worker caches, so every test starts with empty caches,
+    a closed matching service circuit breaker and settings read from the
+    current environment.
+    '''
+    settings.reload()
+    reference_data.clear()
+    address_index.clear()
+    row_counts.clear()
+    list_responses.clear()
+    user_blobs.clear()
+    verified_tokens.clear()
+    get_matching_client().breaker.reset()
+
+
+@pytest.fixture
+def query_budget():
+    '''
+    Fails the test if a request to an endpoint listed in `QUERY_BUDGETS` runs
+    more statements than its budget, or runs the same statement shape repeatedly (N+1).
+    Endpoints that process one item at a time (batch, bulk) are not listed.
+    '''
+    violations = []
+
+    def check(endpoint, query_log):
+        budget = QUERY_BUDGETS.get(endpoint)
+        if budget is None:
+            return
+        if query_log.count > budget:
+            violations.append('{} ran {} statements, its budget is {}'.format(endpoint, query_log.count, budget))
+        for shape, count in query_log.repeated(query_tracker.repeat_threshold).items():
+            violations.append('{} ran {} times: {}'.format(endpoint, count, shape))
+
+    query_tracker.add_observer(check)
+    yield
+    query_tracker.remove_observer(check)
+    if violations:
+        pytest.fail('Query budget exceeded:\n' + '\n'.join(violations))
+
+
 @pytest.fixture
 def app_context():
     with app.app_context() as context:
@@ -0,0 +1,71 @@
+"""Access Log Unit Test
+
+This class contains unit tests for the queued access log.
+
+"""
+
+import logging
+
+import mock
+from expects import equal, expect
+
+from mci.api.core.access_log import AccessLog
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _access_log(**kwargs):
+    access_log = AccessLog(maxsize=kwargs.pop('maxsize', 10), batch_size=5, flush_interval=0.01, **kwargs)
+    logger = logging.getLogger('test_access_log')
+    logger.propagate = False
+    handler = RecordingHandler()
+    logger.handlers = [handler]
+    access_log.init_app(logger)
+    return access_log, handler
+
+
+class TestAccessLog(object):
+    """Test Access Log.
+
+    """
+
+    def test_records_are_written_in_the_background(self):
+        access_log, handler = _access_log()
+
+        access_log.log({'path': '/users', 'status_code': 200})
+        access_log.log({'path': '/users', 'status_code': 404})
+        access_log.close()
+
+        expect([record.levelno for record in handler.records]).to(equal([logging.INFO, logging.ERROR]))
+        expect(access_log.stats()['queued']).to(equal(0))
+
+    def test_overflow_drops_records(self):
+        access_log, handler = _access_log(maxsize=2)
+        # without a writer thread, records stay queued until flushed
+        with mock.patch.object(access_log, '_ensure_started'):
+            for _ in range(5):
+                access_log.log({'path': '/users', 'status_code': 200})
+
+        expect(access_log.stats()['dropped']).to(equal(3))
+        access_log.flush()
+        expect(len(handler.records)).to(equal(3))
+        expect(handler.records[-1].getMessage()).to(equal('Dropped 3 access log records, the queue was full.'))
+
+    def test_sample_rates(self):
+        access_log, handler = _access_log(success_sample_rate=0.25, error_sample_rate=1)
+        with mock.patch.object(access_log, '_ensure_started'), \
+                mock.patch('mci.api.core.access_log.random.random', side_effect=[0.1, 0.5]):
+            access_log.log({'path': '/users', 'status_code': 200})
+            access_log.log({'path': '/users', 'status_code': 200})
+            access_log.log({'path': '/users', 'status_code': 500})
+        access_log.flush()
+
+        expect(len(handler.records)).to(equal(2))
+        expect(access_log.stats()['sampled_out']).to(equal(1))
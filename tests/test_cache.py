@@ -0,0 +1,50 @@
+"""In-Process Cache Unit Test
+
+This class contains unit tests for the TTL cache shared by the request handlers.
+
+"""
+
+import mock
+from expects import expect, equal, be_none
+
+from mci.helpers import TTLCache
+
+
+class TestTTLCache(object):
+    """Test TTL Cache.
+
+    """
+
+    def test_get_and_set(self):
+        cache = TTLCache(ttl=60, maxsize=2)
+        cache.set('gender', {'female': 1})
+
+        expect(cache.get('gender')).to(equal({'female': 1}))
+        expect(cache.get('source')).to(be_none)
+        expect(cache.stats()['hits']).to(equal(1))
+        expect(cache.stats()['misses']).to(equal(1))
+
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=60)
+        with mock.patch('mci.helpers.cache.time.monotonic', return_value=0):
+            cache.set('gender', {'female': 1})
+        with mock.patch('mci.helpers.cache.time.monotonic', return_value=61):
+            expect(cache.get('gender')).to(be_none)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(ttl=60, maxsize=2)
+        cache.set('gender', 1)
+        cache.set('source', 2)
+        cache.get('gender')
+        cache.set('disposition', 3)
+
+        expect(cache.get('source')).to(be_none)
+        expect(cache.get('gender')).to(equal(1))
+        expect(cache.get('disposition')).to(equal(3))
+
+    def test_invalidate(self):
+        cache = TTLCache(ttl=60)
+        cache.set('gender', 1)
+        cache.invalidate('gender')
+
+        expect(cache.get('gender')).to(be_none)
@@ -4,8 +4,15 @@ This class contains unit tests for the API configuration factory.
 
 """
 
+import json
+import os
+import signal
+from dataclasses import FrozenInstanceError
+
+import pytest
 from mci import ConfigurationFactory
-from expects import expect, be_a, equal, have_key
+from mci.config.snapshot import LiveSettings
+from expects import expect, be, be_a, be_true, equal, have_key
 
 
 class TestMCIConfiguration(object):
@@ -24,3 +31,77 @@ class TestMCIConfiguration(object):
         expect(config.get_api_version()).to_not(equal('Unknown'))
         expect(config.get_settings()).to(have_key('API_VERSION'))
         expect(config.get_settings()).to(have_key('API_NAME'))
+
+    def test_engine_options(self, monkeypatch):
+        """Test the database engine options are read from the environment.
+
+        """
+
+        monkeypatch.setenv('DB_POOL_SIZE', '2')
+        monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+        monkeypatch.setenv('DB_STATEMENT_TIMEOUT', '5000')
+        monkeypatch.setenv('DB_APPLICATION_NAME', 'mci-test')
+
+        options = ConfigurationFactory.get_config('TEST').get_engine_options()
+        expect(options['pool_size']).to(equal(2))
+        expect(options['max_overflow']).to(equal(10))
+        expect(options['pool_pre_ping']).to(equal(False))
+        expect(options['connect_args']).to(equal({
+            'application_name': 'mci-test',
+            'options': '-c statement_timeout=5000'
+        }))
+
+    def test_settings_snapshot(self, monkeypatch, tmpdir):
+        """Test the settings snapshot is immutable and only changes on reload.
+
+        """
+
+        settings_file = tmpdir.join('settings.json')
+        settings_file.write(json.dumps({'API_NAME': 'MCI', 'API_VERSION': '1.0.0'}))
+        monkeypatch.setenv('MCI_THRESHOLD', '0.75')
+        live_settings = LiveSettings(str(settings_file), check_interval=0)
+
+        snapshot = live_settings.current
+        expect(snapshot.api_version).to(equal('1.0.0'))
+        expect(snapshot.mci_threshold).to(equal(0.75))
+        with pytest.raises(FrozenInstanceError):
+            snapshot.page_limit = 100
+
+        monkeypatch.setenv('PAGE_LIMIT', '100')
+        expect(live_settings.current).to(be(snapshot))
+        expect(live_settings.reload()).to(be_true)
+        expect(live_settings.current.page_limit).to(equal(100))
+
+    def test_settings_file_reload(self, tmpdir):
+        """Test the settings snapshot follows changes to the settings file and survives invalid ones.
+
+        """
+
+        settings_file = tmpdir.join('settings.json')
+        settings_file.write(json.dumps({'API_NAME': 'MCI', 'API_VERSION': '1.0.0'}))
+        live_settings = LiveSettings(str(settings_file), check_interval=0)
+
+        settings_file.write(json.dumps({'API_NAME': 'MCI', 'API_VERSION': '1.1.0'}))
+        settings_file.setmtime(settings_file.mtime() + 10)
+        expect(live_settings.current.api_version).to(equal('1.1.0'))
+
+        settings_file.write('{"API_NAME": ')
+        settings_file.setmtime(settings_file.mtime() + 10)
+        expect(live_settings.current.api_version).to(equal('1.1.0'))
+
+    def test_settings_sighup(self, tmpdir):
+        """Test SIGHUP reloads the settings snapshot.
+
+        """
+
+        settings_file = tmpdir.join('settings.json')
+        settings_file.write(json.dumps({'API_NAME': 'MCI', 'API_VERSION': '1.0.0'}))
+        live_settings = LiveSettings(str(settings_file), check_interval=3600)
+        previous = signal.getsignal(signal.SIGHUP)
+        try:
+            expect(live_settings.install_signal_handler()).to(be_true)
+            settings_file.write(json.dumps({'API_NAME': 'MCI', 'API_VERSION': '2.0.0'}))
+            os.kill(os.getpid(), signal.SIGHUP)
+            expect(live_settings.current.api_version).to(equal('2.0.0'))
+        finally:
+            signal.signal(signal.SIGHUP, previous)
@@ -4,6 +4,7 @@ from expects import be, be_above, expect, have_keys
 from mci import app
 
 
+@pytest.mark.usefixtures('query_budget')
 class TestMCIAPI(object):
     def test_health_check_endpoint(self, test_client):
         headers = {'Content-Type': 'application/json'}
@@ -0,0 +1,51 @@
+"""Pagination Helpers Unit Test
+
+This class contains unit tests for the pagination link and cursor helpers.
+
+"""
+
+from expects import expect, equal, raise_error
+
+from mci.helpers import build_links, decode_cursor, encode_cursor
+
+
+def _rels(links):
+    return {link['rel']: link['href'] for link in links}
+
+
+class TestPaginationHelpers(object):
+    """Test Pagination Helpers.
+
+    """
+
+    def test_build_links_exact_total(self):
+        links = _rels(build_links('users', 20, 10, 45))
+
+        expect(links['prev']).to(equal('/users?offset=10&limit=10'))
+        expect(links['next']).to(equal('/users?offset=30&limit=10'))
+        expect(links['last']).to(equal('/users?offset=40&limit=10'))
+
+    def test_build_links_underestimated_total(self):
+        # the estimate says two pages, but the query found rows beyond the third
+        links = _rels(build_links('users', 20, 10, 15, has_more=True))
+
+        expect(links['next']).to(equal('/users?offset=30&limit=10'))
+        expect(links['last']).to(equal('/users?offset=30&limit=10'))
+
+    def test_build_links_overestimated_total(self):
+        links = _rels(build_links('users', 20, 10, 1000, has_more=False))
+
+        expect('next' in links).to(equal(False))
+        expect(links['last']).to(equal('/users?offset=20&limit=10'))
+
+    def test_build_links_unknown_total(self):
+        links = _rels(build_links('users', 0, 10, None, has_more=True))
+
+        expect(links['next']).to(equal('/users?offset=10&limit=10&count=false'))
+        expect('last' in links).to(equal(False))
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor('prev', 'abc-123')
+
+        expect(decode_cursor(cursor)).to(equal(('prev', 'abc-123')))
+        expect(lambda: decode_cursor('not-a-cursor')).to(raise_error(ValueError))
@@ -0,0 +1,95 @@
+"""JSON Web Key Set Unit Test
+
+This class contains unit tests for the shared key set and the provider validating tokens against it.
+
+"""
+
+import threading
+import time
+
+import pytest
+from brighthive_authlib import AuthLibConfiguration, OAuth2ProviderError
+from expects import be, be_false, be_none, be_true, equal, expect
+from requests.exceptions import ConnectionError
+
+from mci.auth import JWKSKeySet, JWKSProvider
+from mci.config import Config
+
+from .utils import LocalJWKS
+
+AUDIENCE = 'http://localhost:8000'
+ISSUER = 'https://mci.example.com/'
+
+
+@pytest.fixture(scope='module')
+def local_jwks():
+    return LocalJWKS()
+
+
+def _provider(key_set):
+    config = AuthLibConfiguration(provider='AUTH0', base_url=ISSUER.rstrip('/'), jwks_url=key_set.url,
+                                  algorithms=['RS256'], audience=AUDIENCE)
+    return JWKSProvider(config, key_set)
+
+
+class TestJWKS(object):
+    """Test JSON Web Key Set.
+
+    """
+
+    def test_validate_token(self, local_jwks):
+        provider = _provider(JWKSKeySet('local', fetch=local_jwks.fetch))
+        claims = {'aud': AUDIENCE, 'iss': ISSUER, 'exp': int(time.time()) + 60, 'scope': 'mci.users:get'}
+
+        expect(provider.validate_token(local_jwks.issue(claims))).to(be_true)
+        expect(provider.validate_token(local_jwks.issue(claims), scopes=['mci.users:get'])).to(be_true)
+        with pytest.raises(OAuth2ProviderError):
+            provider.validate_token(local_jwks.issue(claims), scopes=['mci.secure-user-detail:get'])
+        with pytest.raises(OAuth2ProviderError):
+            provider.validate_token(local_jwks.issue(dict(claims, aud='http://elsewhere')))
+        with pytest.raises(OAuth2ProviderError):
+            provider.validate_token(local_jwks.issue(dict(claims, exp=int(time.time()) - 60)))
+
+    def test_unknown_key_refreshes_once(self):
+        local_jwks = LocalJWKS()
+        key_set = JWKSKeySet('local', fetch=local_jwks.fetch)
+        key_set.start()
+        expect(local_jwks.fetches).to(equal(1))
+
+        local_jwks.add_key('rotated-key')
+        expect(key_set.get('rotated-key')['kid']).to(equal('rotated-key'))
+        expect(local_jwks.fetches).to(equal(2))
+
+        expect(key_set.get('unknown-key')).to(be_none)
+        expect(key_set.get('unknown-key')).to(be_none)
+        expect(local_jwks.fetches).to(equal(2))
+
+    def test_concurrent_refreshes_are_single_flighted(self, local_jwks):
+        def slow_fetch():
+            time.sleep(0.1)
+            return local_jwks.fetch()
+
+        key_set = JWKSKeySet('local', fetch=slow_fetch)
+        fetches = local_jwks.fetches
+        threads = [threading.Thread(target=key_set.get, args=('test-key',)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expect(local_jwks.fetches - fetches).to(equal(1))
+
+    def test_unreachable_provider_keeps_last_keys(self, local_jwks):
+        key_set = JWKSKeySet('local', min_refresh_interval=0, fetch=local_jwks.fetch)
+        key_set.start()
+
+        local_jwks.error = ConnectionError('unreachable')
+        try:
+            expect(key_set.refresh()).to(be_false)
+            expect(key_set.get('test-key')['kid']).to(equal('test-key'))
+        finally:
+            local_jwks.error = None
+        expect(key_set.stats()['failures']).to(equal(1))
+
+    def test_provider_is_shared(self):
+        expect(Config.get_oauth2_provider()).to(be(Config.get_oauth2_provider()))
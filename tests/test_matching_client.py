@@ -0,0 +1,172 @@
+"""Matching Service Client Unit Test
+
+This class contains unit tests for the pooled matching service client.
+
+"""
+
+import os
+import time
+
+import mock
+import pytest
+import requests_mock
+from expects import expect, equal, be, be_true, be_false, be_none, contain, have_key
+from requests.exceptions import ConnectTimeout
+
+from mci.matching import (CircuitBreaker, CircuitOpenError, MatchingServiceClient,
+                          PendingMatchQueue, get_matching_client)
+
+MATCHING_SERVICE_URI = 'http://mcimatchingservice_mci_1:8000/compute-match'
+
+
+class TestMatchingServiceClient(object):
+    """Test Matching Service Client.
+
+    """
+
+    def test_match(self):
+        client = MatchingServiceClient(MATCHING_SERVICE_URI, pool_size=2)
+        with requests_mock.Mocker() as m:
+            m.post(MATCHING_SERVICE_URI, json={'mci_id': '', 'score': ''})
+            response = client.match('{}')
+
+        expect(response.json()).to(equal({'mci_id': '', 'score': ''}))
+        expect(client.stats()['requests']).to(equal(1))
+        expect(client.stats()['in_flight']).to(equal(0))
+        expect(client.stats()['failures']).to(equal(0))
+
+    def test_match_failure_is_counted(self):
+        client = MatchingServiceClient(MATCHING_SERVICE_URI)
+        with requests_mock.Mocker() as m:
+            m.post(MATCHING_SERVICE_URI, exc=ConnectTimeout)
+            with pytest.raises(ConnectTimeout):
+                client.match('{}')
+
+        expect(client.stats()['failures']).to(equal(1))
+
+    def test_interrupted_match_is_not_a_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        client = MatchingServiceClient(MATCHING_SERVICE_URI, breaker=breaker)
+        with mock.patch.object(client._session, 'post', side_effect=GeneratorExit):
+            with pytest.raises(GeneratorExit):
+                client.match('{}')
+
+        expect(client.stats()['failures']).to(equal(0))
+        expect(client.stats()['in_flight']).to(equal(0))
+        expect(breaker.state).to(equal('closed'))
+
+        # an interrupted trial call lets the next one through
+        breaker.record_failure()
+        with mock.patch('mci.matching.breaker.time.monotonic', return_value=time.monotonic() + 60):
+            with mock.patch.object(client._session, 'post', side_effect=KeyboardInterrupt):
+                with pytest.raises(KeyboardInterrupt):
+                    client.match('{}')
+            expect(breaker.allow_request()).to(be_true)
+
+    def test_only_connection_failures_are_retried(self):
+        client = MatchingServiceClient(MATCHING_SERVICE_URI, max_retries=3)
+        retries = client._adapter.max_retries
+
+        expect(retries.connect).to(equal(3))
+        expect(retries.read).to(equal(0))
+        expect(retries.status).to(equal(0))
+        expect(client.timeout).to(equal((1.0, 5.0)))
+
+    def test_client_is_shared_per_process(self):
+        expect(get_matching_client()).to(be(get_matching_client()))
+
+    def test_open_breaker_fails_fast(self):
+        client = MatchingServiceClient(
+            MATCHING_SERVICE_URI, breaker=CircuitBreaker(failure_threshold=2))
+        with requests_mock.Mocker() as m:
+            m.post(MATCHING_SERVICE_URI, status_code=503)
+            client.match('{}')
+            client.match('{}')
+            with pytest.raises(CircuitOpenError):
+                client.match('{}')
+
+            expect(m.call_count).to(equal(2))
+        expect(client.stats()['circuit_breaker']['state']).to(equal('open'))
+
+
+class TestCircuitBreaker(object):
+    """Test Circuit Breaker.
+
+    """
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        expect(breaker.allow_request()).to(be_true)
+
+        breaker.record_failure()
+        expect(breaker.state).to(equal('open'))
+        expect(breaker.allow_request()).to(be_false)
+
+    def test_half_open_allows_a_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        with mock.patch('mci.matching.breaker.time.monotonic', return_value=0):
+            breaker.record_failure()
+
+        with mock.patch('mci.matching.breaker.time.monotonic', return_value=31):
+            expect(breaker.state).to(equal('half_open'))
+            expect(breaker.allow_request()).to(be_true)
+            expect(breaker.allow_request()).to(be_false)
+            breaker.record_success()
+
+        expect(breaker.state).to(equal('closed'))
+
+
+class TestPendingMatchQueue(object):
+    """Test Pending Match Queue.
+
+    """
+
+    def test_ticket_lifecycle(self, tmpdir):
+        queue = PendingMatchQueue(str(tmpdir), os.urandom(32))
+        ticket_id = queue.enqueue({'first_name': 'Nicola', 'ssn': '9999'})
+
+        expect(queue.status(ticket_id)['status']).to(equal('pending'))
+        expect(queue.status(ticket_id)).not_to(have_key('payload'))
+        expect(tmpdir.join('pending', '{}.json'.format(ticket_id)).read()).not_to(contain('Nicola'))
+
+        claimed_ticket_id, record = queue.claim()
+        expect(claimed_ticket_id).to(equal(ticket_id))
+        expect(record['user']['first_name']).to(equal('Nicola'))
+        expect(queue.claim()).to(be_none)
+
+        queue.release(ticket_id)
+        claimed_ticket_id, record = queue.claim()
+        queue.complete(ticket_id, {'status': 'created', 'mci_id': 'abc'})
+
+        expect(queue.status(ticket_id)['mci_id']).to(equal('abc'))
+        expect(queue.claim()).to(be_none)
+
+    def test_undecryptable_ticket_fails(self, tmpdir):
+        ticket_id = PendingMatchQueue(str(tmpdir), os.urandom(32)).enqueue({'first_name': 'Nicola'})
+        queue = PendingMatchQueue(str(tmpdir), os.urandom(32))
+
+        expect(queue.claim()).to(be_none)
+        expect(queue.status(ticket_id)['status']).to(equal('failed'))
+
+    def test_outcomes_expire(self, tmpdir):
+        queue = PendingMatchQueue(str(tmpdir), os.urandom(32), retention=60)
+        ticket_id = queue.enqueue({'first_name': 'Nicola'})
+        queue.claim()
+        queue.complete(ticket_id, {'status': 'created', 'mci_id': 'abc'})
+
+        with mock.patch('mci.matching.pending.time.time', return_value=time.time() + 61):
+            queue.claim()
+        expect(queue.status(ticket_id)).to(be_none)
+
+    def test_unconfigured(self):
+        expect(PendingMatchQueue(None, os.urandom(32)).enabled).to(be_false)
+        expect(PendingMatchQueue('/var/spool/mci', None).enabled).to(be_false)
+
+    def test_unknown_ticket(self, tmpdir):
+        queue = PendingMatchQueue(str(tmpdir), os.urandom(32))
+
+        expect(queue.status('0' * 32)).to(be_none)
+        expect(queue.status('../../etc/passwd')).to(be_none)
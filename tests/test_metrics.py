@@ -0,0 +1,90 @@
+"""Metrics Unit Test
+
+This class contains unit tests for the metrics registry and the metrics endpoint.
+
+"""
+
+import os
+
+import mock
+from expects import contain, equal, expect
+
+from mci.instrumentation import MetricsRegistry, metrics
+
+
+class TestMetrics(object):
+    """Test Metrics.
+
+    """
+
+    def test_render(self):
+        registry = MetricsRegistry()
+        requests = registry.counter('requests_total', 'Requests.', ('status',))
+        latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+        requests.inc(status=200)
+        requests.inc(status=200)
+        latency.observe(0.05)
+        latency.observe(0.5)
+
+        expect(registry.render()).to(equal('\n'.join([
+            '# HELP latency_seconds Latency.',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.1"} 1.0',
+            'latency_seconds_bucket{le="1.0"} 2.0',
+            'latency_seconds_bucket{le="+Inf"} 2.0',
+            'latency_seconds_sum 0.55',
+            'latency_seconds_count 2.0',
+            '# HELP requests_total Requests.',
+            '# TYPE requests_total counter',
+            'requests_total{status="200"} 2.0',
+            ''
+        ])))
+
+    def test_workers_are_merged(self, tmpdir):
+        registry = MetricsRegistry(directory=str(tmpdir))
+        requests = registry.counter('requests_total', 'Requests.', ('status',))
+        requests.inc(status=200)
+        with mock.patch('mci.instrumentation.registry.os.getpid', return_value=1):
+            registry.flush()
+        requests.inc(status=500)
+
+        exposition = registry.render()
+        expect(exposition).to(contain('requests_total{status="200"} 2.0'))
+        expect(exposition).to(contain('requests_total{status="500"} 1.0'))
+
+    def test_exited_workers_are_archived(self, tmpdir):
+        registry = MetricsRegistry(directory=str(tmpdir))
+        requests = registry.counter('requests_total', 'Requests.', ('status',))
+        requests.inc(status=200)
+        for pid in (1, 2):
+            with mock.patch('mci.instrumentation.registry.os.getpid', return_value=pid):
+                registry.flush()
+
+        with mock.patch('mci.instrumentation.registry._is_running', side_effect=lambda pid: pid != 2):
+            expect(registry.render()).to(contain('requests_total{status="200"} 3.0'))
+            registry.mark_process_dead(1)
+            expect(registry.render()).to(contain('requests_total{status="200"} 3.0'))
+
+        files = {path.basename for path in tmpdir.listdir(lambda path: path.ext == '.json')}
+        expect(files).to(equal({'archive.json', '{}.json'.format(os.getpid())}))
+
+    def test_metrics_endpoint_requires_token(self, test_client):
+        response = test_client.get('/metrics')
+        expect(response.status_code).to(equal(404))
+
+        with mock.patch.dict('os.environ', {'METRICS_TOKEN': 'scraper-token'}):
+            response = test_client.get('/metrics', headers={'Authorization': 'Bearer wrong-token'})
+        expect(response.status_code).to(equal(401))
+
+    def test_metrics_endpoint(self, test_client, tmpdir):
+        metrics.clear()
+        with mock.patch.object(metrics, 'directory', str(tmpdir)), \
+                mock.patch.dict('os.environ', {'METRICS_TOKEN': 'scraper-token'}):
+            test_client.get('/')
+            response = test_client.get('/metrics', headers={'Authorization': 'Bearer scraper-token'})
+
+        expect(response.status_code).to(equal(200))
+        expect(response.headers['Content-Type']).to(equal('text/plain; version=0.0.4; charset=utf-8'))
+        exposition = response.data.decode('utf-8')
+        expect(exposition).to(contain('mci_http_requests_total{endpoint="/",method="GET",status="200"} 1.0'))
+        expect(exposition).to(contain('mci_db_queries_per_request_count{endpoint="/"}'))
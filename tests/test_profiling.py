@@ -0,0 +1,74 @@
+"""Request Profiling Unit Test
+
+This class contains unit tests for on-demand request profiling.
+
+"""
+
+import os
+
+from expects import be_empty, contain, equal, expect, have_keys
+from flask import current_app
+from sqlalchemy import text
+
+from mci.instrumentation.profiling import RequestProfiler
+from mci_database import db
+
+
+class TestRequestProfiler(object):
+    """Test Request Profiler.
+
+    """
+
+    def test_disabled(self):
+        expect(RequestProfiler().decorators()).to(be_empty)
+
+    def test_profile_requested_by_token(self, database, app_context, tmpdir):
+        profiler = RequestProfiler(token='secret', directory=str(tmpdir), inline=True)
+
+        @profiler.profile
+        def get():
+            db.session.execute(text('SELECT 1'))
+            profiler.record_matching_call(0.25, 'ok')
+            return {'mci_id': 'abc'}, 200
+
+        with current_app.test_request_context('/users/abc', headers={'X-Profile-Token': 'wrong'}):
+            expect(get()).to(equal(({'mci_id': 'abc'}, 200)))
+        expect(os.listdir(str(tmpdir))).to(be_empty)
+
+        with current_app.test_request_context('/users/abc', headers={'X-Profile-Token': 'secret'}):
+            body, status = get()
+
+        expect(status).to(equal(200))
+        expect(body['response']).to(equal({'mci_id': 'abc'}))
+        profile = body['profile']
+        expect(profile).to(have_keys(method='GET', path='/users/abc'))
+        expect([query['statement'] for query in profile['sql']]).to(contain('SELECT 1'))
+        expect(profile['matching_service']).to(equal([{'duration': 0.25, 'outcome': 'ok'}]))
+        expect(sorted(os.listdir(str(tmpdir)))).to(equal(
+            ['{}.json'.format(profile['profile_id']), '{}.prof'.format(profile['profile_id'])]))
+
+    def test_one_request_profiled_at_a_time(self, database, app_context, tmpdir):
+        profiler = RequestProfiler(token='secret', directory=str(tmpdir), inline=True)
+        headers = {'X-Profile-Token': 'secret'}
+
+        @profiler.profile
+        def get_other():
+            return {'mci_id': 'def'}, 200
+
+        @profiler.profile
+        def get():
+            # a request served while this one is profiled
+            with current_app.test_request_context('/users/def', headers=headers):
+                return {'other': get_other()}, 200
+
+        with current_app.test_request_context('/users/abc', headers=headers):
+            body, status = get()
+
+        expect(body['response']).to(equal({'other': ({'mci_id': 'def'}, 200)}))
+        expect(body['profile']).to(have_keys(path='/users/abc'))
+        expect(len(os.listdir(str(tmpdir)))).to(equal(2))
+
+        # the worker profiles again once the first profile is saved
+        with current_app.test_request_context('/users/def', headers=headers):
+            body, status = get_other()
+        expect(body['profile']).to(have_keys(path='/users/def'))
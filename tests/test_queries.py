@@ -0,0 +1,65 @@
+"""Query Tracking Unit Test
+
+This class contains unit tests for the per-request query log and N+1 detection.
+
+"""
+
+import mock
+from expects import be_empty, be_none, equal, expect
+from sqlalchemy import create_engine, text
+
+from mci.instrumentation import QueryLog, QueryTracker, query_tracker, statement_shape
+
+
+class TestQueryTracker(object):
+    """Test Query Tracker.
+
+    """
+
+    def test_statement_shape(self):
+        expect(statement_shape('SELECT * FROM individual\n  WHERE mci_id = %(mci_id_1)s')).to(
+            equal('SELECT * FROM individual WHERE mci_id = ?'))
+        expect(statement_shape("SELECT * FROM gender WHERE id IN (?, ?, ?) AND gender = 'Female'")).to(
+            equal('SELECT * FROM gender WHERE id IN (?) AND gender = ?'))
+        expect(statement_shape('SELECT * FROM gender WHERE id = 12')).to(
+            equal(statement_shape('SELECT * FROM gender WHERE id = 7')))
+
+    def test_repeated(self):
+        query_log = QueryLog()
+        for mci_id in ('a', 'b', 'c'):
+            query_log.record("SELECT * FROM address WHERE mci_id = '{}'".format(mci_id), 0.001)
+        query_log.record('SELECT count(*) FROM individual', 0.002)
+
+        expect(query_log.count).to(equal(4))
+        expect(query_log.repeated(3)).to(equal({'SELECT * FROM address WHERE mci_id = ?': 3}))
+        expect(query_log.repeated(4)).to(be_empty)
+
+    def test_track(self):
+        engine = create_engine('sqlite://')
+        with QueryTracker().track() as query_log:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+                connection.execute(text('SELECT 2'))
+
+        expect(query_log.statements).to(equal(['SELECT 1', 'SELECT 2']))
+        expect(len(query_log.durations)).to(equal(2))
+
+    def test_debug_headers(self, test_client):
+        observed = []
+
+        def observe(endpoint, query_log):
+            observed.append((endpoint, query_log.count))
+
+        query_tracker.add_observer(observe)
+        try:
+            response = test_client.get('/')
+            expect(response.headers.get('X-Query-Count')).to(be_none)
+
+            with mock.patch.dict(test_client.application.config, {'DEBUG': True}):
+                response = test_client.get('/')
+        finally:
+            query_tracker.remove_observer(observe)
+
+        expect(response.headers.get('X-Query-Count')).to(equal('0'))
+        expect(response.headers.get('X-Query-Repeated')).to(equal('0'))
+        expect(observed).to(equal([('GET /', 0), ('GET /', 0)]))
@@ -0,0 +1,87 @@
+"""Read Replica Unit Test
+
+This class contains unit tests for the routing of read-only queries to the read replica.
+
+"""
+
+import flask
+import mock
+import pytest
+from expects import be, contain, expect
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from mci.api.core.read_replica import LAST_WRITE_COOKIE, LAST_WRITE_HEADER, ReadReplica
+from mci_database import db
+from mci_database.db.models import Gender
+
+
+@pytest.fixture
+def replica():
+    # a throwaway app keeps the replica's hooks off the app other tests use
+    replica = ReadReplica(max_lag=5, check_interval=5)
+    replica.init_app(flask.Flask(__name__), uri='sqlite://')
+    yield replica
+    event.remove(Session, 'after_flush', replica._after_flush)
+    replica._remove_session()
+    replica._engine.dispose()
+
+
+class TestReadReplica(object):
+    """Test Read Replica.
+
+    """
+
+    def test_unconfigured(self, app_context):
+        replica = ReadReplica(max_lag=5, check_interval=5)
+
+        expect(replica.session()).to(be(db.session))
+
+    def test_reads_from_replica(self, app_context, replica):
+        expect(replica.session()).not_to(be(db.session))
+
+    def test_reads_own_writes(self, database, app_context, replica):
+        database.session.add(Gender(gender='Unwritten'))
+        database.session.flush()
+        database.session.rollback()
+        expect(replica.session()).to(be(db.session))
+
+        # other requests of this worker keep reading from the replica
+        app = flask.Flask(__name__)
+        with app.app_context(), app.test_request_context('/users'):
+            expect(replica.session()).not_to(be(db.session))
+
+    def test_client_reads_its_writes(self, replica):
+        app = flask.Flask(__name__)
+
+        with app.app_context(), app.test_request_context('/users'):
+            flask.g.wrote_to_primary = True
+            response = replica._after_request(app.response_class())
+        last_write = response.headers[LAST_WRITE_HEADER]
+        cookie = '{}={}'.format(LAST_WRITE_COOKIE, last_write)
+        expect(response.headers['Set-Cookie']).to(contain(cookie))
+
+        with mock.patch('mci.api.core.read_replica.time.time', return_value=float(last_write) + 4):
+            with app.app_context(), app.test_request_context('/users', headers={LAST_WRITE_HEADER: last_write}):
+                expect(replica.session()).to(be(db.session))
+            with app.app_context(), app.test_request_context('/users', headers={'Cookie': cookie}):
+                expect(replica.session()).to(be(db.session))
+        with mock.patch('mci.api.core.read_replica.time.time', return_value=float(last_write) + 6):
+            with app.app_context(), app.test_request_context('/users', headers={LAST_WRITE_HEADER: last_write}):
+                expect(replica.session()).not_to(be(db.session))
+
+    def test_fails_over_to_primary(self, app_context, replica):
+        with mock.patch.object(replica, '_replication_lag', return_value=30):
+            expect(replica.session()).to(be(db.session))
+
+        # the verdict is kept until the next check
+        with mock.patch.object(replica, '_replication_lag', return_value=0):
+            expect(replica.session()).to(be(db.session))
+            replica._checked_at = None
+            expect(replica.session()).not_to(be(db.session))
+
+        replica._checked_at = None
+        with mock.patch.object(replica, '_replication_lag',
+                               side_effect=OperationalError('SELECT 1', {}, Exception('down'))):
+            expect(replica.session()).to(be(db.session))
@@ -0,0 +1,42 @@
+"""JSON Representation Unit Test
+
+This class contains unit tests for the JSON encoders behind the API responses.
+
+"""
+
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+
+import pytest
+from expects import equal, expect
+
+from mci.api.core.representations import dumps, orjson
+
+
+class TestJSONRepresentation(object):
+    """Test JSON Representation.
+
+    """
+
+    def test_dates_and_key_order(self):
+        body = OrderedDict([
+            ('mci_id', 'abc'),
+            ('date_of_birth', date(1678, 7, 6)),
+            ('registration_date', datetime(2019, 1, 1, 12, 30)),
+            ('ethnicity_race', [])
+        ])
+
+        document = dumps(body, library='json')
+        expect(list(json.loads(document, object_pairs_hook=OrderedDict).keys())).to(equal(list(body.keys())))
+        expect(json.loads(document)['registration_date']).to(equal('2019-01-01T12:30:00'))
+
+    @pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+    def test_encoders_agree(self):
+        body = OrderedDict([
+            ('users', [{'mci_id': 'abc', 'first_name': 'Nicola', 'suffix': ''}]),
+            ('date_of_birth', date(1678, 7, 6)),
+            ('total', 1)
+        ])
+
+        expect(dumps(body, library='orjson')).to(equal(dumps(body, library='json')))
@@ -0,0 +1,76 @@
+"""User Blob Cache Unit Test
+
+This class contains unit tests for the two-tier cache of user detail blobs.
+
+"""
+
+import time
+
+import mock
+from expects import be_none, equal, expect
+
+from mci.api.core.user_cache import UserBlobCache
+
+from .utils import InMemoryRedis
+
+BLOB = {'mci_id': 'abc', 'first_name': 'Nicola'}
+
+
+class TestUserBlobCache(object):
+    """Test User Blob Cache.
+
+    """
+
+    def test_disabled_without_shared_cache(self):
+        cache = UserBlobCache(ttl=60, maxsize=2)
+        cache.store('abc', None, '0', BLOB, 'etag')
+
+        expect(cache.lookup('abc')).to(equal((None, None)))
+
+    def test_blobs_are_shared_between_workers(self):
+        shared = InMemoryRedis()
+        worker = UserBlobCache(ttl=60, maxsize=2, client=shared)
+        other_worker = UserBlobCache(ttl=60, maxsize=2, client=shared)
+
+        cached, version = worker.lookup('abc')
+        expect(cached).to(be_none)
+        worker.store('abc', None, version, BLOB, 'etag')
+
+        expect(worker.lookup('abc')).to(equal(((BLOB, 'etag'), '0')))
+        expect(worker.stats()['hits']).to(equal(1))
+        expect(other_worker.lookup('abc')).to(equal(((BLOB, 'etag'), '0')))
+        expect(other_worker.lookup('abc', ['mci_id'])[0]).to(be_none)
+
+    def test_local_hits_skip_the_shared_cache(self):
+        client = mock.Mock(wraps=InMemoryRedis())
+        cache = UserBlobCache(ttl=60, maxsize=2, client=client, local_ttl=600)
+        cache.store('abc', None, '0', BLOB, 'etag')
+
+        expect(cache.lookup('abc')).to(equal(((BLOB, 'etag'), '0')))
+        expect(client.mget.call_count).to(equal(0))
+        expect(cache.local_ttl).to(equal(5))
+
+    def test_invalidation_reaches_every_worker(self):
+        shared = InMemoryRedis()
+        worker = UserBlobCache(ttl=60, maxsize=2, client=shared)
+        other_worker = UserBlobCache(ttl=60, maxsize=2, client=shared)
+        worker.store('abc', None, '0', BLOB, 'etag')
+        other_worker.lookup('abc')
+
+        other_worker.invalidate('abc')
+
+        # the other worker serves the old blob until its local entry expires, then
+        # neither tier does and nothing is stored while the change settles
+        expect(other_worker.lookup('abc')).to(equal((None, None)))
+        expect(worker.lookup('abc')[0]).to(equal((BLOB, 'etag')))
+        with mock.patch('mci.helpers.cache.time.monotonic', return_value=time.monotonic() + worker.local_ttl):
+            expect(worker.lookup('abc')).to(equal((None, None)))
+        del shared.values['mci:user:abc:unsettled']
+        expect(worker.lookup('abc')).to(equal((None, '1')))
+
+    def test_unreachable_shared_cache_is_bypassed(self):
+        client = mock.Mock()
+        client.mget.side_effect = ConnectionError()
+        cache = UserBlobCache(ttl=60, maxsize=2, client=client)
+
+        expect(cache.lookup('abc')).to(equal((None, None)))
@@ -1,19 +1,30 @@
 import json
+import os
 
 import pytest
 import mock
+import requests
 import requests_mock
 from expects import be, be_above, expect, have_keys
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
 
 from mci import app
+from mci.api import V1_0_0_UserHandler
+from mci.api.core.address_index import address_index, normalize_address
+from mci.api.core.user_cache import user_blobs
+from mci.config import settings
+from mci.matching import PendingMatchQueue, PendingMatchWorker
 from mci_database import db
-from mci_database.db.models import Individual
+from mci_database.db.models import Address, Individual
 
-from .utils import post_new_individual
+from .utils import InMemoryRedis, count_queries, post_new_individual
 
 
+@pytest.mark.usefixtures('query_budget')
 class TestMCIAPI(object):
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_users_endpoint_empty(self, mocker, database, test_client):
         '''
         Tests that the users endpoint returns expected content when the database is empty.
@@ -23,7 +34,7 @@ class TestMCIAPI(object):
         assert response.status_code == 200
         assert response.json['users'] == []
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_users_endpoint_populated(self, mocker, database, individual_data, test_client, json_headers):
         '''
         Tests that the users endpoint returns expected content when the database has Individual entries.
@@ -36,7 +47,63 @@ class TestMCIAPI(object):
         assert isinstance(response.json['users'][0], dict)
         assert 'mci_id' in response.json['users'][0].keys()
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_endpoint_without_count(
+            self, mocker, database, individual_data, test_client, json_headers, app_context):
+        '''
+        Tests that clients opting out of totals get no COUNT query and links that stop at the last row.
+        '''
+        post_new_individual(individual_data, test_client, json_headers)
+        post_new_individual(individual_data, test_client, json_headers)
+
+        with count_queries() as statements:
+            response = test_client.get('/users?limit=1&count=false')
+
+        assert response.status_code == 200
+        assert not any('count(' in statement.lower() for statement in statements)
+        links = {link['rel']: link['href'] for link in response.json['links']}
+        assert 'last' not in links
+
+        response = test_client.get(links['next'])
+        links = {link['rel']: link['href'] for link in response.json['links']}
+        assert 'next' not in links
+        assert links['last'] == '/users?offset=1&limit=1&count=false'
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_endpoint_cursor(self, mocker, database, individual_data, test_client, json_headers):
+        '''
+        Tests that cursor pagination walks forward and back through the users in MCI ID order.
+        '''
+        mci_ids = sorted(post_new_individual(individual_data, test_client, json_headers)['mci_id']
+                         for _ in range(3))
+
+        response = test_client.get('/users?cursor=&limit=2&count=true')
+        assert response.status_code == 200
+        assert [user['mci_id'] for user in response.json['users']] == mci_ids[:2]
+        assert response.json['total'] == 3
+        links = {link['rel']: link['href'] for link in response.json['links']}
+        assert 'prev' not in links
+
+        response = test_client.get(links['next'])
+        assert [user['mci_id'] for user in response.json['users']] == mci_ids[2:]
+        assert 'total' not in response.json
+        links = {link['rel']: link['href'] for link in response.json['links']}
+        assert 'next' not in links
+
+        response = test_client.get(links['prev'])
+        assert [user['mci_id'] for user in response.json['users']] == mci_ids[:2]
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_endpoint_invalid_cursor(self, mocker, database, test_client):
+        '''
+        Tests that a malformed cursor is rejected.
+        '''
+        response = test_client.get('/users?cursor=not-a-cursor')
+
+        assert response.status_code == 400
+        assert response.json['error'] == 'Invalid cursor.'
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_get_user_invalid(self, mocker, database, test_client):
         '''
         Tests that GETing an invalid user returns the correct error message.
@@ -47,7 +114,7 @@ class TestMCIAPI(object):
         assert response.json['message']
         assert response.json['message'] == 'An individual with that ID does not exist in the MCI.'
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_get_user_valid(self, mocker, database, individual_data, test_client, json_headers):
         '''
         Tests that GETing a valid user returns the JSON and 200 status code.
@@ -61,7 +128,29 @@ class TestMCIAPI(object):
         assert response.status_code == 200
         assert response.json
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_get_user_conditional(self, mocker, database, individual_data, test_client, json_headers):
+        '''
+        Tests that a user is served with an ETag and that a matching If-None-Match gets a 304.
+        '''
+        new_individual = post_new_individual(
+            individual_data, test_client, json_headers)
+        url = '/users/{}'.format(new_individual['mci_id'])
+
+        response = test_client.get(url)
+        etag = response.headers['ETag']
+        assert response.status_code == 200
+        assert etag
+
+        response = test_client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert response.get_data() == b''
+
+        response = test_client.get(url, headers={'If-None-Match': '"stale"'})
+        assert response.status_code == 200
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_post_users_existing(self, mocker, database, individual_data, test_client, json_headers):
         '''
         Tests that POSTing an existing user returns a 200 with correct user information.
@@ -82,7 +171,7 @@ class TestMCIAPI(object):
         assert response.json['mci_id'] == new_individual['mci_id']
         assert response.json['match_probability'] == 10.0
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_post_users_bad_json(self, mocker, test_client, json_headers):
         with requests_mock.Mocker() as m:
             m.post("http://mcimatchingservice_mci_1:8000/compute-match",
@@ -99,7 +188,7 @@ class TestMCIAPI(object):
             assert response.status_code == 400
             assert response.json['error'] == 'Malformed or empty JSON object found in request body.'
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_post_users_matching_down(self, mocker, individual_data, test_client, json_headers):
         response = test_client.post(
             '/users', data=json.dumps(individual_data), headers=json_headers)
@@ -107,7 +196,65 @@ class TestMCIAPI(object):
         assert response.status_code == 400
         assert response.json['error'] == 'The matching service did not return a response.'
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_post_users_invalid_match_response(self, mocker, individual_data, test_client, json_headers):
+        with requests_mock.Mocker() as m:
+            m.post('http://mcimatchingservice_mci_1:8000/compute-match',
+                   json={'error': 'Internal Server Error'}, status_code=500)
+            response = test_client.post(
+                '/users', data=json.dumps(individual_data), headers=json_headers)
+
+        assert response.status_code == 400
+        assert response.json['error'] == 'The matching service returned an invalid response.'
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_post_users_atomic(self, mocker, database, individual_data, test_client, json_headers, app_context):
+        '''
+        Tests that a registration that fails or matches leaves no new address behind,
+        and that a successful registration is saved with a single commit.
+        '''
+        individual_data['mailing_address'] = {'address': '4 Privet Drive', 'city': 'Little Whinging'}
+        addresses = Address.query.filter_by(address='4 Privet Drive')
+
+        # matching service unreachable
+        with requests_mock.Mocker() as m:
+            m.post('http://mcimatchingservice_mci_1:8000/compute-match',
+                   exc=requests.exceptions.ConnectionError)
+            response = test_client.post('/users', data=json.dumps(individual_data), headers=json_headers)
+        assert response.status_code == 400
+        assert addresses.count() == 0
+
+        # invalid registration
+        individual_data['gender'] = 'Not A Gender'
+        response = test_client.post('/users', data=json.dumps(individual_data), headers=json_headers)
+        assert response.status_code == 400
+        assert addresses.count() == 0
+        del individual_data['gender']
+
+        # matched to an existing individual
+        existing = post_new_individual(
+            {'first_name': 'Petunia', 'last_name': 'Dursley'}, test_client, json_headers)
+        with requests_mock.Mocker() as m:
+            m.post('http://mcimatchingservice_mci_1:8000/compute-match',
+                   json={'mci_id': existing['mci_id'], 'score': 10.0}, status_code=201)
+            response = test_client.post('/users', data=json.dumps(individual_data), headers=json_headers)
+        assert response.status_code == 200
+        assert addresses.count() == 0
+
+        commits = []
+
+        def count_commit(conn):
+            commits.append(conn)
+
+        event.listen(database.engine, 'commit', count_commit)
+        try:
+            post_new_individual(individual_data, test_client, json_headers)
+        finally:
+            event.remove(database.engine, 'commit', count_commit)
+        assert addresses.count() == 1
+        assert len(commits) == 1
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_remove_pii_invalid_id(self, mocker, database, test_client, json_headers):
         response = test_client.post(
             '/users/remove-pii', data=json.dumps({"mci_id": "123fakeid"}), headers=json_headers)
@@ -115,7 +262,7 @@ class TestMCIAPI(object):
         assert response.status_code == 410
         assert response.json['message'] == 'An individual with that ID does not exist in the MCI.'
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_remove_pii_valid_id(self, mocker, app_context, database, individual_data, test_client, json_headers):
         new_individual = post_new_individual(
             individual_data, test_client, json_headers)
@@ -140,7 +287,37 @@ class TestMCIAPI(object):
         assert updated_individual.telephone == None
         assert updated_individual.ssn == None
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_remove_pii_cached_user(self, mocker, database, individual_data, test_client, json_headers):
+        '''
+        Tests that cached user blobs are served without queries and are never served after PII removal.
+        '''
+        mci_id = post_new_individual(individual_data, test_client, json_headers)['mci_id']
+
+        with mock.patch.object(user_blobs, 'client', InMemoryRedis()):
+            test_client.get('/users/{}'.format(mci_id), headers=json_headers)
+            with count_queries() as statements:
+                response = test_client.get('/users/{}'.format(mci_id), headers=json_headers)
+            assert response.json['first_name'] == individual_data['first_name']
+            assert len(statements) == 0
+
+            response = test_client.post(
+                '/users/remove-pii', data=json.dumps({'mci_id': mci_id}), headers=json_headers)
+            assert response.status_code == 201
+
+            response = test_client.get('/users/{}'.format(mci_id), headers=json_headers)
+            assert response.json['first_name'] == ''
+
+        # the PII is kept if the cached blobs cannot be invalidated
+        mci_id = post_new_individual(individual_data, test_client, json_headers)['mci_id']
+        with mock.patch.object(user_blobs, 'client', mock.Mock(**{'incr.side_effect': ConnectionError()})):
+            response = test_client.post(
+                '/users/remove-pii', data=json.dumps({'mci_id': mci_id}), headers=json_headers)
+            assert response.status_code == 503
+        response = test_client.get('/users/{}'.format(mci_id), headers=json_headers)
+        assert response.json['first_name'] == individual_data['first_name']
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_user_detail_endpoint(self, mocker, test_client, json_headers):
         new_user = {
             "vendor_id": "abc-123",
@@ -170,3 +347,262 @@ class TestMCIAPI(object):
         assert response.status_code == 200
         assert 'ssn' in response.json.keys()
         assert 'county' in response.json['mailing_address'].keys()
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_user_detail_single_query(
+            self, mocker, database, individual_obj, gender_obj,
+            ethnicity_obj, test_client, app_context):
+        '''
+        Tests that the user detail endpoints build the whole blob from a single query.
+        '''
+        individual = Individual.query.filter_by(mci_id=individual_obj).first()
+        individual.gender_id = gender_obj.id
+        individual.ethnicity_races.append(ethnicity_obj)
+        database.session.commit()
+
+        for url in ('/users/{}', '/user-details/{}'):
+            with count_queries() as statements:
+                response = test_client.get(url.format(individual_obj))
+
+            assert response.status_code == 200
+            assert response.json['mailing_address']['city'] == 'London'
+            assert response.json['gender'] == 'Female'
+            assert response.json['ethnicity_race'] == ['Alaska Native']
+            assert len(statements) == 1
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_user_detail_sparse_fields(
+            self, mocker, database, individual_obj, test_client, app_context):
+        '''
+        Tests that a sparse fieldset returns only the requested fields and joins no unrequested table.
+        '''
+        with count_queries() as statements:
+            response = test_client.get('/users/{}?fields=first_name,source'.format(individual_obj))
+
+        assert response.status_code == 200
+        assert response.json == {'first_name': 'Nicola', 'source': ''}
+        assert len(statements) == 1
+        for table in ('address', 'gender', 'employment_status', 'ethnicity'):
+            assert table not in statements[0].lower()
+
+        response = test_client.get('/user-details/{}?fields=mci_id,ssn'.format(individual_obj))
+        assert list(response.json.keys()) == ['mci_id', 'ssn']
+
+        response = test_client.get('/users/{}?fields=first_name,ssn'.format(individual_obj))
+        assert response.status_code == 400
+        assert response.json['error'] == 'Unknown fields: ssn.'
+
+        response = test_client.get('/users?fields=mci_id,mailing_address')
+        assert response.json['users'][0]['mailing_address']['city'] == 'London'
+        assert all(link['href'].endswith('&fields=mci_id,mailing_address') for link in response.json['links'])
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_batch(self, mocker, database, individual_data, test_client, json_headers):
+        '''
+        Tests that a batch lookup returns each known user and reports unknown MCI IDs per item.
+        '''
+        new_individual = post_new_individual(
+            individual_data, test_client, json_headers)
+        mci_ids = [new_individual['mci_id'], '123badid']
+
+        response = test_client.post(
+            '/users/batch', data=json.dumps({'mci_ids': mci_ids}), headers=json_headers)
+
+        assert response.status_code == 200
+        results = response.json['users']
+        assert [result['mci_id'] for result in results] == mci_ids
+        assert results[0]['status'] == 200
+        assert results[0]['user']['first_name'] == individual_data['first_name']
+        assert results[1]['status'] == 410
+        assert results[1]['error'] == 'An individual with that ID does not exist in the MCI.'
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_batch_limit(self, mocker, database, test_client, json_headers):
+        '''
+        Tests that a batch larger than the configured limit is rejected.
+        '''
+        with mock.patch.dict('os.environ', {'BATCH_LIMIT': '2'}):
+            settings.reload()
+            response = test_client.post(
+                '/users/batch', data=json.dumps({'mci_ids': ['a', 'b', 'c']}), headers=json_headers)
+
+        assert response.status_code == 413
+        assert response.json['error'] == 'A batch may contain at most 2 MCI IDs.'
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_export(self, mocker, database, individual_data, test_client, json_headers):
+        '''
+        Tests that the export streams the selected fields as NDJSON or CSV.
+        '''
+        new_individual = post_new_individual(individual_data, test_client, json_headers)
+
+        response = test_client.get('/users/export?fields=mci_id,first_name,gender')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert {'mci_id': new_individual['mci_id'], 'first_name': individual_data['first_name'],
+                'gender': ''} in rows
+        assert all(list(row.keys()) == ['mci_id', 'first_name', 'gender'] for row in rows)
+
+        response = test_client.get('/users/export?format=csv&fields=mci_id,last_name')
+        assert response.status_code == 200
+        lines = response.get_data(as_text=True).splitlines()
+        assert lines[0] == 'mci_id,last_name'
+        assert '{},{}'.format(new_individual['mci_id'], individual_data['last_name']) in lines
+
+        response = test_client.get('/users/export?since=2999-01-01')
+        assert response.get_data(as_text=True) == ''
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_export_invalid(self, mocker, test_client):
+        '''
+        Tests that unknown fields, formats and dates are rejected before streaming starts.
+        '''
+        response = test_client.get('/users/export?fields=mci_id,ssn')
+        assert response.status_code == 400
+        assert response.json['error'] == 'Unknown export fields: ssn.'
+
+        assert test_client.get('/users/export?format=xml').status_code == 400
+        assert test_client.get('/users/export?since=yesterday').status_code == 400
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_bulk(self, mocker, database, individual_data, test_client, app_context):
+        '''
+        Tests that a bulk registration streams one result per line.
+        '''
+        lines = [
+            json.dumps(individual_data),
+            '{"first_name": "Broken"',
+            json.dumps({'first_name': 'Georg', 'last_name': 'Handel', 'email_address': 'not-an-email'})
+        ]
+
+        with requests_mock.Mocker() as m:
+            m.post("http://mcimatchingservice_mci_1:8000/compute-match",
+                   json={"mci_id": "", "score": ""}, status_code=201)
+
+            response = test_client.post(
+                '/users/bulk', data='\n'.join(lines), headers={'Content-Type': 'application/x-ndjson'})
+            results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        assert response.status_code == 200
+        results = {result['line']: result for result in results}
+        assert results[1]['status'] == 'created'
+        assert Individual.query.filter_by(mci_id=results[1]['mci_id']).first()
+        assert results[2]['status'] == 'error'
+        assert results[3]['status'] == 'error'
+        assert results[3]['errors'] == ['Invalid Email Address format.']
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_bulk_atomic(self, mocker, database, test_client, json_headers, app_context):
+        '''
+        Tests that bulk lines that fail or match leave no new address behind.
+        '''
+        existing = post_new_individual(
+            {'first_name': 'Petunia', 'last_name': 'Dursley'}, test_client, json_headers)
+        privet_drive = {'address': '4 Privet Drive', 'city': 'Little Whinging'}
+        cupboard = {'address': 'The Cupboard Under The Stairs', 'city': 'Little Whinging'}
+        lines = [
+            json.dumps({'first_name': 'Vernon', 'last_name': 'Dursley', 'gender': 'Not A Gender',
+                        'mailing_address': privet_drive}),
+            json.dumps({'first_name': 'Dudley', 'last_name': 'Dursley', 'mailing_address': privet_drive}),
+            json.dumps({'first_name': 'Marge', 'last_name': 'Dursley', 'mailing_address': privet_drive}),
+            json.dumps({'first_name': 'Harry', 'last_name': 'Potter', 'mailing_address': cupboard}),
+            json.dumps({'first_name': 'Piers', 'last_name': 'Polkiss', 'mailing_address': privet_drive})
+        ]
+
+        def candidate(name):
+            return lambda request: json.loads(request.text)['first_name'] == name
+
+        with requests_mock.Mocker() as m:
+            m.post('http://mcimatchingservice_mci_1:8000/compute-match', additional_matcher=candidate('Dudley'),
+                   json={'mci_id': existing['mci_id'], 'score': 10.0}, status_code=201)
+            m.post('http://mcimatchingservice_mci_1:8000/compute-match', additional_matcher=candidate('Marge'),
+                   exc=requests.exceptions.ConnectionError)
+            m.post('http://mcimatchingservice_mci_1:8000/compute-match', additional_matcher=candidate('Harry'),
+                   json={'mci_id': '', 'score': ''}, status_code=201)
+            m.post('http://mcimatchingservice_mci_1:8000/compute-match', additional_matcher=candidate('Piers'),
+                   json={'error': 'Internal Server Error'}, status_code=500)
+
+            response = test_client.post(
+                '/users/bulk', data='\n'.join(lines), headers={'Content-Type': 'application/x-ndjson'})
+            results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        results = {result['line']: result['status'] for result in results}
+        assert results == {1: 'error', 2: 'matched', 3: 'error', 4: 'created', 5: 'error'}
+        assert Address.query.filter_by(address='4 Privet Drive').count() == 0
+        assert Address.query.filter_by(address='The Cupboard Under The Stairs').count() == 1
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_users_bulk_commit_fails(self, mocker, database, test_client, app_context):
+        '''
+        Tests that the addresses of a bulk batch whose commit fails are not remembered.
+        '''
+        mailing_address = {'address': '12 Grimmauld Place', 'city': 'London'}
+        lines = [
+            json.dumps({'first_name': 'Sirius', 'last_name': 'Black', 'mailing_address': mailing_address}),
+            json.dumps({'first_name': 'Regulus', 'last_name': 'Black', 'mailing_address': mailing_address})
+        ]
+
+        with requests_mock.Mocker() as m, \
+                mock.patch.object(db.session, 'commit', side_effect=SQLAlchemyError):
+            m.post('http://mcimatchingservice_mci_1:8000/compute-match',
+                   json={'mci_id': '', 'score': ''}, status_code=201)
+            response = test_client.post(
+                '/users/bulk', data='\n'.join(lines), headers={'Content-Type': 'application/x-ndjson'})
+            results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        assert [result['status'] for result in results] == ['error', 'error']
+        assert address_index.find(normalize_address(mailing_address)) is None
+        assert Address.query.filter_by(address='12 Grimmauld Place').count() == 0
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_post_users_breaker_open(self, mocker, individual_data, test_client, json_headers):
+        '''
+        Tests that registrations fail fast while the matching service circuit breaker is open.
+        '''
+        with mock.patch('mci.matching.CircuitBreaker.allow_request', return_value=False):
+            response = test_client.post(
+                '/users', data=json.dumps(individual_data), headers=json_headers)
+
+        assert response.status_code == 503
+        assert response.json['error'] == 'The matching service is unavailable.'
+        assert 'Retry-After' in response.headers
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_post_users_deferred(self, mocker, database, individual_data, test_client, json_headers, app_context, tmpdir):
+        '''
+        Tests that registrations are deferred while the breaker is open and completed once the
+        matching service recovers.
+        '''
+        queue = PendingMatchQueue(str(tmpdir), os.urandom(32))
+        with mock.patch('mci.api.v1_0_0.user_handler.pending_matches', queue), \
+                mock.patch.dict('os.environ', {'MATCHING_DEFERRED_MODE': 'true'}):
+            settings.reload()
+            with mock.patch('mci.matching.CircuitBreaker.allow_request', return_value=False):
+                response = test_client.post(
+                    '/users', data=json.dumps(individual_data), headers=json_headers)
+
+            assert response.status_code == 202
+            status_url = response.json['status_url']
+            assert response.headers['Location'].endswith(status_url)
+            assert test_client.get(status_url).json['status'] == 'pending'
+
+            worker = PendingMatchWorker(current_app._get_current_object(), queue,
+                                        V1_0_0_UserHandler().complete_pending_registration)
+            # a failing matching service leaves the registration pending
+            with requests_mock.Mocker() as m:
+                m.post("http://mcimatchingservice_mci_1:8000/compute-match",
+                       text='Internal Server Error', status_code=500)
+                assert worker.drain() == 0
+            assert test_client.get(status_url).json['status'] == 'pending'
+
+            with requests_mock.Mocker() as m:
+                m.post("http://mcimatchingservice_mci_1:8000/compute-match",
+                       json={"mci_id": "", "score": ""}, status_code=201)
+                assert worker.drain() == 1
+
+            response = test_client.get(status_url)
+
+        assert response.status_code == 201
+        assert response.json['status'] == 'created'
+        assert Individual.query.filter_by(mci_id=response.json['mci_id']).first()
@@ -3,6 +3,8 @@ import json
 import pytest
 
 import mock
+from mci.api.core.address_index import address_index
+from mci.api.v1_0_0.helper_handler import list_responses
 from mci_database.db.models import (Address, EducationLevel, EmploymentStatus,
                                     Individual)
 
@@ -10,7 +12,7 @@ from .utils import post_new_individual
 
 
 class TestUserHelpers(object):
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_get_mailling_address(self, mocker, test_client, individual_obj):
         response = test_client.get('/users/{}'.format(individual_obj))
 
@@ -18,7 +20,7 @@ class TestUserHelpers(object):
         assert response.json['mailing_address']['address'] == '25 Brook St'
         assert response.json['mailing_address']['city'] == 'London'
     
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_find_address_id_create(
             self, mocker, database, individual_data, 
             test_client, json_headers, app_context):
@@ -38,7 +40,30 @@ class TestUserHelpers(object):
         assert address_added_to_db.city == address['city']
         assert address_added_to_db.country == address['country']
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_find_address_id_deduplicates(
+            self, mocker, database, individual_data,
+            test_client, json_headers, app_context):
+        individual_data['mailing_address'] = {
+            'address': '1060 W Addison St', 'city': 'Chicago', 'state': 'il', 'country': 'us'}
+        first = post_new_individual(individual_data, test_client, json_headers)
+
+        # the same address written differently resolves to the same row, from the worker cache
+        address_index.clear()
+        individual_data['mailing_address'] = {
+            'address': '1060  w addison st ', 'city': 'CHICAGO', 'state': 'IL', 'country': 'US'}
+        second = post_new_individual(individual_data, test_client, json_headers)
+        stats = address_index.stats()
+        third = post_new_individual(individual_data, test_client, json_headers)
+
+        ids = [database.session.query(Individual.mailing_address_id).filter_by(mci_id=user['mci_id']).scalar()
+               for user in (first, second, third)]
+        assert ids[0] is not None
+        assert ids[0] == ids[1] == ids[2]
+        assert database.session.query(Address).filter_by(address='1060 W Addison St').count() == 1
+        assert address_index.stats()['hits'] == stats['hits'] + 1
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_find_gender_id(
             self, mocker, database, individual_data, 
             gender_obj, test_client, json_headers, 
@@ -54,7 +79,7 @@ class TestUserHelpers(object):
         assert individual_added_to_db.first_name == individual_data['first_name']
         assert individual_added_to_db.last_name == individual_data['last_name']
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_find_ethnicity_race(
             self, mocker, database, individual_data, 
             ethnicity_obj, test_client, json_headers, 
@@ -72,7 +97,7 @@ class TestUserHelpers(object):
 
         assert database.engine.execute(query)
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_find_education_level(
             self, mocker, database, individual_data, 
             education_obj, test_client, json_headers, 
@@ -90,7 +115,7 @@ class TestUserHelpers(object):
         assert ind_with_education.first_name == individual_data['first_name']
         assert ind_with_education.last_name == individual_data['last_name']
     
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_find_employment_status(
             self, mocker, database, individual_data, 
             employment_obj, test_client, json_headers, 
@@ -108,7 +133,7 @@ class TestUserHelpers(object):
         assert ind_with_employment.first_name == individual_data['first_name']
         assert ind_with_employment.last_name == individual_data['last_name']
 
-    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
     def test_find_disposition(
             self, mocker, database, individual_data, 
             disposition_obj, test_client, json_headers, 
@@ -125,3 +150,50 @@ class TestUserHelpers(object):
         '''.format(ind_json['mci_id'])
 
         assert database.engine.execute(query)
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_new_gender_invalidates_lookup_cache(
+            self, mocker, database, individual_data,
+            gender_obj, test_client, json_headers,
+            app_context):
+        individual_data['gender'] = 'Female'
+        post_new_individual(individual_data, test_client, json_headers)
+
+        # The gender table is now cached; creating a new gender must be visible immediately.
+        response = test_client.post(
+            '/gender', data=json.dumps({'gender': 'Nonbinary'}), headers=json_headers)
+        assert response.status_code == 201
+
+        individual_data['gender'] = 'nonbinary'
+        ind_json = post_new_individual(individual_data, test_client, json_headers)
+
+        individual_added_to_db = Individual.query.filter_by(mci_id=ind_json['mci_id']).first()
+        assert individual_added_to_db.gender_id == response.json['id']
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_gender_list_conditional(self, mocker, database, gender_obj, test_client, json_headers):
+        response = test_client.get('/gender')
+        etag = response.headers['ETag']
+
+        assert test_client.get('/gender', headers={'If-None-Match': etag}).status_code == 304
+
+        # a new gender changes the list and therefore its ETag
+        test_client.post('/gender', data=json.dumps({'gender': 'Agender'}), headers=json_headers)
+        response = test_client.get('/gender', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    @mock.patch('mci.auth.JWKSProvider.validate_token', return_value=True)
+    def test_gender_list_is_cached(self, mocker, database, gender_obj, test_client, json_headers):
+        stats = list_responses.stats()
+        first = test_client.get('/gender')
+        second = test_client.get('/gender')
+
+        assert second.json == first.json
+        assert list_responses.stats()['misses'] == stats['misses'] + 1
+        assert list_responses.stats()['hits'] == stats['hits'] + 1
+
+        # creating a gender invalidates the cached listing of this worker
+        test_client.post('/gender', data=json.dumps({'gender': 'Two-Spirit'}), headers=json_headers)
+        genders = [gender['gender'] for gender in test_client.get('/gender').json['genders']]
+        assert 'Two-Spirit' in genders
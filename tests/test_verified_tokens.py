@@ -0,0 +1,67 @@
+"""Verified Token Cache Unit Test
+
+This class contains unit tests for the cache of validated access tokens.
+
+"""
+
+import time
+
+import mock
+import pytest
+from brighthive_authlib import AuthZeroProvider, OAuth2ProviderError
+from expects import be_true, equal, expect
+from flask import current_app
+from jose import jwt
+
+from mci.api.core.verified_tokens import VerifiedTokenCache
+
+
+def _token(**claims):
+    return jwt.encode(claims, 'secret', algorithm='HS256')
+
+
+class TestVerifiedTokenCache(object):
+    """Test Verified Token Cache.
+
+    """
+
+    def _validate(self, cache, token, scopes=None):
+        headers = {'Authorization': 'Bearer {}'.format(token)} if token else {}
+        with current_app.test_request_context('/users', headers=headers):
+            return cache.validate(AuthZeroProvider(), scopes)
+
+    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    def test_token_validated_once(self, mocker, app_context):
+        cache = VerifiedTokenCache(ttl=3600, maxsize=10)
+        token = _token(exp=int(time.time()) + 60, scope='mci.users:get')
+
+        for _ in range(3):
+            expect(self._validate(cache, token)).to(be_true)
+        expect(mocker.call_count).to(equal(1))
+        mocker.assert_called_with(token=token, scopes=[])
+
+        self._validate(cache, _token(exp=int(time.time()) + 60, sub='other'))
+        expect(mocker.call_count).to(equal(2))
+
+    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    def test_tokens_not_cached(self, mocker, app_context):
+        cache = VerifiedTokenCache(ttl=3600, maxsize=10)
+
+        for token in (_token(exp=int(time.time()) - 1), _token(sub='no-exp'), 'opaque', None):
+            self._validate(cache, token)
+            self._validate(cache, token)
+        expect(mocker.call_count).to(equal(8))
+        mocker.assert_called_with(scopes=[])
+        expect(cache.stats()['size']).to(equal(0))
+
+    @mock.patch('brighthive_authlib.providers.AuthZeroProvider.validate_token', return_value=True)
+    def test_scopes_checked_per_request(self, mocker, app_context):
+        cache = VerifiedTokenCache(ttl=3600, maxsize=10)
+        token = _token(exp=int(time.time()) + 60, scope='mci.users:get')
+        self._validate(cache, token)
+
+        mocker.side_effect = OAuth2ProviderError('Required scope (mci.secure-user-detail:get) is not present')
+        with pytest.raises(OAuth2ProviderError):
+            self._validate(cache, token, scopes=['mci.secure-user-detail:get'])
+        expect(self._validate(cache, token, scopes=['mci.users:get'])).to(be_true)
+        expect(mocker.call_count).to(equal(2))
@@ -1,6 +1,28 @@
 import json
+from contextlib import contextmanager
 
 import requests_mock
+import rsa
+from jose import jwk, jwt
+
+from mci.instrumentation import query_tracker
+
+
+# most statements each endpoint may execute per request, enforced by the `query_budget` fixture
+QUERY_BUDGETS = {
+    'GET /users': 2,
+    'GET /users/<mci_id>': 1,
+    'GET /user-details/<mci_id>': 1,
+    'POST /users': 6,
+    'GET /source': 1,
+    'GET /gender': 1,
+    'GET /address': 1,
+    'GET /disposition': 1,
+    'GET /ethnicity': 1,
+    'GET /employment_status': 1,
+    'GET /education_level': 1,
+    'GET /': 0
+}
 
 
 def post_new_individual(individual_data, test_client, headers):
@@ -18,3 +40,69 @@ def post_new_individual(individual_data, test_client, headers):
         assert response.json['last_name'] == individual_data['last_name']
     
     return response.json
+
+
+@contextmanager
+def count_queries():
+    '''
+    Context manager that records every SQL statement executed by the current thread.
+    Yields the list of statements, which is filled in as queries run.
+    '''
+    with query_tracker.track() as query_log:
+        yield query_log.statements
+
+
+class InMemoryRedis(object):
+    '''
+    Stand-in for the subset of the Redis client used by the shared caches.
+    Expiry times are accepted but not enforced.
+    '''
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def mget(self, *names):
+        return [self.values.get(name) for name in names]
+
+    def set(self, name, value, ex=None):
+        self.values[name] = str(value).encode('utf-8')
+        return True
+
+    def incr(self, name):
+        value = int(self.values.get(name, b'0')) + 1
+        self.values[name] = str(value).encode('utf-8')
+        return value
+
+
+class LocalJWKS(object):
+    '''
+    Stand-in for an OAuth 2.0 provider's JSON Web Key Set endpoint.
+    Pass `fetch` to a `JWKSKeySet` and sign tokens with `issue`.
+    '''
+
+    def __init__(self, kid='test-key'):
+        self.fetches = 0
+        self.error = None
+        self._private_keys = {}
+        self.keys = []
+        self.add_key(kid)
+
+    def add_key(self, kid):
+        _, private_key = rsa.newkeys(1024)
+        pem = private_key.save_pkcs1().decode('utf-8')
+        public_key = jwk.construct(pem, 'RS256').public_key().to_dict()
+        public_key.update({'kid': kid, 'use': 'sig'})
+        self._private_keys[kid] = pem
+        self.keys.append(public_key)
+
+    def fetch(self):
+        self.fetches += 1
+        if self.error is not None:
+            raise self.error
+        return {'keys': list(self.keys)}
+
+    def issue(self, claims, kid='test-key'):
+        return jwt.encode(claims, self._private_keys[kid], algorithm='RS256', headers={'kid': kid})